@@ -1,15 +1,22 @@
-from fastapi import APIRouter, HTTPException
+from cachetools import TTLCache
+from fastapi import APIRouter, Depends, HTTPException
 from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
 import logging
 
 from app.core.chat_engine import AuraChatEngine
+from app.core.resources import get_chat_engine
+from app.utils.logging import SESSION_ID
 
 router = APIRouter()
 logger = logging.getLogger(__name__)
 
-# Single instance for basic API serving. In production, consider dependency injection.
-chat_engine = AuraChatEngine()
+# Shared per-process instance injected via Depends. Built eagerly at import so the
+# first request doesn't pay the vector store / LLM client cold start.
+get_chat_engine()
+
+# Short-lived cache of complete answers for idempotent retries (refreshes, double-clicks).
+response_cache: TTLCache = TTLCache(maxsize=2048, ttl=60)
 
 class QueryRequest(BaseModel):
     query: str
@@ -18,12 +25,23 @@ class QueryRequest(BaseModel):
 class QueryResponse(BaseModel):
     answer: str
 
+def _response_cache_key(chat_engine: AuraChatEngine, request: QueryRequest) -> tuple:
+    """
+    Keys on the session, the normalized query, and the latest history message. After an answer the latest
+    message is that answer, so an identical retry hits, while the same query later in a conversation that moved on misses.
+    """
+    history = chat_engine.get_history(request.session_id)
+    last_message = history[-1].content if history else ""
+    return request.session_id, request.query.strip().lower(), last_message
+
 @router.post("/chat")
-def stream_chat_response(request: QueryRequest):
+async def stream_chat_response(request: QueryRequest, chat_engine: AuraChatEngine = Depends(get_chat_engine)):
     """
     Core RAG Endpoint returning Server-Sent Events (SSE).
     """
-    logger.info(f"API Request (Stream) - Session: {request.session_id} | Query: {request.query}")
+    # Not reset: the stream is consumed after this returns, and the var is scoped to this request's task anyway
+    SESSION_ID.set(request.session_id)
+    logger.info(f"API Request (Stream) - Query: {request.query}")
     try:
         return StreamingResponse(
             chat_engine.stream_chat(request.query, session_id=request.session_id),
@@ -33,6 +51,30 @@ def stream_chat_response(request: QueryRequest):
         logger.error(f"Error processing chat request: {e}")
         raise HTTPException(status_code=500, detail="Internal Server Error processing query.")
 
+@router.post("/chat/complete", response_model=QueryResponse)
+async def compute_chat_response(request: QueryRequest, chat_engine: AuraChatEngine = Depends(get_chat_engine)):
+    """
+    Non-streaming RAG Endpoint. Awaits the async chat engine so in-flight LLM calls
+    don't each occupy a threadpool worker.
+    """
+    token = SESSION_ID.set(request.session_id)
+    logger.info(f"API Request - Query: {request.query}")
+    try:
+        cached = response_cache.get(_response_cache_key(chat_engine, request))
+        if cached is not None:
+            logger.info("Serving cached answer for repeated request.")
+            return cached
+            
+        answer = await chat_engine.achat(request.query, session_id=request.session_id)
+        response = QueryResponse(answer=answer)
+        response_cache[_response_cache_key(chat_engine, request)] = response
+        return response
+    except Exception as e:
+        logger.error(f"Error processing chat request: {e}")
+        raise HTTPException(status_code=500, detail="Internal Server Error processing query.")
+    finally:
+        SESSION_ID.reset(token)
+
 @router.get("/health")
 def health_check():
     """Simple health ping."""
@@ -1,13 +1,18 @@
+import asyncio
 import logging
 import json
-from typing import List, Dict, Any
+import re
+import hashlib
+import threading
+from collections import OrderedDict, deque
+from typing import List, Any, Tuple, Optional, Deque
 
-from langchain_openai import ChatOpenAI
-from langchain_core.prompts import ChatPromptTemplate, MessagesPlaceholder
+from cachetools import TTLCache
+
+from langchain_core.prompts import ChatPromptTemplate
 from langchain_core.messages import HumanMessage, AIMessage, SystemMessage
 
-from app.utils.config import settings
-from app.core.qa_chain import AuraQAChain
+from app.core.resources import get_qa_chain, get_chat_llm
 
 logger = logging.getLogger(__name__)
 
@@ -15,7 +20,7 @@ REFORMULATION_SYSTEM_PROMPT = """You are an expert query reformulator for a biom
 Your sole purpose is to take a conversational user input and rewrite it into a standalone, highly specific search query.
 
 CRITICAL RULES:
-1. Look at the immediate Chat History to resolve any pronouns (e.g., "it", "they", "this treatment", "these papers", "their findings") or implicit context in the User's newest Input.
+1. Look at the immediate Chat History (provided inside the user message) to resolve any pronouns (e.g., "it", "they", "this treatment", "these papers", "their findings") or implicit context in the User's newest Input.
 2. The output MUST be a standalone string that could be typed into Google Scholar without the listener needing to know the chat history.
 3. DO NOT answer the user's question. ONLY output the rewritten query.
 4. If the generic User Input does not require history to be understood (e.g., "What is HHT?"), just output the original input unchanged.
@@ -32,8 +37,62 @@ Example 2:
 History: User: "Are there papers on loss-of-function?" -> AI: "Yes, Viteri-Noël discusses ENG mutations [PMID: 40648782] and Baysal discusses ACVRL1 [PMID: 31594285]."
 New Input: "Can you summarize their findings?"
 Output: "Can you summarize the findings of Viteri-Noël [PMID: 40648782] and Baysal [PMID: 31594285] regarding loss-of-function mutations?"
+
+Example 3:
+History: User: "What genes cause HHT?" -> AI: "HHT is mainly caused by mutations in ENG (HHT1), ACVRL1 (HHT2) and SMAD4 (JP-HHT) [PMID: 29276507]."
+New Input: "Which one is associated with pulmonary AVMs?"
+Output: "Which HHT gene (ENG, ACVRL1 or SMAD4) is associated with pulmonary arteriovenous malformations (AVMs)?"
+
+Example 4:
+History: User: "How is epistaxis treated in HHT?" -> AI: "Options include topical therapies, laser coagulation, septodermoplasty and systemic agents such as tranexamic acid [PMID: 32894695]."
+New Input: "How effective is the last one?"
+Output: "How effective is tranexamic acid for reducing epistaxis in HHT patients?"
+
+Example 5:
+History: User: "Is pazopanib used for HHT?" -> AI: "Low-dose pazopanib improved hemoglobin and epistaxis in a small series [PMID: 30792244]."
+New Input: "Tell me more about that paper."
+Output: "Tell me more about the study of low-dose pazopanib for HHT bleeding [PMID: 30792244]."
+
+Example 6:
+History: User: "What screening is recommended for brain AVMs?" -> AI: "Guidelines suggest MRI screening in adults with HHT [PMID: 32894695]."
+New Input: "What is the prevalence of hepatic AVMs in HHT2 patients?"
+Output: "What is the prevalence of hepatic AVMs in HHT2 patients?"
+
+Example 7:
+History: User: "Does thalidomide reduce bleeding?" -> AI: "Thalidomide reduced epistaxis severity and transfusion needs [PMID: 20305687]."
+New Input: "And in children?"
+Output: "Does thalidomide reduce epistaxis and bleeding in children with HHT?"
+
+Example 8:
+History: User: "Any trials of bevacizumab for GI bleeding?" -> AI: "The InHIBIT-Bleeding study [PMID: 38041609] and an Al-Samkari cohort [PMID: 33232474] evaluated systemic bevacizumab for HHT-associated GI bleeding."
+New Input: "Compare their transfusion outcomes."
+Output: "Compare red blood cell transfusion outcomes of systemic bevacizumab for HHT gastrointestinal bleeding in InHIBIT-Bleeding [PMID: 38041609] and Al-Samkari [PMID: 33232474]."
+
+Example 9:
+History: User: "What is the role of BMP9 in HHT?" -> AI: "BMP9 binds ALK1 (ACVRL1) and endoglin to maintain vascular quiescence [PMID: 31594285]."
+New Input: "Are there drugs targeting this pathway?"
+Output: "Are there drugs targeting the BMP9/ALK1/endoglin signaling pathway in HHT?"
+
+REMINDERS (apply to every input):
+* Resolve every pronoun, ordinal ("the first", "the last one") and elliptical follow-up ("And in children?") using ONLY the Chat History provided in the user message.
+* Never invent drugs, genes, authors or PMIDs that are not present in the Chat History or the new input.
+* Preserve every PMID referenced by the follow-up exactly as written, in the format 'PMID: XXXXXX'.
+* Keep clinical scope identical: do not narrow or broaden the question, and do not add filters the user did not imply.
+* Output a single line containing ONLY the rewritten query, with no quotes, preamble or explanation.
+* If the new input is already standalone, output it unchanged, character for character.
 """
 
+# Cheap pre-check: inputs without pronouns/deictic markers or follow-up verbs are already standalone
+PRONOUN_RE = re.compile(r"\b(it|its|they|them|their|these|those|this|that|previous|above|first|second|third)\b", re.IGNORECASE)
+FOLLOW_UP_RE = re.compile(r"^\s*(summari[sz]e|explain|continue|expand|elaborate)\b", re.IGNORECASE)
+
+REFORMULATION_CACHE_SIZE = 512
+
+# Session memory bounds: last 5 interactions per session, idle sessions evicted after an hour
+MAX_HISTORY_MESSAGES = 10
+MAX_SESSIONS = 10_000
+SESSION_TTL_SECONDS = 3600
+
 class AuraChatEngine:
     """
     Wraps the Phase 3 RAG pipeline in a conversational memory layer.
@@ -41,39 +100,123 @@ class AuraChatEngine:
     and then passes the standalone query to the retrieval engine.
     """
     def __init__(self, model_name: str = "gpt-4o-mini"):
-        self.qa_chain = AuraQAChain()
-        self.llm = ChatOpenAI(
-            model=model_name,
-            api_key=settings.OPENAI_API_KEY,
-            temperature=0.0 # Strict determinism for reformulation
-        )
+        self.qa_chain = get_qa_chain()
+        self.llm = get_chat_llm(model_name, 0.0) # Strict determinism for reformulation
         
         # In production (FastAPI), this handles isolated session histories memory locally.
-        self.sessions: Dict[str, List[Any]] = {}
+        # Each history is a bounded deque (O(1) trim) and stale sessions expire automatically.
+        self.sessions: TTLCache = TTLCache(maxsize=MAX_SESSIONS, ttl=SESSION_TTL_SECONDS)
+        self._sessions_lock = threading.Lock() # TTLCache is not thread-safe; sync streams run in the threadpool
+        
+        # LRU of standalone rewrites keyed on (history tail hash, user input) to absorb UI retries
+        self._reform_cache: "OrderedDict[Tuple[bytes, str], str]" = OrderedDict()
+        self._reform_cache_lock = threading.Lock() # Shared by the event loop and threadpool streams, like sessions
         
+        # The static system prompt (>1024 tokens) stays first and the per-turn history is rendered
+        # into the human message, so OpenAI can serve the identical prefix from its prompt cache.
         self.reformulation_prompt = ChatPromptTemplate.from_messages([
             ("system", REFORMULATION_SYSTEM_PROMPT),
-            MessagesPlaceholder(variable_name="history"),
-            ("human", "Rewrite this input to be a standalone query: {input}")
+            ("human", "Chat History:\n{history}\n\nRewrite this input to be a standalone query: {input}")
         ])
+        self.reformulation_chain = self.reformulation_prompt | self.llm
         
-    def _reformulate_query(self, user_input: str, session_id: str) -> str:
-        """Uses the LLM to resolve pronouns and contextualize the user query."""
-        chat_history = self.sessions.get(session_id, [])
+    def _get_session(self, session_id: str) -> Deque[Any]:
+        """Returns the session history, creating it if needed and restarting its idle TTL."""
+        with self._sessions_lock:
+            history = self.sessions.get(session_id)
+            if history is None:
+                history = deque(maxlen=MAX_HISTORY_MESSAGES)
+            self.sessions[session_id] = history # Re-insert so active sessions don't expire
+            return history
+        
+    def get_history(self, session_id: str) -> Tuple[Any, ...]:
+        """Returns a snapshot of the session history (empty if unknown) without creating it or restarting its TTL."""
+        with self._sessions_lock:
+            return tuple(self.sessions.get(session_id, ()))
+        
+    def _is_standalone(self, user_input: str) -> bool:
+        """Returns True when the input has no unresolved references and needs no LLM rewrite."""
+        if PRONOUN_RE.search(user_input) or FOLLOW_UP_RE.match(user_input):
+            return False
+        return len(user_input.split()) >= 4
+        
+    def _reformulate_without_llm(self, user_input: str, chat_history: Deque[Any]) -> Optional[str]:
+        """Returns the standalone query when no LLM call is needed (no history, pre-check, or cache hit)."""
         if not chat_history:
             return user_input # No history to resolve against
             
+        if self._is_standalone(user_input):
+            logger.info(f"Query is already standalone, skipping reformulation: '{user_input}'")
+            return user_input
+            
+        cache_key = self._reform_cache_key(chat_history, user_input)
+        with self._reform_cache_lock:
+            cached_query = self._reform_cache.get(cache_key)
+            if cached_query is not None:
+                self._reform_cache.move_to_end(cache_key)
+        if cached_query is not None:
+            logger.info(f"Reformulation cache hit: '{cached_query}'")
+            return cached_query
+        return None
+        
+    def _remember_reformulation(self, chat_history: List[Any], user_input: str, rewritten_query: str) -> str:
+        """Stores a fresh LLM rewrite in the LRU cache, evicting the oldest entry when full."""
+        logger.info(f"Rewritten Query: '{rewritten_query}'")
+        cache_key = self._reform_cache_key(chat_history, user_input)
+        with self._reform_cache_lock:
+            self._reform_cache[cache_key] = rewritten_query
+            if len(self._reform_cache) > REFORMULATION_CACHE_SIZE:
+                self._reform_cache.popitem(last=False)
+        return rewritten_query
+        
+    def _reformulate_query(self, user_input: str, chat_history: Deque[Any]) -> str:
+        """Uses the LLM to resolve pronouns and contextualize the user query."""
+        shortcut = self._reformulate_without_llm(user_input, chat_history)
+        if shortcut is not None:
+            return shortcut
+            
         logger.info(f"Reformulating query based on history: '{user_input}'")
-        chain = self.reformulation_prompt | self.llm
+        response = self.reformulation_chain.invoke({
+            "history": self._format_history(chat_history),
+            "input": user_input
+        })
+        return self._remember_reformulation(chat_history, user_input, response.content.strip())
         
-        response = chain.invoke({
-            "history": chat_history,
+    async def _areformulate_query(self, user_input: str, chat_history: Deque[Any]) -> str:
+        """Async version of _reformulate_query that frees the event loop during the LLM call."""
+        shortcut = self._reformulate_without_llm(user_input, chat_history)
+        if shortcut is not None:
+            return shortcut
+            
+        logger.info(f"Reformulating query based on history: '{user_input}'")
+        stream = self.reformulation_chain.astream({
+            "history": self._format_history(chat_history),
             "input": user_input
         })
+        buffer = ""
+        try:
+            async for chunk in stream:
+                buffer += chunk.content
+                # Rewrites are single-line, so stop reading at the first line break instead of waiting for the rest
+                # of the completion. A prefix that matches the input is not final: the rewrite may extend it (e.g. with PMIDs).
+                if "\n" in buffer.strip():
+                    break
+        finally:
+            await stream.aclose()
+        return self._remember_reformulation(chat_history, user_input, buffer.strip().split("\n")[0])
         
-        rewritten_query = response.content.strip()
-        logger.info(f"Rewritten Query: '{rewritten_query}'")
-        return rewritten_query
+    def _format_history(self, chat_history: List[Any]) -> str:
+        """Renders the session history as a plain transcript for the reformulation prompt."""
+        return "\n".join(
+            f"{'User' if isinstance(message, HumanMessage) else 'AI'}: {message.content}"
+            for message in chat_history
+        )
+        
+    def _reform_cache_key(self, chat_history: List[Any], user_input: str) -> Tuple[bytes, str]:
+        """Hashes the last two history messages so identical follow-ups in the same context share a key."""
+        history_tail = "".join(message.content for message in list(chat_history)[-2:])
+        digest = hashlib.blake2b(history_tail.encode("utf-8"), digest_size=8).digest()
+        return digest, user_input
         
     def chat(self, user_input: str, session_id: str = "default") -> str:
         """
@@ -83,26 +226,54 @@ class AuraChatEngine:
         3. Save history
         4. Return answer
         """
-        if session_id not in self.sessions:
-            self.sessions[session_id] = []
+        history = self._get_session(session_id)
             
         # 1. Reformulate
-        standalone_query = self._reformulate_query(user_input, session_id)
+        standalone_query = self._reformulate_query(user_input, history)
         
         # 2. Add human message to history AFTER reformulation
-        self.sessions[session_id].append(HumanMessage(content=user_input))
+        history.append(HumanMessage(content=user_input))
         
         # 3. Execute the full Phase 3 QA Chain (Parse -> Retrieve -> Generation)
         # using the perfectly standalone query, so vector search doesn't break.
         answer, strategy = self.qa_chain.query(standalone_query)
         
         # 4. Save AI response to history
-        self.sessions[session_id].append(AIMessage(content=answer))
-        
-        # Trim history to prevent context bloat (keep last 5 interactions/10 messages)
-        if len(self.sessions[session_id]) > 10: 
-            self.sessions[session_id] = self.sessions[session_id][-10:]
+        history.append(AIMessage(content=answer))
+        return answer
+
+    async def achat(self, user_input: str, session_id: str = "default") -> str:
+        """
+        Async version of chat() for the FastAPI event loop.
+        LLM calls are awaited natively so concurrent requests don't each pin a worker thread.
+        The raw input is retrieved speculatively while the query is reformulated. When the rewrite differs,
+        that work is wasted: the retrieval runs in a worker thread, which cancelling cannot stop, so its
+        parser LLM call and Qdrant searches still complete in the background before being discarded.
+        """
+        history = self._get_session(session_id)
             
+        # 1. Reformulate, speculatively retrieving on the raw input in parallel.
+        # If the rewrite leaves the query unchanged, the speculative docs are reused.
+        reform_task = asyncio.create_task(self._areformulate_query(user_input, history))
+        speculative_retrieval = asyncio.create_task(self.qa_chain.aretrieve(user_input))
+        docs = None
+        try:
+            standalone_query = await reform_task
+            if standalone_query == user_input:
+                docs = await speculative_retrieval
+        finally:
+            # Unused (or the reformulation failed): cancel, then await so the task's outcome is always retrieved
+            speculative_retrieval.cancel()
+            await asyncio.gather(speculative_retrieval, return_exceptions=True)
+        
+        # 2. Add human message to history AFTER reformulation
+        history.append(HumanMessage(content=user_input))
+        
+        # 3. Execute the full Phase 3 QA Chain (Parse -> Retrieve -> Generation)
+        answer, strategy = await self.qa_chain.aquery(standalone_query, docs=docs)
+        
+        # 4. Save AI response to history
+        history.append(AIMessage(content=answer))
         return answer
 
     def stream_chat(self, user_input: str, session_id: str = "default"):
@@ -110,16 +281,15 @@ class AuraChatEngine:
         Streaming version of the main interaction point for conversational RAG.
         Yields SSE json strings and saves the final accumulated answer to history.
         """
-        if session_id not in self.sessions:
-            self.sessions[session_id] = []
+        history = self._get_session(session_id)
             
         yield json.dumps({"type": "status", "message": "Analyzing query context..."}) + "\n\n"
         
         # 1. Reformulate
-        standalone_query = self._reformulate_query(user_input, session_id)
+        standalone_query = self._reformulate_query(user_input, history)
         
         # 2. Add human message to history AFTER reformulation
-        self.sessions[session_id].append(HumanMessage(content=user_input))
+        history.append(HumanMessage(content=user_input))
         
         # 3. Stream the full Phase 3 QA Chain (Parse -> Retrieve -> Generation)
         full_answer = ""
@@ -134,14 +304,12 @@ class AuraChatEngine:
                 pass
                 
         # 4. Save AI response to history
-        self.sessions[session_id].append(AIMessage(content=full_answer))
+        history.append(AIMessage(content=full_answer))
         
-        # Trim history to prevent context bloat
-        if len(self.sessions[session_id]) > 10: 
-            self.sessions[session_id] = self.sessions[session_id][-10:]
-                
     def clear_history(self, session_id: str = "default"):
         """Wipes the current session memory."""
-        if session_id in self.sessions:
-            self.sessions[session_id] = []
+        with self._sessions_lock:
+            history = self.sessions.get(session_id)
+            if history is not None:
+                history.clear()
         logger.info(f"Chat history cleared for session {session_id}.")
@@ -3,6 +3,8 @@ from typing import Dict, Any, List
 from langchain_core.documents import Document
 from langchain_text_splitters import MarkdownHeaderTextSplitter, RecursiveCharacterTextSplitter
 
+from app.core.ranking import classify_pub_types, classify_section
+
 class AuraChunker:
     """
     Handles the chunking of AuraQuery articles into two layers:
@@ -52,6 +54,9 @@ class AuraChunker:
         for k, v in body_layer.items():
             if k not in ["content", "section"] and k not in article_metadata:
                 article_metadata[k] = v
+                
+        # Precompute the Stage 3 publication-type tier once per article instead of per query
+        article_metadata["pub_type_rank"] = classify_pub_types(article_metadata.get("publication_types", ""))
 
         # -------------------------------------------------------------
         # Index A: Abstract Layer (No splitting, single document)
@@ -89,6 +94,7 @@ class AuraChunker:
                 merged_meta = article_metadata.copy()
                 merged_meta.update(doc.metadata)  # Keep the header info
                 merged_meta["section"] = "body"
+                merged_meta["section_tag"] = classify_section(merged_meta.get("Header 2", "")) # Stage 3 section tier
                 doc.metadata = merged_meta
                 
                 index_b_docs.append(doc)
@@ -2,7 +2,8 @@ import logging
 from typing import Dict, Any, List
 
 from langchain_core.documents import Document
-from app.db.vector_store import AuraVectorStore
+from app.core.resources import get_vector_store
+from app.db.vector_store import INGEST_BATCH_SIZE
 
 logger = logging.getLogger(__name__)
 
@@ -14,7 +15,7 @@ class AuraEmbedder:
     """
 
     def __init__(self):
-        self.vector_store = AuraVectorStore()
+        self.vector_store = get_vector_store()
 
     def ingest_article(self, article_data: Dict[str, Any]) -> bool:
         """
@@ -56,31 +57,79 @@ class AuraEmbedder:
             logger.error(f"Failed to embed PMID {pmid}: {str(e)}")
             return False
 
+    def ingest_articles_bulk(self, articles: List[Dict[str, Any]], batch_size: int = INGEST_BATCH_SIZE) -> int:
+        """
+        Bulk variant of ingest_article for ingestion runs over many articles.
+        Collates every article's chunks into one list per index, checks all PMIDs
+        with a single lookup, and embeds in `batch_size` batches instead of one
+        embedding round-trip per article per index.
+        
+        Returns:
+            The number of articles newly embedded.
+        """
+        parsed = []
+        for article_data in articles:
+            index_a_docs = self._parse_to_documents(article_data.get("index_a", []))
+            index_b_docs = self._parse_to_documents(article_data.get("index_b", []))
+            if not index_a_docs and not index_b_docs:
+                logger.warning("No valid chunks found in article_data.")
+                continue
+            pmid = (index_a_docs or index_b_docs)[0].metadata.get("pmid")
+            parsed.append((pmid, index_a_docs, index_b_docs))
+
+        existing = self.vector_store.fetch_existing_pmids(pmid for pmid, _, _ in parsed if pmid)
+        if existing:
+            logger.info(f"{len(existing)} PMIDs already embedded in Index A. Skipping them.")
+
+        all_abstracts: List[Document] = []
+        all_bodies: List[Document] = []
+        new_pmids = set()
+        for pmid, index_a_docs, index_b_docs in parsed:
+            if pmid and (pmid in existing or pmid in new_pmids):
+                continue # Already embedded, or a duplicate within this batch
+            if pmid:
+                new_pmids.add(pmid)
+            all_abstracts.extend(index_a_docs)
+            all_bodies.extend(index_b_docs)
+
+        try:
+            self.vector_store.add_abstracts(all_abstracts, batch_size=batch_size)
+            self.vector_store.add_body_chunks(all_bodies, batch_size=batch_size)
+            logger.info(f"Successfully bulk-embedded {len(new_pmids)} articles ({len(all_abstracts)} abstracts, {len(all_bodies)} body chunks).")
+            return len(new_pmids)
+        except Exception as e:
+            logger.error(f"Failed to bulk-embed {len(new_pmids)} articles: {str(e)}")
+            return 0
+
     def _parse_to_documents(self, chunks: List[Dict[str, Any]]) -> List[Document]:
         """Helper to convert generic dict chunks back to LangChain Documents."""
-        docs = []
-        for chunk in chunks:
-            if "page_content" in chunk and "metadata" in chunk:
-                clean_meta = {}
-                for k, v in chunk["metadata"].items():
-                    # ChromaDB metadata constraints:
-                    # - Cannot contain None
-                    # - Cannot contain empty lists []
-                    # - Cannot contain dictionaries {}
-                    if v is None:
-                        continue
-                    elif isinstance(v, list):
-                        if len(v) == 0:
-                            continue
-                        # If list is not empty, ensure all items are primitives
-                        clean_meta[k] = [str(item) for item in v]
-                    elif isinstance(v, dict):
-                        clean_meta[k] = str(v)
-                    else:
-                        clean_meta[k] = v
-
-                docs.append(Document(
-                    page_content=chunk["page_content"],
-                    metadata=clean_meta
-                ))
-        return docs
+        return [
+            Document(page_content=chunk["page_content"], metadata=_clean_metadata(chunk["metadata"]))
+            for chunk in chunks
+            if "page_content" in chunk and "metadata" in chunk
+        ]
+
+
+def _clean_metadata(metadata: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Strips values the vector store metadata can't hold, in a single pass:
+    - Cannot contain None
+    - Cannot contain empty lists []
+    - Cannot contain dictionaries {} (stringified instead)
+    Uses exact `type(v) is` checks, which are cheaper than isinstance in this hot ingestion loop.
+    """
+    clean_meta = {}
+    for k, v in metadata.items():
+        if v is None:
+            continue
+        t = type(v)
+        if t is list:
+            if not v:
+                continue
+            # If list is not empty, ensure all items are primitives
+            clean_meta[k] = [str(item) for item in v]
+        elif t is dict:
+            clean_meta[k] = str(v)
+        else:
+            clean_meta[k] = v
+    return clean_meta
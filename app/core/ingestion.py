@@ -2,140 +2,299 @@
 Ingestion orchestrator for PubMed open-access articles.
 Handles searching for papers, parsing abstracts, and concurrently fetching and cleaning full-text bodies.
 """
-import json
+import asyncio
+import gzip
 import logging
-import concurrent.futures
-from typing import List, Dict, Optional
+from pathlib import Path
+from typing import List, Dict, Optional, Any, Iterator, Tuple
+
+import httpx
+import orjson
 
 from app.utils.config import settings
-from app.utils.helpers import clean_pmc_xml
-from app.db.ncbi_client import ncbi_client
-from app.core.parser import parse_medline
+from app.db.ncbi_client import ncbi_client, PMC_EFETCH_BATCH_SIZE, PUBMED_EFETCH_BATCH_SIZE
+from app.core.parser import parse_medline_abstracts
 from app.models.schemas import ArticleMetadata
 
 logger = logging.getLogger(__name__)
 
+# Raw records are stored as gzip NDJSON shards plus a {pmid: [shard, line]} manifest
+SHARD_SIZE = 1000
+MANIFEST_FILENAME = "manifest.json"
+
 
-def _fetch_and_parse_abstracts(pmids: List[str]) -> Dict[str, ArticleMetadata]:
+async def _fetch_and_parse_abstracts(pmids: List[str], client: httpx.AsyncClient, semaphore: asyncio.Semaphore) -> Dict[str, ArticleMetadata]:
     """
-    Fetches full NCBI records for a list of PMIDs and parses out their Metadata.
+    Fetches full NCBI records for a list of PMIDs in concurrent EFetch batches and parses out their Metadata.
 
     Args:
         pmids (List[str]): List of PubMed IDs to fetch.
+        client (httpx.AsyncClient): Shared HTTP client for the whole run.
+        semaphore (asyncio.Semaphore): Caps in-flight requests (ncbi_client paces their rate).
 
     Returns:
         Dict[str, ArticleMetadata]: A dictionary mapping PMIDs to their fully initialized ArticleMetadata.
     """
-    raw_articles = ncbi_client.fetch_full_records(pmids)
-    abstract_map: Dict[str, ArticleMetadata] = {}
+    async def fetch_and_parse_batch(batch: List[str]) -> List[ArticleMetadata]:
+        async with semaphore:
+            raw_xml = await ncbi_client.afetch_full_records(batch, client)
+        # The parser fills each article's abstract content; it runs off the event loop so other batches keep downloading
+        return await asyncio.to_thread(parse_medline_abstracts, raw_xml)
+
+    batches = [pmids[i:i + PUBMED_EFETCH_BATCH_SIZE] for i in range(0, len(pmids), PUBMED_EFETCH_BATCH_SIZE)]
+    parsed_batches = await asyncio.gather(*[fetch_and_parse_batch(batch) for batch in batches])
+    return {
+        abstract_meta.pmid: abstract_meta
+        for batch_articles in parsed_batches
+        for abstract_meta in batch_articles
+    }
+
+
+async def _fetch_pmc_links(pmids: List[str], client: httpx.AsyncClient, semaphore: asyncio.Semaphore) -> Dict[str, str]:
+    """
+    Maps PMIDs to PMCIDs with concurrent batched ELink requests.
 
-    for article_xml in raw_articles:
-        abstract_meta = parse_medline(article_xml, content_type="abstract")
-        if not abstract_meta:
-            continue
+    Args:
+        pmids (List[str]): List of PubMed IDs.
+        client (httpx.AsyncClient): Shared HTTP client for the whole run.
+        semaphore (asyncio.Semaphore): Caps in-flight requests (ncbi_client paces their rate).
 
-        # Extract and append the Abstract Content
-        abstract_data = article_xml.get(
-            "MedlineCitation", {}).get("Article", {}).get("Abstract", {})
-        abstract_meta.content = "\n\n".join(
-            [str(t) for t in abstract_data.get("AbstractText", [])]
-        )
-        abstract_map[abstract_meta.pmid] = abstract_meta
+    Returns:
+        Dict[str, str]: PMID -> PMCID for the articles with a PMC full text.
+    """
+    async def fetch_batch(batch: List[str]) -> Dict[str, str]:
+        async with semaphore:
+            return await ncbi_client.afetch_pmc_links(batch, client)
 
-    return abstract_map
+    batches = [pmids[i:i + PUBMED_EFETCH_BATCH_SIZE] for i in range(0, len(pmids), PUBMED_EFETCH_BATCH_SIZE)]
+    pmid_to_pmcid: Dict[str, str] = {}
+    for batch_links in await asyncio.gather(*[fetch_batch(batch) for batch in batches]):
+        pmid_to_pmcid.update(batch_links)
+    return pmid_to_pmcid
 
 
-def _fetch_and_clean_body(pmcid: str) -> Optional[str]:
+async def _fetch_and_clean_bodies(pmcids: List[str], client: httpx.AsyncClient, semaphore: asyncio.Semaphore) -> Dict[str, str]:
     """
-    Worker function for threading: Fetches and cleans the full-text body for a single PMCID.
+    Async worker: Fetches one batch of cleaned PMC full texts (disk-cached per PMCID, the rest streamed from one EFetch request).
 
     Args:
-        pmcid (str): The PubMed Central ID.
+        pmcids (List[str]): One batch of PubMed Central IDs (at most PMC_EFETCH_BATCH_SIZE).
+        client (httpx.AsyncClient): Shared HTTP client for the whole run.
+        semaphore (asyncio.Semaphore): Caps in-flight requests (ncbi_client paces their rate).
 
     Returns:
-        Optional[str]: The cleaned markdown text of the article's body, or None if unavailable/too short.
+        Dict[str, str]: PMCID -> cleaned markdown body, for articles whose body is substantively deep.
     """
-    raw_body_bytes: str = ncbi_client.fetch_full_text(pmcid)
-    if not raw_body_bytes:
-        return None
+    async with semaphore:
+        cleaned: Dict[str, str] = await ncbi_client.afetch_clean_full_texts(pmcids, client)
 
-    body_content: str = clean_pmc_xml(raw_body_bytes)
-    if len(body_content) < 500:
-        return None  # Ensure the body is a substantively deep full-text
+    # Ensure the body is a substantively deep full-text
+    return {pmcid: body_content for pmcid, body_content in cleaned.items() if len(body_content) >= 500}
 
-    return body_content
 
-
-def _process_bodies_concurrently(pmid_to_pmcid: Dict[str, str], max_workers: int = 5) -> Dict[str, str]:
+async def _process_bodies_concurrently(pmid_to_pmcid: Dict[str, str], client: httpx.AsyncClient, semaphore: asyncio.Semaphore) -> Dict[str, str]:
     """
-    Fetches PubMed Central full-text XMLs concurrently and cleans them.
+    Fetches PubMed Central full-text XMLs in batched EFetch requests, run concurrently on the event loop, and cleans them.
 
     Args:
         pmid_to_pmcid (Dict[str, str]): A mapping of PMIDs to PMCIDs.
-        max_workers (int, optional): The number of concurrent worker threads. Defaults to 5.
+        client (httpx.AsyncClient): Shared HTTP client for the whole run.
+        semaphore (asyncio.Semaphore): Caps in-flight requests (ncbi_client paces their rate).
 
     Returns:
         Dict[str, str]: A dictionary mapping PMIDs to their completely processed markdown body string.
     """
     body_map: Dict[str, str] = {}
 
-    with concurrent.futures.ThreadPoolExecutor(max_workers=max_workers) as executor:
-        # Submit execution tasks
-        future_to_pmid = {
-            executor.submit(_fetch_and_clean_body, pmcid): pmid
-            for pmid, pmcid in pmid_to_pmcid.items()
-        }
-
-        # Gather results sequentially as they complete
-        for future in concurrent.futures.as_completed(future_to_pmid):
-            pmid = future_to_pmid[future]
-            try:
-                body_content = future.result()
-                if body_content:
-                    body_map[pmid] = body_content
-                else:
-                    logger.debug(f"Skipping {pmid}: Body too short or unavailable.")
-            except Exception as e:
-                logger.error(f"Thread error fetching body for {pmid}: {e}")
+    pmcids = list(dict.fromkeys(pmid_to_pmcid.values()))
+    batches = [pmcids[i:i + PMC_EFETCH_BATCH_SIZE] for i in range(0, len(pmcids), PMC_EFETCH_BATCH_SIZE)]
+    results = await asyncio.gather(
+        *[_fetch_and_clean_bodies(batch, client, semaphore) for batch in batches],
+        return_exceptions=True
+    )
+
+    pmcid_to_body: Dict[str, str] = {}
+    for batch, batch_bodies in zip(batches, results):
+        if isinstance(batch_bodies, Exception):
+            logger.error(f"Error fetching bodies for batch starting {batch[0]}: {batch_bodies}")
+        else:
+            pmcid_to_body.update(batch_bodies)
+
+    for pmid, pmcid in pmid_to_pmcid.items():
+        body_content = pmcid_to_body.get(pmcid)
+        if body_content:
+            body_map[pmid] = body_content
+        else:
+            logger.debug(f"Skipping {pmid}: Body too short or unavailable.")
 
     return body_map
 
 
-def _save_combined_record(abstract_meta: ArticleMetadata, body_content: str, folder_name: str = "") -> bool:
+def _build_combined_record(abstract_meta: ArticleMetadata, body_content: str) -> Dict[str, Any]:
     """
-    Combines abstract and body layers of an article and intelligently saves them iteratively as structured JSON to disk.
+    Combines the abstract and body layers of an article into a single structured record.
 
     Args:
         abstract_meta (ArticleMetadata): The initialized metadata from the abstract.
         body_content (str): The cleaned markdown full-text body string.
+
+    Returns:
+        Dict[str, Any]: The combined record ({pmid, abstract_layer, body_layer}).
+    """
+    # Dump once and derive the body layer from it; only section and content differ
+    abstract_layer = abstract_meta.model_dump()
+    return {
+        "pmid": abstract_meta.pmid,
+        "abstract_layer": abstract_layer,
+        "body_layer": {**abstract_layer, "section": "body", "content": body_content}
+    }
+
+
+def _save_combined_records(records: List[Dict[str, Any]], folder_name: str = "") -> int:
+    """
+    Appends combined records to gzip-compressed NDJSON shards of SHARD_SIZE records each,
+    instead of one pretty-printed file per PMID. A manifest maps each PMID to its
+    (shard, line) location for random access. PMIDs already in the manifest are skipped,
+    so re-ingesting a page never stores a second copy.
+
+    Args:
+        records (List[Dict[str, Any]]): Combined records from _build_combined_record.
         folder_name (str, optional): Internal subdirectory name reflecting the data's query domain. Defaults to "".
 
     Returns:
-        bool: True if successfully saved, False otherwise.
+        int: The number of records written.
     """
+    output_dir = settings.RAW_DATA_DIR / folder_name
+    output_dir.mkdir(parents=True, exist_ok=True)
+
+    manifest_path = output_dir / MANIFEST_FILENAME
+    manifest: Dict[str, List[Any]] = _load_manifest(output_dir)
+
+    # Resume filling the last shard where the previous run left off. Its fill is the real line count,
+    # not the manifest count, so line offsets stay correct even if the shard holds stray duplicates.
+    shard_index = max((int(shard[len("shard_"):-len(".jsonl.gz")]) for shard, _ in manifest.values()), default=0)
+    shard_name = f"shard_{shard_index:04d}.jsonl.gz"
+    shard_fill = _count_lines(output_dir / shard_name)
+    if shard_fill is None: # Unreadable (e.g. truncated by a crash): start a fresh shard instead of appending to it
+        shard_index += 1
+        shard_name = f"shard_{shard_index:04d}.jsonl.gz"
+        shard_fill = 0
+
+    written = 0
+    gz = None
     try:
-        body_meta = abstract_meta.model_copy()
-        body_meta.section = "body"
-        body_meta.content = body_content
-
-        combined_data = {
-            "pmid": abstract_meta.pmid,
-            "abstract_layer": abstract_meta.model_dump(),
-            "body_layer": body_meta.model_dump()
-        }
-
-        file_path = settings.RAW_DATA_DIR / folder_name / f"{abstract_meta.pmid}.json"
-        
-        # Ensure parent director tree exists
-        file_path.parent.mkdir(parents=True, exist_ok=True)
-        
-        with open(file_path, "w", encoding="utf-8") as f:
-            json.dump(combined_data, f, indent=4, ensure_ascii=False)
-
-        return True
+        for record in records:
+            if record["pmid"] in manifest:
+                logger.debug(f"Skipping {record['pmid']}: already stored in {manifest[record['pmid']][0]}.")
+                continue
+            if gz is None or shard_fill >= SHARD_SIZE:
+                if gz is not None:
+                    gz.close()
+                if shard_fill >= SHARD_SIZE:
+                    shard_index += 1
+                    shard_name = f"shard_{shard_index:04d}.jsonl.gz"
+                    shard_fill = 0
+                gz = gzip.open(output_dir / shard_name, "ab")
+            gz.write(orjson.dumps(record) + b"\n")
+            manifest[record["pmid"]] = [shard_name, shard_fill]
+            shard_fill += 1
+            written += 1
     except Exception as e:
-        logger.error(f"Failed to save {abstract_meta.pmid}: {e}")
-        return False
+        logger.error(f"Failed to save records to {shard_name}: {e}")
+    finally:
+        if gz is not None:
+            gz.close()
+        manifest_path.write_bytes(orjson.dumps(manifest))
+
+    return written
+
+
+def _load_manifest(output_dir: Path) -> Dict[str, List[Any]]:
+    """Reads a raw data folder's {pmid: [shard, line]} manifest, or an empty one if it does not exist yet."""
+    manifest_path = output_dir / MANIFEST_FILENAME
+    return orjson.loads(manifest_path.read_bytes()) if manifest_path.exists() else {}
+
+
+def _count_lines(shard_path: Path) -> Optional[int]:
+    """Number of records in a shard (0 if it does not exist), or None if it cannot be read to the end."""
+    if not shard_path.exists():
+        return 0
+    try:
+        with gzip.open(shard_path, "rb") as gz:
+            return sum(1 for _ in gz)
+    except (OSError, EOFError) as e:
+        logger.warning(f"Could not read {shard_path.name} to the end: {e}")
+        return None
+
+
+def iter_raw_records(input_dir: Path) -> Iterator[Dict[str, Any]]:
+    """
+    Yields every combined record stored in a raw data folder, reading the gzip NDJSON
+    shards sequentially, followed by any legacy one-file-per-PMID JSON records.
+    Each PMID is yielded once, even if earlier ingests stored it more than once.
+
+    Args:
+        input_dir (Path): The raw data folder (e.g. settings.RAW_DATA_DIR / "hht").
+
+    Yields:
+        Dict[str, Any]: Combined records ({pmid, abstract_layer, body_layer}).
+    """
+    seen = set()
+    for shard_path in sorted(input_dir.glob("shard_*.jsonl.gz")):
+        with gzip.open(shard_path, "rb") as gz:
+            for line in gz:
+                if line.strip():
+                    record = orjson.loads(line)
+                    if record["pmid"] not in seen:
+                        seen.add(record["pmid"])
+                        yield record
+
+    for file_path in sorted(input_dir.glob("*.json")):
+        if file_path.name == MANIFEST_FILENAME or "_chunked_test.json" in file_path.name:
+            continue
+        record = orjson.loads(file_path.read_bytes())
+        if record.get("pmid") not in seen:
+            seen.add(record.get("pmid"))
+            yield record
+
+
+async def _fetch_articles(pmids: List[str], max_concurrency: Optional[int] = None) -> Tuple[Dict[str, ArticleMetadata], Dict[str, str]]:
+    """
+    Fetches and parses the abstracts and full-text bodies for a list of PMIDs on one event loop.
+
+    Args:
+        pmids (List[str]): List of PubMed IDs to ingest.
+        max_concurrency (Optional[int], optional): Max in-flight NCBI requests. Defaults to 10 with an API key, 3 without.
+            This bounds concurrency only: the request rate is held to NCBI's per-second limit by ncbi_client.
+
+    Returns:
+        Tuple[Dict[str, ArticleMetadata], Dict[str, str]]: PMID -> parsed abstract metadata, and PMID -> cleaned body.
+    """
+    if max_concurrency is None:
+        max_concurrency = 10 if settings.NCBI_API_KEY else 3
+    semaphore = asyncio.Semaphore(max_concurrency)
+
+    # HTTP/2 multiplexes the concurrent EFetch batches over a single kept-alive connection
+    async with httpx.AsyncClient(http2=True, limits=httpx.Limits(max_connections=10), timeout=120.0) as client:
+        # 1 & 2. Parse Abstracts and map PMIDs to PMCIDs (batched ELink) in parallel.
+        # Both only need the PMID list, so the NCBI round-trips overlap instead of running back to back.
+        abstract_map, pmid_to_pmcid = await asyncio.gather(
+            _fetch_and_parse_abstracts(pmids, client, semaphore),
+            _fetch_pmc_links(pmids, client, semaphore)
+        )
+        if not abstract_map:
+            return {}, {}
+
+        # Only keep full-text links for articles whose abstract parsed successfully
+        pmid_to_pmcid = {pmid: pmcid for pmid, pmcid in pmid_to_pmcid.items() if pmid in abstract_map}
+        if not pmid_to_pmcid:
+            logger.warning("No PMC links found for this batch.")
+            return abstract_map, {}
+
+        # 3. Fetch full bodies concurrently
+        body_map = await _process_bodies_concurrently(pmid_to_pmcid, client, semaphore)
+
+    return abstract_map, body_map
 
 
 def run_ingestion(keywords: List[str], limit: int = 10, pmids: Optional[List[str]] = None, folder_name: str = "") -> None:
@@ -157,26 +316,26 @@ def run_ingestion(keywords: List[str], limit: int = 10, pmids: Optional[List[str
         logger.warning("No Open Access papers found.")
         return
 
-    # 1. Parse Abstracts
-    abstract_map = _fetch_and_parse_abstracts(pmids)
-    if not abstract_map:
+    # Already-stored PMIDs would be skipped on save anyway, so don't fetch them again
+    stored = _load_manifest(settings.RAW_DATA_DIR / folder_name)
+    new_pmids = [pmid for pmid in dict.fromkeys(pmids) if pmid not in stored]
+    if len(new_pmids) < len(pmids):
+        logger.info(f"Skipping {len(pmids) - len(new_pmids)} PMIDs already stored in this folder.")
+    pmids = new_pmids
+    if not pmids:
         return
 
-    # 2. Map PMIDs to PMCIDs in one batch via ELink logic
-    pmid_to_pmcid = ncbi_client.fetch_pmc_links(list(abstract_map.keys()))
-    if not pmid_to_pmcid:
-        logger.warning("No PMC links found for this batch.")
+    # 1-3. Fetch abstracts, PMC links and full bodies over one shared async HTTP client
+    abstract_map, body_map = asyncio.run(_fetch_articles(pmids))
+    if not abstract_map or not body_map:
         return
 
-    # 3. Fetch full bodies concurrently
-    body_map = _process_bodies_concurrently(pmid_to_pmcid, max_workers=5)
-
     # 4. Save combined records
-    saved_count = 0
-    for pmid, body_content in body_map.items():
-        if pmid in abstract_map:
-            if _save_combined_record(abstract_map[pmid], body_content, folder_name):
-                saved_count += 1
-                logger.info(f"Successfully saved full-text: {pmid}")
+    records = [
+        _build_combined_record(abstract_map[pmid], body_content)
+        for pmid, body_content in body_map.items()
+        if pmid in abstract_map
+    ]
+    saved_count = _save_combined_records(records, folder_name)
 
     logger.info(f"Done. Saved {saved_count} high-quality papers.")
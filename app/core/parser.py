@@ -1,73 +1,206 @@
 """
 Parser for converting raw NCBI Medline XML into structured ArticleMetadata models.
 """
-from typing import List, Optional, Dict, Any
+import os
+import sys
+import concurrent.futures
+import functools
+import gc
+import threading
+from io import BytesIO
+from typing import Iterator, List, Optional, Set
+
+from lxml import etree
+
 from app.models.schemas import ArticleMetadata
 
+# Precompiled XPath expressions, evaluated relative to each <PubmedArticle> element
+_PMID = etree.XPath("string(MedlineCitation/PMID)")
+_ARTICLE_TITLE = etree.XPath("string(MedlineCitation/Article/ArticleTitle)")
+_JOURNAL_TITLE = etree.XPath("string(MedlineCitation/Article/Journal/Title)")
+_PUB_YEAR = etree.XPath("string(MedlineCitation/Article/Journal/JournalIssue/PubDate/Year)")
+_FIRST_AUTHOR = etree.XPath("MedlineCitation/Article/AuthorList/Author[1]")
+_DOI = etree.XPath("string(MedlineCitation/Article/ELocationID[@EIdType='doi'][1])")
+_MESH_DESCRIPTORS = etree.XPath("MedlineCitation/MeshHeadingList/MeshHeading/DescriptorName")
+_PUBLICATION_TYPES = etree.XPath("MedlineCitation/Article/PublicationTypeList/PublicationType")
+_ABSTRACT_TEXTS = etree.XPath("MedlineCitation/Article/Abstract/AbstractText")
+
+# Shard boundaries for parallel parsing; below this size a process pool costs more than it saves
+_ARTICLE_OPEN = b"<PubmedArticle>"
+_ARTICLE_CLOSE = b"</PubmedArticle>"
+MIN_BULK_PARSE_BYTES = 4 * 1024 * 1024
+
+# One process pool for the life of the process, created on first bulk parse instead of per call
+_PARSE_POOL: Optional[concurrent.futures.ProcessPoolExecutor] = None
+_PARSE_POOL_LOCK = threading.Lock()
+
+# MeSH check tags marking the study population
+_HUMANS = sys.intern("humans")
+_ANIMALS = sys.intern("animals")
 
-def parse_medline(article_xml: Dict[str, Any], content_type: str = "abstract") -> Optional[ArticleMetadata]:
+# MeSH descriptors and publication types are small controlled vocabularies, so they go through sys.intern:
+# every article shares one str object per distinct term, and CPython frees unreferenced interned strings,
+# so unlike a module-level dict the table never outgrows what is still in use.
+# Open-ended fields (journals, surnames) are not interned.
+
+
+def parse_medline(xml_bytes: bytes, content_type: str = "abstract") -> Iterator[ArticleMetadata]:
     """
-    Parses a raw Medline XML dictionary into a structured ArticleMetadata model.
+    Streams raw PubMed EFetch XML and yields one structured ArticleMetadata model per article.
+    Each <PubmedArticle> is released right after it is parsed, so memory stays flat on large dumps.
 
     Args:
-        article_xml (Dict[str, Any]): The raw parsed XML data from the PubMed EFetch endpoint.
+        xml_bytes (bytes): The raw XML returned by the PubMed EFetch endpoint.
         content_type (str, optional): The section type being parsed, typically "abstract" or "body". Defaults to "abstract".
 
+    Yields:
+        ArticleMetadata: A structured Pydantic model containing the article's metadata,
+        with `content` set to its abstract text. Records without a PMID or title are skipped.
+    """
+    if not xml_bytes:
+        return
+
+    for _, elem in etree.iterparse(
+        BytesIO(xml_bytes), events=("end",), tag="PubmedArticle",
+        recover=True, huge_tree=True, resolve_entities=False
+    ):
+        article = _parse_article(elem, content_type)
+        if article is not None:
+            yield article
+
+        # Free the processed article and any already-handled siblings
+        elem.clear()
+        while elem.getprevious() is not None:
+            del elem.getparent()[0]
+
+
+def parse_medline_bulk(xml_bytes: bytes, content_type: str = "abstract", workers: Optional[int] = None) -> List[ArticleMetadata]:
+    """
+    Parses a large EFetch XML payload across a process pool. The buffer is split at
+    </PubmedArticle> boundaries into roughly equal shards, each wrapped in a synthetic
+    <PubmedArticleSet> root and parsed by parse_medline in a worker process.
+
+    Args:
+        xml_bytes (bytes): The raw XML returned by the PubMed EFetch endpoint.
+        content_type (str, optional): The section type being parsed. Defaults to "abstract".
+        workers (Optional[int], optional): Worker process count. Defaults to os.cpu_count().
+
     Returns:
-        Optional[ArticleMetadata]: A structured Pydantic model containing the article's metadata, 
-        or None if an error occurs during parsing or required data is missing.
+        List[ArticleMetadata]: The parsed articles, in document order.
     """
+    workers = workers or os.cpu_count() or 1
+    if workers <= 1 or len(xml_bytes) < MIN_BULK_PARSE_BYTES:
+        return list(parse_medline(xml_bytes, content_type))
+
+    shards = _split_articles(xml_bytes, workers)
+    executor = _get_parse_pool()
     try:
-        citation = article_xml.get("MedlineCitation", {})
-        article = citation.get("Article", {})
-
-        # Extract MeSH headings and Publication Types
-        mesh_headings = citation.get("MeshHeadingList", [])
-        major: List[str] = []
-        minor: List[str] = []
-        
-        for mesh in mesh_headings:
-            term = str(mesh.get("DescriptorName", ""))
-            is_maj = mesh.get("DescriptorName", {}).attributes.get("MajorTopicYN") == "Y"
-            if is_maj:
-                major.append(term)
-            else:
-                minor.append(term)
-
-        pub_types = [str(pt) for pt in article.get("PublicationTypeList", [])]
-
-        # Determine if study refers to humans or animals from MeSH terms
-        all_mesh = " ".join(major + minor).lower()
-
-        # Extract basic citation data safely
-        pmid = str(citation.get("PMID", ""))
-        doi = next((str(e) for e in article.get("ELocationID", []) if e.attributes.get("EIdType") == "doi"), None)
-        article_title = article.get("ArticleTitle", "")
-        
-        journal_info = article.get("Journal", {})
-        journal_title = journal_info.get("Title", "")
-        pub_year = int(journal_info.get("JournalIssue", {}).get("PubDate", {}).get("Year", 0))
-        
-        author_list = article.get("AuthorList", [{}])
-        first_author_lastname = author_list[0].get("LastName", "Unknown") if author_list else "Unknown"
-        first_author_initials = author_list[0].get("Initials", "") if author_list else ""
-
-        return ArticleMetadata(
-            pmid=pmid,
-            doi=doi,
-            section=content_type,
-            article_title=article_title,
-            journal=journal_title,
-            pub_year=pub_year,
-            first_author_lastname=first_author_lastname,
-            first_author_initials=first_author_initials,
-            mesh_major_terms=major,
-            mesh_minor_terms=minor,
-            publication_types=pub_types,
-            is_human="humans" in all_mesh,
-            is_animal="animals" in all_mesh,
-            content=""  # To be filled by the orchestrator (e.g., ingestion pipeline)
-        )
-    except Exception:
-        # If the XML format is highly anomalous, gracefully skip
+        # map preserves shard order, so the flattened result keeps document order
+        results = executor.map(_parse_shard, shards, [content_type] * len(shards))
+        return [article for shard_articles in results for article in shard_articles]
+    except concurrent.futures.process.BrokenProcessPool:
+        _reset_parse_pool(executor) # A worker died; the next call starts a fresh pool
+        raise
+
+
+# Call sites always know the section statically, so bind it once instead of threading a string through
+parse_medline_abstracts = functools.partial(parse_medline_bulk, content_type="abstract")
+parse_medline_bodies = functools.partial(parse_medline_bulk, content_type="body")
+
+
+def _split_articles(xml_bytes: bytes, n_shards: int) -> List[bytes]:
+    """Cuts the article list into about n_shards slices at </PubmedArticle> boundaries, each a well-formed document."""
+    start = xml_bytes.find(_ARTICLE_OPEN)
+    if start == -1:
+        return [xml_bytes]
+
+    ends = []
+    pos = xml_bytes.find(_ARTICLE_CLOSE, start)
+    while pos != -1:
+        ends.append(pos + len(_ARTICLE_CLOSE))
+        pos = xml_bytes.find(_ARTICLE_CLOSE, pos + len(_ARTICLE_CLOSE))
+
+    per_shard = max(1, -(-len(ends) // n_shards)) # ceil division
+    shards = []
+    for i in range(per_shard - 1, len(ends) + per_shard - 1, per_shard):
+        end = ends[min(i, len(ends) - 1)]
+        shards.append(b"<PubmedArticleSet>" + xml_bytes[start:end] + b"</PubmedArticleSet>")
+        start = end
+    return shards
+
+
+def _get_parse_pool() -> concurrent.futures.ProcessPoolExecutor:
+    """Returns the shared parse pool, creating it on first use."""
+    global _PARSE_POOL
+    with _PARSE_POOL_LOCK:
+        if _PARSE_POOL is None:
+            # The cyclic GC is disabled in the worker processes only: a parse allocates many short-lived,
+            # acyclic objects, and the workers do nothing else, so the host process's GC is left alone
+            _PARSE_POOL = concurrent.futures.ProcessPoolExecutor(max_workers=os.cpu_count() or 1, initializer=gc.disable)
+        return _PARSE_POOL
+
+
+def _reset_parse_pool(broken: concurrent.futures.ProcessPoolExecutor) -> None:
+    """Drops a broken pool so it is rebuilt on the next bulk parse."""
+    global _PARSE_POOL
+    with _PARSE_POOL_LOCK:
+        if _PARSE_POOL is broken:
+            _PARSE_POOL = None
+    broken.shutdown(wait=False)
+
+
+def _parse_shard(shard: bytes, content_type: str) -> List[ArticleMetadata]:
+    """Process-pool worker: parses one synthetic <PubmedArticleSet> shard."""
+    return list(parse_medline(shard, content_type))
+
+
+def _parse_article(article: etree._Element, content_type: str) -> Optional[ArticleMetadata]:
+    """Extracts the metadata fields from a single <PubmedArticle> element, defaulting missing fields.
+    Returns None for malformed records without a PMID or title, before the MeSH and author extraction."""
+    # Check the cheap required fields first
+    pmid = _PMID(article).strip()
+    article_title = _ARTICLE_TITLE(article)
+    if not pmid or not article_title:
         return None
+
+    # Extract MeSH headings and Publication Types
+    major: List[str] = []
+    minor: List[str] = []
+    mesh_set: Set[str] = set() # Lowercased descriptors for the human/animal check tags
+    for descriptor in _MESH_DESCRIPTORS(article):
+        term = "".join(descriptor.itertext())
+        term = sys.intern(term)
+        mesh_set.add(term.lower())
+        if descriptor.get("MajorTopicYN") == "Y":
+            major.append(term)
+        else:
+            minor.append(term)
+
+    pub_types = [sys.intern(t) for t in ("".join(pt.itertext()) for pt in _PUBLICATION_TYPES(article))]
+
+    # Extract basic citation data safely
+    pub_year = _PUB_YEAR(article).strip()
+    authors = _FIRST_AUTHOR(article)
+    first_author = authors[0] if authors else None
+    first_author_lastname = first_author.findtext("LastName") if first_author is not None else None
+    first_author_initials = first_author.findtext("Initials") if first_author is not None else None
+    journal = _JOURNAL_TITLE(article)
+
+    # Every field is already typed and defaulted above, so skip Pydantic validation on this hot path
+    return ArticleMetadata.model_construct(
+        pmid=pmid,
+        doi=_DOI(article).strip() or None,
+        section=content_type,
+        article_title=article_title,
+        journal=journal,
+        pub_year=int(pub_year) if pub_year.isdigit() else 0,
+        first_author_lastname=first_author_lastname or "Unknown",
+        first_author_initials=first_author_initials or "",
+        mesh_major_terms=major,
+        mesh_minor_terms=minor,
+        publication_types=pub_types,
+        # Determine if study refers to humans or animals from the MeSH check tags
+        is_human=_HUMANS in mesh_set,
+        is_animal=_ANIMALS in mesh_set,
+        content="\n\n".join("".join(t.itertext()) for t in _ABSTRACT_TEXTS(article))
+    )
@@ -1,15 +1,18 @@
+import asyncio
+import concurrent.futures
 import logging
 import json
+import re
 import time
-from typing import List, Tuple
+from typing import List, Dict, Tuple, Optional, Iterator
 
-from langchain_openai import ChatOpenAI
-from langchain_core.prompts import ChatPromptTemplate
 from langchain_core.documents import Document
-from pydantic import BaseModel, Field
+from langchain_core.messages import BaseMessage, SystemMessage, HumanMessage
 
 from app.utils.config import settings
+from app.models.schemas import QAResult
 from app.core.retriever import AuraRetriever
+from app.core.resources import get_retriever, get_chat_llm
 
 logger = logging.getLogger(__name__)
 
@@ -38,6 +41,17 @@ CONTEXT PROVIDED:
 {context}
 """
 
+# Pre-split once at import so each query only concatenates the context in, with no template re-parse
+QA_SYSTEM_PREFIX, QA_SYSTEM_SUFFIX = QA_SYSTEM_PROMPT.split("{context}")
+
+# Article header citation, keyed on (has_author, has_year)
+CITATION_FORMATS = {
+    (True, True): "({author}, {year}) [PMID: {pmid}]",
+    (True, False): "({author}) [PMID: {pmid}]",
+    (False, True): "({year}) [PMID: {pmid}]",
+    (False, False): "[PMID: {pmid}]",
+}
+
 class AuraQAChain:
     """
     Orchestrates the final LLM response.
@@ -46,23 +60,28 @@ class AuraQAChain:
     """
 
     def __init__(self, model_name: str = "gpt-4o-mini"):
-        self.retriever = AuraRetriever()
+        self.retriever: AuraRetriever = get_retriever()
         
         # We use a standard generation model here, not structured output.
-        self.llm = ChatOpenAI(
-            model=model_name,
-            api_key=settings.OPENAI_API_KEY,
-            temperature=0.1 # Very low temperature for factual RAG
-        )
+        self.llm = get_chat_llm(model_name, 0.1) # Very low temperature for factual RAG
+        # Blocking answers report evidence sufficiency as a flag rather than a phrase to string-match.
+        # Streaming keeps the plain LLM, since structured output can't be rendered token by token.
+        self.structured_llm = self.llm.with_structured_output(QAResult)
         
-        self.prompt_template = ChatPromptTemplate.from_messages([
-            ("system", QA_SYSTEM_PROMPT),
-            ("human", "{question}")
-        ])
+        # Background threads for speculative fallback retrieval (I/O-bound: parser LLM + Qdrant)
+        self._speculation_pool = concurrent.futures.ThreadPoolExecutor(max_workers=4, thread_name_prefix="qa-fallback")
+        
+
+    def _build_messages(self, context: str, question: str) -> List[BaseMessage]:
+        """Renders the QA prompt for one query: the pre-split system prompt around the context, plus the question."""
+        return [
+            SystemMessage(content=QA_SYSTEM_PREFIX + context + QA_SYSTEM_SUFFIX),
+            HumanMessage(content=question)
+        ]
 
     def query(self, raw_query: str) -> Tuple[str, str]:
         """Executes the full RAG pipeline and returns the Markdown answer and strategy used."""
-        logger.info(f"Executing End-to-End RAG for query: {raw_query}")
+        logger.info("Executing End-to-End RAG for query: %s", raw_query)
         
         docs = self.retriever.retrieve(raw_query)
         
@@ -73,50 +92,125 @@ class AuraQAChain:
         if docs[0].metadata.get("type") == "clarification":
             return docs[0].page_content.replace("System Alert: Do not answer the user's question. Instead, ask them this clarification: ", ""), "Clarification"
             
+        # Speculatively start the fallback retrieval; it doesn't depend on the answer below
+        speculative_fallback = None
+        if settings.SPECULATIVE_FALLBACK_RETRIEVAL:
+            speculative_fallback = self._speculation_pool.submit(self.retriever.retrieve, raw_query, bypass_stage_1=True)
+            
         # 3. Format the Context block and Generate Initial Answer
         formatted_context = self._format_docs(docs)
-        logger.info(f"Context compiled. Sending {len(docs)} chunks to LLM payload.")
+        logger.info("Context compiled. Sending %d chunks to LLM payload.", len(docs))
         
-        chain = self.prompt_template | self.llm
-        response = chain.invoke({
-            "context": formatted_context,
-            "question": raw_query
-        })
-        answer = response.content
+        result: QAResult = self.structured_llm.invoke(self._build_messages(formatted_context, raw_query))
         
         # Standardization
-        answer = self._standardize_citations(answer)
+        answer = self._standardize_citations(result.answer_markdown)
         
-        # 4. Fallback Trigger: If the LLM explicitly states it couldn't find evidence,
+        # 4. Fallback Trigger: If the LLM reports it couldn't find evidence,
         # we bypass Stage 1 (Abstract Top-N) and force a deep global search on Index B.
-        if "I couldn't find sufficient evidence" in answer:
+        if not result.sufficient_evidence:
             logger.warning("LLM reported insufficient evidence from Stage 1 Abstracts. Triggering Global Index B Fallback Search.")
-            fallback_docs = self.retriever.retrieve(raw_query, bypass_stage_1=True)
+            if speculative_fallback is not None:
+                fallback_docs = speculative_fallback.result() # Usually already finished
+            else:
+                fallback_docs = self.retriever.retrieve(raw_query, bypass_stage_1=True)
             
             if fallback_docs:
-                logger.info(f"Fallback retrieved {len(fallback_docs)} chunks from Index B. Re-prompting LLM.")
+                logger.info("Fallback retrieved %d chunks from Index B. Re-prompting LLM.", len(fallback_docs))
                 fallback_context = self._format_docs(fallback_docs)
-                fallback_response = chain.invoke({
-                    "context": fallback_context,
-                    "question": raw_query
-                })
-                return self._standardize_citations(fallback_response.content), "Bypassed Index A"
+                fallback_result: QAResult = self.structured_llm.invoke(self._build_messages(fallback_context, raw_query))
+                return self._standardize_citations(fallback_result.answer_markdown), "Bypassed Index A"
             else:
                 logger.warning("Fallback global search yielded no results either.")
                 return answer, "Index A -> Index B"
                 
+        if speculative_fallback is not None:
+            speculative_fallback.cancel() # Discarded (a no-op if it is already running)
         return answer, "Index A -> Index B"
 
-    def stream_query(self, raw_query: str):
+    async def aretrieve(self, raw_query: str, bypass_stage_1: bool = False) -> List[Document]:
+        """Runs the synchronous retriever in a worker thread so it can overlap other awaits."""
+        return await asyncio.to_thread(self.retriever.retrieve, raw_query, bypass_stage_1=bypass_stage_1)
+
+    async def aquery(self, raw_query: str, docs: Optional[List[Document]] = None) -> Tuple[str, str]:
+        """
+        Async version of query(). Retrieval runs in a worker thread while LLM calls are awaited natively.
+        Callers that already retrieved for this exact query (e.g. speculatively) can pass `docs` to skip retrieval.
+        """
+        logger.info("Executing Async End-to-End RAG for query: %s", raw_query)
+        
+        if docs is None:
+            docs = await self.aretrieve(raw_query)
+        
+        if not docs:
+            return "No relevant literature could be found to answer this query.", "Failed"
+            
+        # 2. Check if the Retriever bounced back a Clarification Request
+        if docs[0].metadata.get("type") == "clarification":
+            return docs[0].page_content.replace("System Alert: Do not answer the user's question. Instead, ask them this clarification: ", ""), "Clarification"
+            
+        # Speculatively start the fallback retrieval (see query())
+        speculative_fallback = None
+        if settings.SPECULATIVE_FALLBACK_RETRIEVAL:
+            speculative_fallback = asyncio.create_task(self.aretrieve(raw_query, bypass_stage_1=True))
+            
+        try:
+            # 3. Format the Context block and Generate Initial Answer
+            formatted_context = self._format_docs(docs)
+            logger.info("Context compiled. Sending %d chunks to LLM payload.", len(docs))
+            
+            result: QAResult = await self.structured_llm.ainvoke(self._build_messages(formatted_context, raw_query))
+            answer = self._standardize_citations(result.answer_markdown)
+            
+            # 4. Fallback Trigger (see query())
+            if not result.sufficient_evidence:
+                logger.warning("LLM reported insufficient evidence from Stage 1 Abstracts. Triggering Global Index B Fallback Search.")
+                if speculative_fallback is not None:
+                    fallback_docs = await speculative_fallback
+                else:
+                    fallback_docs = await self.aretrieve(raw_query, bypass_stage_1=True)
+                
+                if fallback_docs:
+                    logger.info("Fallback retrieved %d chunks from Index B. Re-prompting LLM.", len(fallback_docs))
+                    fallback_result: QAResult = await self.structured_llm.ainvoke(self._build_messages(self._format_docs(fallback_docs), raw_query))
+                    return self._standardize_citations(fallback_result.answer_markdown), "Bypassed Index A"
+                else:
+                    logger.warning("Fallback global search yielded no results either.")
+                    return answer, "Index A -> Index B"
+                    
+            return answer, "Index A -> Index B"
+        finally:
+            if speculative_fallback is not None:
+                # Cancel if unused (the worker thread itself still runs to completion), then await
+                # so a failed speculation never surfaces as "Task exception was never retrieved"
+                speculative_fallback.cancel()
+                await asyncio.gather(speculative_fallback, return_exceptions=True)
+
+    def stream_query(self, raw_query: str) -> Iterator[str]:
         """Executes the full RAG pipeline and yields SSE json chunks."""
-        logger.info(f"Executing Streaming End-to-End RAG for query: {raw_query}")
+        for event in self._stream_events(raw_query):
+            yield json.dumps(event) + "\n\n"
+
+    def query_stream(self, raw_query: str) -> Iterator[str]:
+        """
+        Executes the full RAG pipeline and yields only the answer text as it is generated,
+        so non-SSE callers can render incrementally instead of waiting on query().
+        The insufficient-evidence fallback is handled the same way as in stream_query.
+        """
+        for event in self._stream_events(raw_query):
+            if event["type"] == "token":
+                yield event["content"]
+
+    def _stream_events(self, raw_query: str) -> Iterator[Dict[str, str]]:
+        """Shared streaming pipeline behind stream_query and query_stream. Yields status and token events."""
+        logger.info("Executing Streaming End-to-End RAG for query: %s", raw_query)
         
         docs = []
         is_early_fallback = False
         
         for event in self.retriever.stream_retrieve(raw_query):
             if event["type"] == "status":
-                yield json.dumps({"type": "status", "message": event["message"]}) + "\n\n"
+                yield {"type": "status", "message": event["message"]}
             elif event["type"] == "fallback_trigger":
                 is_early_fallback = True
             elif event["type"] == "result":
@@ -128,35 +222,31 @@ class AuraQAChain:
             fallback_docs = []
             for event in self.retriever.stream_retrieve(raw_query, bypass_stage_1=True):
                 if event["type"] == "status":
-                    yield json.dumps({"type": "status", "message": event["message"]}) + "\n\n"
+                    yield {"type": "status", "message": event["message"]}
                 elif event["type"] == "result":
                     fallback_docs = event["docs"]
             docs = fallback_docs
 
         if not docs:
-            yield json.dumps({"type": "token", "content": "No relevant literature could be found to answer this query."}) + "\n\n"
+            yield {"type": "token", "content": "No relevant literature could be found to answer this query."}
             return
             
         # 2. Check if the Retriever bounced back a Clarification Request
         if docs[0].metadata.get("type") == "clarification":
-            yield json.dumps({"type": "token", "content": docs[0].page_content.replace("System Alert: Do not answer the user's question. Instead, ask them this clarification: ", "")}) + "\n\n"
+            yield {"type": "token", "content": docs[0].page_content.replace("System Alert: Do not answer the user's question. Instead, ask them this clarification: ", "")}
             return
             
         # 3. Format the Context block and Generate Initial Answer
         formatted_context = self._format_docs(docs)
-        logger.info(f"Context compiled. Sending {len(docs)} chunks to LLM payload.")
+        logger.info("Context compiled. Sending %d chunks to LLM payload.", len(docs))
         
-        yield json.dumps({"type": "status", "message": "Synthesizing clinical evidence..."}) + "\n\n"
-        chain = self.prompt_template | self.llm
+        yield {"type": "status", "message": "Synthesizing clinical evidence..."}
         
         full_answer = ""
         buffer = ""
         is_fallback = False
         
-        for chunk in chain.stream({
-            "context": formatted_context,
-            "question": raw_query
-        }):
+        for chunk in self.llm.stream(self._build_messages(formatted_context, raw_query)):
             content = chunk.content
             full_answer += content
             
@@ -169,9 +259,13 @@ class AuraQAChain:
             else:
                 # Once we pass the buffer threshold, flush the buffer and new content
                 if buffer:
-                    yield json.dumps({"type": "token", "content": buffer}) + "\n\n"
+                    yield {"type": "token", "content": buffer}
                     buffer = ""
-                yield json.dumps({"type": "token", "content": content}) + "\n\n"
+                yield {"type": "token", "content": content}
+                
+        # Flush answers short enough to finish inside the detection buffer
+        if buffer and not is_fallback:
+            yield {"type": "token", "content": buffer}
             
         # 4. Fallback Trigger (if LLM decided context was insufficient)
         if is_fallback and not is_early_fallback:
@@ -180,22 +274,19 @@ class AuraQAChain:
             fallback_docs = []
             for event in self.retriever.stream_retrieve(raw_query, bypass_stage_1=True):
                 if event["type"] == "status":
-                    yield json.dumps({"type": "status", "message": event["message"]}) + "\n\n"
+                    yield {"type": "status", "message": event["message"]}
                 elif event["type"] == "result":
                     fallback_docs = event["docs"]
                     
             if fallback_docs:
-                logger.info(f"Fallback retrieved {len(fallback_docs)} chunks from Index B. Re-prompting LLM.")
+                logger.info("Fallback retrieved %d chunks from Index B. Re-prompting LLM.", len(fallback_docs))
                 fallback_context = self._format_docs(fallback_docs)
                 
                 # Yield Synthesizing clinical evidence again before generating fallback answer
-                yield json.dumps({"type": "status", "message": "Synthesizing clinical evidence..."}) + "\n\n"
+                yield {"type": "status", "message": "Synthesizing clinical evidence..."}
                 
-                for chunk in chain.stream({
-                    "context": fallback_context,
-                    "question": raw_query
-                }):
-                    yield json.dumps({"type": "token", "content": chunk.content}) + "\n\n"
+                for chunk in self.llm.stream(self._build_messages(fallback_context, raw_query)):
+                    yield {"type": "token", "content": chunk.content}
             else:
                 logger.warning("Fallback global search yielded no results either.")
 
@@ -204,47 +295,32 @@ class AuraQAChain:
         Groups chunks by PMID so the LLM clearly sees distinct articles,
         while strictly maintaining the original relevance ranking order."""
         
-        # Group documents by their PMID and track their best mathematical rank
-        grouped_docs = {}
-        for idx, doc in enumerate(docs):
-            pmid = doc.metadata.get("pmid", "Unknown")
-            if pmid not in grouped_docs:
-                grouped_docs[pmid] = {
-                    "chunks": [],
-                    "best_rank": idx
-                }
-            grouped_docs[pmid]["chunks"].append(doc)
+        # Group documents by their PMID. Dicts keep insertion order, so articles stay ordered
+        # by their best (first-seen) rank without a separate sort
+        grouped_docs: Dict[str, List[Document]] = {}
+        for doc in docs:
+            grouped_docs.setdefault(doc.metadata.get("pmid", "Unknown"), []).append(doc)
             
-        # Sort PMIDs by their best rank to maintain overall relevance order
-        sorted_pmids = sorted(grouped_docs.keys(), key=lambda p: grouped_docs[p]["best_rank"])
-            
-        formatted_strings = []
-        article_counter = 1
+        return "\n".join(
+            self._format_article(article_number, pmid, chunks)
+            for article_number, (pmid, chunks) in enumerate(grouped_docs.items(), 1)
+        )
+
+    def _format_article(self, article_number: int, pmid: str, chunks: List[Document]) -> str:
+        """Renders one article block: the citation header followed by its combined chunks."""
+        # Grab metadata from the first chunk of this article
+        meta = chunks[0].metadata
+        year = meta.get("pub_year") or meta.get("publication_year")
+        author = meta.get("first_author_lastname")
         
-        for pmid in sorted_pmids:
-            chunks = grouped_docs[pmid]["chunks"]
-            # Grab metadata from the first chunk of this article
-            meta = chunks[0].metadata
-            year = meta.get("pub_year", meta.get("publication_year"))
-            author = meta.get("first_author_lastname")
-            
-            # Smart citation assembly
-            if author and year and author != "Unknown" and year != "Unknown":
-                citation_header = f"--- ARTICLE {article_counter}: ({author}, {year}) [PMID: {pmid}] ---"
-            elif author and author != "Unknown":
-                citation_header = f"--- ARTICLE {article_counter}: ({author}) [PMID: {pmid}] ---"
-            elif year and year != "Unknown":
-                citation_header = f"--- ARTICLE {article_counter}: ({year}) [PMID: {pmid}] ---"
-            else:
-                citation_header = f"--- ARTICLE {article_counter}: [PMID: {pmid}] ---"
-            
-            # Combine all chunks for this article
-            combined_content = "\n...\n".join([chunk.page_content.strip() for chunk in chunks])
-            
-            formatted_strings.append(f"{citation_header}\n{combined_content}\n")
-            article_counter += 1
-            
-        return "\n".join(formatted_strings)
+        # Smart citation assembly, dispatched on which fields are usable
+        has_author = bool(author) and author != "Unknown"
+        has_year = bool(year) and year != "Unknown"
+        citation = CITATION_FORMATS[(has_author, has_year)].format(author=author, year=year, pmid=pmid)
+        
+        # Combine all chunks for this article
+        combined_content = "\n...\n".join(chunk.page_content.strip() for chunk in chunks)
+        return f"--- ARTICLE {article_number}: {citation} ---\n{combined_content}\n"
 
     def _standardize_citations(self, text: str) -> str:
         """
@@ -254,8 +330,6 @@ class AuraQAChain:
         `[Smith, 2021; PMID: 123456]` -> `(Smith, 2021) [PMID: 123456]`
         `[PMID: 123, PMID: 456]` -> `[PMID: 123] [PMID: 456]`
         """
-        import re
-        
         # 1. Handle combined author/PMID brackets like [Author, Year; PMID: 123456]
         # Extracts the author/year part and the PMID part, rewriting them.
         pattern_author_combined = r'\[([^\]]*?);\s*PMID:\s*(\d+)\]'
@@ -1,18 +1,39 @@
 import logging
-from typing import Optional, List
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from typing import Optional, List, Dict, Tuple
 import warnings
 
-from langchain_openai import ChatOpenAI
-from langchain_core.prompts import ChatPromptTemplate
+from cachetools import LRUCache
+from langchain_core.messages import SystemMessage, HumanMessage
 
 from app.utils.config import settings
-from app.models.schemas import MetadataFilters, ParsedQuery
+from app.models.schemas import MetadataFilters, ParsedQuery, ParsedQueryBatch
+from app.core.resources import get_chat_llm
 
-# Suppress harmless Pydantic serialization warnings caused by OpenAI's structured output
-warnings.filterwarnings("ignore", category=UserWarning, module="pydantic")
+# Suppress harmless Pydantic serialization warnings caused by OpenAI's structured output.
+# Matched on the serializer message only, so every other pydantic UserWarning still surfaces.
+# (A catch_warnings block around the call isn't an option: it swaps global state and parse runs in threads.)
+warnings.filterwarnings("ignore", message="Pydantic serializer warnings", category=UserWarning, module="pydantic")
 
 logger = logging.getLogger(__name__)
 
+# Process-wide parse cache keyed on (model, subject, whitespace-normalized query), shared by every QueryParser.
+# Case is kept: the parse is case-sensitive for gene/protein symbols (ENG, SMAD4), like the embedding cache key.
+# Concurrent identical queries (e.g. primary + speculative fallback retrieval) share one in-flight LLM call.
+PARSE_CACHE_SIZE = 4096
+_parse_cache: LRUCache = LRUCache(maxsize=PARSE_CACHE_SIZE)
+_parse_inflight: Dict[Tuple[str, str, str], Future] = {}
+_parse_lock = threading.Lock()
+
+BATCH_INSTRUCTIONS = """
+
+BATCH MODE
+You will receive a numbered list of independent raw user queries. Apply all of the above to EACH query separately
+and return the `results` array with exactly one object per input query, in the same order as the numbering."""
+
 
 # -----------------------------------------------------------------------
 # System Prompt
@@ -94,21 +115,16 @@ class QueryParser:
             model_name (str, optional): The OpenAI model to use. Defaults to "gpt-4o-mini".
             medical_subject (str, optional): The specific medical domain to optimize for. Defaults to "Hereditary Hemorrhagic Telangiectasia (HHT)".
         """
+        self.model_name = model_name
         self.medical_subject = medical_subject
         # Initialize the LLM and bind it to our strict Pydantic output schema
-        self.llm = ChatOpenAI(
-            model=model_name,
-            api_key=settings.OPENAI_API_KEY,
-            temperature=0.0 # Strict determinism for parsing
-        ).with_structured_output(ParsedQuery)
+        self.llm = get_chat_llm(model_name, 0.0).with_structured_output(ParsedQuery) # Strict determinism for parsing
         
-        self.prompt_template = ChatPromptTemplate.from_messages([
-            ("system", PARSER_SYSTEM_PROMPT),
-            ("human", "Raw User Query: {query}")
-        ])
+        # The system prompt only depends on the subject, so render it once instead of per query
+        self.system_message = SystemMessage(content=PARSER_SYSTEM_PROMPT.format(medical_subject=medical_subject))
         
-        # LCEL Chain
-        self.chain = self.prompt_template | self.llm
+        # Optional micro-batching of concurrent parses into a single LLM request
+        self._batcher: Optional[ParseBatcher] = ParseBatcher(self) if settings.QUERY_PARSER_BATCHING else None
 
     def parse(self, query: str) -> ParsedQuery:
         """
@@ -121,14 +137,107 @@ class QueryParser:
             ParsedQuery: A structured Pydantic object containing the optimized query natively 
             coupled with any unambiguously requested metadata filters, or clarification prompts if needed.
         """
-        logger.info(f"Parsing raw query: '{query}'")
+        key = (self.model_name, self.medical_subject, " ".join(query.split()))
+        with _parse_lock:
+            cached = _parse_cache.get(key)
+            if cached is not None:
+                logger.info("Parse cache hit for query: %r", query)
+                return cached
+            in_flight = _parse_inflight.get(key)
+            if in_flight is None:
+                _parse_inflight[key] = Future()
+                
+        if in_flight is not None:
+            logger.info("Joining in-flight parse for query: %r", query)
+            return in_flight.result()
+            
+        logger.info("Parsing raw query: %r", query)
+        try:
+            if self._batcher is not None:
+                result = self._batcher.submit(query).result()
+            else:
+                result = self._invoke_llm(query)
+            with _parse_lock:
+                _parse_cache[key] = result
+        except Exception as e:
+            logger.error("Failed to parse query. Error: %s", e)
+            # Failsafe: return the raw query unoptimized if the LLM crashes (not cached, so it is retried next time)
+            result = ParsedQuery(optimized_query=query)
+            
+        with _parse_lock:
+            _parse_inflight.pop(key).set_result(result)
+        return result
+
+    def _invoke_llm(self, query: str) -> ParsedQuery:
+        """Parses a single query with one LLM call. Raises on LLM failure."""
+        return self.llm.invoke([
+            self.system_message,
+            HumanMessage(content=f"Raw User Query: {query}")
+        ])
+
+
+class ParseBatcher:
+    """
+    Thread-based micro-batcher for QueryParser. Parse requests arriving within `window_seconds`
+    of each other (up to `max_batch`) are resolved by a single LLM call that returns a
+    ParsedQueryBatch, amortizing per-request overhead under concurrent load.
+    """
+
+    def __init__(self, parser: QueryParser, window_seconds: float = 0.05, max_batch: int = 16):
+        self.parser = parser
+        self.window_seconds = window_seconds
+        self.max_batch = max_batch
+        self.batch_llm = get_chat_llm(parser.model_name, 0.0).with_structured_output(ParsedQueryBatch)
+        self.batch_system_message = SystemMessage(content=parser.system_message.content + BATCH_INSTRUCTIONS)
+        
+        self._queue: "queue.Queue[Tuple[str, Future]]" = queue.Queue()
+        threading.Thread(target=self._run, name="query-parse-batcher", daemon=True).start()
+
+    def submit(self, query: str) -> Future:
+        """Enqueues a query and returns a Future resolved with its ParsedQuery."""
+        future: Future = Future()
+        self._queue.put((query, future))
+        return future
+
+    def _run(self) -> None:
+        """Drains the queue forever, flushing on window expiry or when the batch is full."""
+        while True:
+            batch = [self._queue.get()]
+            deadline = time.monotonic() + self.window_seconds
+            while len(batch) < self.max_batch:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self._queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+            self._flush(batch)
+
+    def _flush(self, batch: List[Tuple[str, Future]]) -> None:
+        """Resolves a batch with one LLM call, falling back to per-query calls if the batch reply is unusable."""
+        queries = [query for query, _ in batch]
         try:
-            result: ParsedQuery = self.chain.invoke({
-                "medical_subject": self.medical_subject,
-                "query": query
-            })
-            return result
+            if len(batch) == 1:
+                results = [self.parser._invoke_llm(queries[0])]
+            else:
+                logger.info("Parsing %d queries in one batched LLM call.", len(batch))
+                numbered = "\n".join(f"{i}. {query}" for i, query in enumerate(queries, 1))
+                response: ParsedQueryBatch = self.batch_llm.invoke([
+                    self.batch_system_message,
+                    HumanMessage(content=f"Raw User Queries:\n{numbered}")
+                ])
+                results = response.results
+                if len(results) != len(batch):
+                    logger.warning("Batched parse returned %d results for %d queries. Parsing individually.", len(results), len(batch))
+                    results = self.parser.llm.batch([
+                        [self.parser.system_message, HumanMessage(content=f"Raw User Query: {query}")]
+                        for query in queries
+                    ])
         except Exception as e:
-            logger.error(f"Failed to parse query. Error: {e}")
-            # Failsafe: return the raw query unoptimized if the LLM crashes
-            return ParsedQuery(optimized_query=query)
+            for _, future in batch:
+                future.set_exception(e)
+            return
+            
+        for (_, future), result in zip(batch, results):
+            future.set_result(result)
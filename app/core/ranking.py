@@ -0,0 +1,84 @@
+"""
+Stage 3 reranking tiers shared by the retriever (query time) and the chunker (ingest time).
+Chunks are tagged with their tier indices when indexed, so reranking is a table lookup per chunk.
+Changing a tier table below re-numbers the tiers: re-chunk and re-index so stored tags stay in sync.
+"""
+import re
+from typing import Any, Dict, Tuple
+
+import numpy as np
+
+Tiers = Tuple[Tuple[Tuple[str, ...], float], ...]
+
+# Ordered (keywords, boost) tiers; the highest tier with a keyword found in the field wins.
+PUB_TYPE_BOOSTS: Tiers = (
+    (("Meta-Analysis",), 1.00),
+    (("Systematic Review",), 0.95),
+    (("Guideline", "Practice Guideline"), 0.90),
+    (("Randomized Controlled Trial",), 0.85),
+    (("Clinical Trial",), 0.75),
+    (("Review",), 0.55),
+    (("Case Reports",), 0.50),
+)
+DEFAULT_PUB_TYPE_BOOST = 0.60
+
+# Matched against the lowercased "Header 2" of Index B chunks
+SECTION_BOOSTS: Tiers = (
+    (("result",), 1.5),
+    (("conclusion",), 1.5),
+    (("method",), 1.0),
+    (("discussion",), 0.5),
+    (("introduction", "background"), -0.5),
+)
+
+# Boost per tier index; the extra last slot is the no-match default
+PUB_TYPE_TIER_BOOSTS = np.array([boost for _, boost in PUB_TYPE_BOOSTS] + [DEFAULT_PUB_TYPE_BOOST], dtype=np.float64)
+SECTION_TIER_BOOSTS = np.array([boost for _, boost in SECTION_BOOSTS] + [0.0], dtype=np.float64)
+
+
+def _compile_tiers(tiers: Tiers) -> Tuple[Dict[str, int], "re.Pattern[str]", int]:
+    """Builds a keyword -> tier index map, one alternation regex (higher tiers first), and the no-match index."""
+    tier_of = {keyword: i for i, (keywords, _) in enumerate(tiers) for keyword in keywords}
+    return tier_of, re.compile("|".join(re.escape(keyword) for keyword in tier_of)), len(tiers)
+
+_PUB_TYPE_MATCHER = _compile_tiers(PUB_TYPE_BOOSTS)
+_SECTION_MATCHER = _compile_tiers(SECTION_BOOSTS)
+
+
+def _tier_index(value: Any, matcher: Tuple[Dict[str, int], "re.Pattern[str]", int]) -> int:
+    """
+    Returns the highest-priority tier with a keyword in value, in a single pass:
+    one regex scan for strings (substring semantics), one dict probe per item for lists (membership semantics).
+    """
+    tier_of, pattern, no_match = matcher
+    if isinstance(value, str):
+        hits = [tier_of[match.group()] for match in pattern.finditer(value)]
+    else:
+        hits = [tier_of[item] for item in value if item in tier_of]
+    return min(hits) if hits else no_match
+
+
+def classify_pub_types(publication_types: Any) -> int:
+    """Publication-type tier index for a publication_types list (or legacy comma-joined string)."""
+    return _tier_index(publication_types, _PUB_TYPE_MATCHER)
+
+
+def classify_section(header: str) -> int:
+    """Section tier index for a chunk's "Header 2" text."""
+    return _tier_index(header.lower(), _SECTION_MATCHER)
+
+
+def pub_type_rank(meta: Dict[str, Any]) -> int:
+    """Publication-type tier of a chunk: the stored `pub_type_rank` tag, else classified from `publication_types`."""
+    rank = meta.get("pub_type_rank")
+    if rank is None:
+        rank = classify_pub_types(meta.get("publication_types", ""))
+    return rank
+
+
+def section_tag(meta: Dict[str, Any]) -> int:
+    """Section tier of a chunk: the stored `section_tag` tag, else classified from its "Header 2"."""
+    tag = meta.get("section_tag")
+    if tag is None:
+        tag = classify_section(meta.get("Header 2", ""))
+    return tag
@@ -0,0 +1,51 @@
+import logging
+from functools import lru_cache
+
+from langchain_openai import ChatOpenAI
+
+from app.utils.config import settings
+from app.db.vector_store import AuraVectorStore
+
+logger = logging.getLogger(__name__)
+
+# --- Shared Process-Wide Resources ---
+# Each getter builds its object once per worker process and hands the same instance to every caller,
+# so the Qdrant connection pool, embedding clients, and LLM HTTP pools are never duplicated.
+# The core classes are imported inside the getters to avoid circular imports (qa_chain -> retriever -> resources).
+
+@lru_cache(maxsize=1)
+def get_vector_store() -> AuraVectorStore:
+    """Returns the shared AuraVectorStore (Qdrant client + embedding models)."""
+    logger.info("Initializing shared AuraVectorStore...")
+    return AuraVectorStore()
+
+@lru_cache(maxsize=8)
+def get_chat_llm(model_name: str, temperature: float) -> ChatOpenAI:
+    """Returns a shared ChatOpenAI client per (model, temperature), so its HTTP connection pool is reused."""
+    logger.info(f"Initializing shared ChatOpenAI client ({model_name}, temperature={temperature})...")
+    return ChatOpenAI(
+        model=model_name,
+        api_key=settings.OPENAI_API_KEY,
+        temperature=temperature
+    )
+
+@lru_cache(maxsize=1)
+def get_retriever():
+    """Returns the shared AuraRetriever (query parser + vector store handle)."""
+    from app.core.retriever import AuraRetriever
+    logger.info("Initializing shared AuraRetriever...")
+    return AuraRetriever()
+
+@lru_cache(maxsize=1)
+def get_qa_chain():
+    """Returns the shared AuraQAChain (retriever + answer LLM)."""
+    from app.core.qa_chain import AuraQAChain
+    logger.info("Initializing shared AuraQAChain...")
+    return AuraQAChain()
+
+@lru_cache(maxsize=1)
+def get_chat_engine():
+    """Returns the shared AuraChatEngine, which holds the in-memory session histories."""
+    from app.core.chat_engine import AuraChatEngine
+    logger.info("Initializing shared AuraChatEngine...")
+    return AuraChatEngine()
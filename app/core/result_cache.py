@@ -0,0 +1,94 @@
+import logging
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, List, Optional, Tuple
+
+import numpy as np
+from langchain_core.documents import Document
+
+logger = logging.getLogger(__name__)
+
+class SemanticResultCache:
+    """
+    Bounded LRU of final retrieval results keyed by the query embedding.
+    A lookup hits when a cached query in the same filter scope has cosine similarity >= threshold,
+    so near-duplicate questions skip Stages 1-4 entirely.
+    Entries are tagged with the vector store generation and dropped once the indexes change.
+    """
+
+    def __init__(self, maxsize: int = 512, threshold: float = 0.95):
+        self.maxsize = maxsize
+        self.threshold = threshold
+        self._entries: "OrderedDict[Tuple[Hashable, str], Tuple[np.ndarray, List[Document]]]" = OrderedDict()
+        self._generation: Optional[int] = None
+        self._lock = threading.Lock()
+        
+        # Stacked unit vectors per scope, rebuilt lazily after a put so repeated lookups are one matmul
+        self._scope_matrices: Dict[Hashable, Tuple[List[Tuple[Hashable, str]], np.ndarray]] = {}
+
+    def get(self, query: str, vector: List[float], scope: Hashable, generation: int) -> Optional[List[Document]]:
+        """
+        Returns the cached documents of the most similar query within `scope`, or None on a miss.
+
+        Args:
+            query (str): The search term (exact matches are served without a similarity scan).
+            vector (List[float]): The dense embedding of the search term.
+            scope (Hashable): Everything besides the query text that shapes the result (e.g. metadata filters).
+            generation (int): The current vector store generation.
+
+        Returns:
+            Optional[List[Document]]: A copy of the cached result list, or None.
+        """
+        with self._lock:
+            self._check_generation(generation)
+            key = (scope, query)
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                return list(self._entries[key][1])
+
+            candidates, matrix = self._scope_matrix(scope)
+            if not candidates:
+                return None
+            similarities = matrix @ _unit(vector)
+            best = int(np.argmax(similarities))
+            if similarities[best] < self.threshold:
+                return None
+
+            hit = candidates[best]
+            self._entries.move_to_end(hit)
+            logger.info(f"Semantic cache hit (cosine {similarities[best]:.3f}) on cached query: '{hit[1]}'")
+            return list(self._entries[hit][1])
+
+    def put(self, query: str, vector: List[float], scope: Hashable, generation: int, docs: List[Document]) -> None:
+        """Stores a final retrieval result, evicting the least recently used entry when full."""
+        with self._lock:
+            self._check_generation(generation)
+            self._entries[(scope, query)] = (_unit(vector), list(docs))
+            self._entries.move_to_end((scope, query))
+            self._scope_matrices.pop(scope, None)
+            while len(self._entries) > self.maxsize:
+                (evicted_scope, _), _ = self._entries.popitem(last=False)
+                self._scope_matrices.pop(evicted_scope, None)
+
+    def _scope_matrix(self, scope: Hashable) -> Tuple[List[Tuple[Hashable, str]], Optional[np.ndarray]]:
+        """Returns the keys and stacked vectors of a scope's entries, building them on first use. Caller holds the lock."""
+        cached = self._scope_matrices.get(scope)
+        if cached is None:
+            keys = [k for k in self._entries if k[0] == scope]
+            matrix = np.stack([self._entries[k][0] for k in keys]) if keys else None
+            cached = self._scope_matrices[scope] = (keys, matrix)
+        return cached
+
+    def _check_generation(self, generation: int) -> None:
+        """Drops every entry when the indexes have changed since they were cached. Caller holds the lock."""
+        if generation != self._generation:
+            self._entries.clear()
+            self._scope_matrices.clear()
+            self._generation = generation
+
+
+def _unit(vector: Any) -> np.ndarray:
+    """Returns the L2-normalized float32 copy of a vector, so cosine similarity is a dot product."""
+    v = np.asarray(vector, dtype=np.float32)
+    norm = np.linalg.norm(v)
+    return v / norm if norm else v
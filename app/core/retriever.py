@@ -1,18 +1,91 @@
 import logging
-from typing import List, Dict, Any, Tuple, Optional
+import concurrent.futures
+from typing import List, Dict, Any, Iterator, Tuple, Optional
 import datetime
 import re
-import math
+from collections import Counter
+from functools import lru_cache
 
+import numpy as np
 from langchain_core.documents import Document
+from qdrant_client.http import models
 from rank_bm25 import BM25Okapi
 
-from app.db.vector_store import AuraVectorStore
+from app.utils.config import settings
+from app.core.resources import get_vector_store
+from app.db.vector_store import RRF_K
 from app.core.query_parser import QueryParser
+from app.core.result_cache import SemanticResultCache
+from app.core.ranking import PUB_TYPE_TIER_BOOSTS, SECTION_TIER_BOOSTS, pub_type_rank, section_tag
 from app.models.schemas import ParsedQuery
 
 logger = logging.getLogger(__name__)
 
+# Explicit "PMID: 12345678" references in a raw query
+_PMID_RE = re.compile(r'PMID:?\s*(\d{7,8})', re.IGNORECASE)
+
+# Both indexes traverse int8-quantized vectors (INT8_QUANTIZATION in app.db.vector_store) and rescore an
+# oversampled candidate set with the full-precision vectors; ignored if a collection is not quantized
+QUANTIZED_SEARCH_PARAMS = models.SearchParams(
+    quantization=models.QuantizationSearchParams(rescore=True, oversampling=2.0)
+)
+
+# Recency boost 0.25 * exp(-age / 8) precomputed per whole year of age; older papers fall back to exp
+RECENCY_TABLE_YEARS = 64
+_RECENCY_TABLE = 0.25 * np.exp(-np.arange(RECENCY_TABLE_YEARS, dtype=np.float64) / 8)
+
+
+def _parse_pub_year(meta: Dict[str, Any]) -> float:
+    """Reads the publication year from chunk metadata, or NaN when it is missing or unparseable."""
+    pub_year = meta.get("pub_year", meta.get("publication_year"))
+    if pub_year and pub_year != "Unknown":
+        try:
+            return float(int(pub_year))
+        except ValueError:
+            pass
+    return float("nan")
+
+def _descending_order(scores: np.ndarray, head: int) -> Iterator[int]:
+    """
+    Yields indices by descending score, ties in index order (same as a stable argsort of -scores),
+    but only sorts the top `head` up front; the rest is sorted only if the caller reads past them.
+    """
+    n = len(scores)
+    if head >= n:
+        yield from np.argsort(-scores, kind="stable")
+        return
+        
+    # Top `head` by value; ties at the cut go to the lowest indices, as a stable sort would order them
+    cutoff = np.partition(scores, n - head)[n - head]
+    above = np.flatnonzero(scores > cutoff)
+    at_cutoff = np.flatnonzero(scores == cutoff)
+    top = np.concatenate((above, at_cutoff[:head - len(above)]))
+    yield from top[np.lexsort((top, -scores[top]))]
+    
+    rest = np.setdiff1d(np.arange(n), top, assume_unique=True)
+    yield from rest[np.lexsort((rest, -scores[rest]))]
+
+# Payload keys filtered by _qdrant_filter_for, in the order of its arguments (see AuraRetriever._filter_scope)
+_FILTER_KEYS = ("metadata.pub_year", "metadata.first_author_lastname", "metadata.is_human", "metadata.is_animal")
+
+@lru_cache(maxsize=1024)
+def _qdrant_filter_for(
+    publication_year: Optional[int],
+    first_author_lastname: Optional[str],
+    is_human: Optional[bool],
+    is_animal: Optional[bool]
+) -> Any:
+    """Builds (once per distinct combination) the Qdrant models.Filter for a set of metadata filter values, or None."""
+    values = (publication_year, first_author_lastname, is_human, is_animal)
+    # Empty year/surname values are no filter, but False is a real value for the study-population flags
+    must_conditions = [
+        models.FieldCondition(key=key, match=models.MatchValue(value=value))
+        for key, value in zip(_FILTER_KEYS, values)
+        if value or isinstance(value, bool)
+    ]
+    return models.Filter(must=must_conditions) if must_conditions else None
+
+
 class AuraRetriever:
     """
     Implements a High-Performance Two-Stage Hybrid Retrieval Pipeline.
@@ -24,7 +97,7 @@ class AuraRetriever:
 
     def __init__(self) -> None:
         """Initializes the retriever with vector store connection and tunable hyperparameters."""
-        self.vector_store = AuraVectorStore()
+        self.vector_store = get_vector_store()
         self.query_parser = QueryParser()
         
         # Adjustable Hyperparameters
@@ -32,6 +105,23 @@ class AuraRetriever:
         self.chunk_top_k: int = 80
         self.max_chunks_per_article: int = 5
         self.target_return_size: int = 30
+        
+        # Cascade early-stop: skip Stage 2 when each of the top early_stop_top_n Stage 1 abstracts has a fused score of
+        # at least early_stop_threshold (by default: ranked about top early_stop_top_n in both the dense and the sparse search,
+        # i.e. twice the fused score of rank early_stop_top_n - 1, counted from 0; see RRF_K)
+        self.early_stop_top_n: int = 5
+        self.early_stop_threshold: Optional[float] = 2 / (RRF_K + self.early_stop_top_n - 1) if settings.STAGE_1_EARLY_STOP else None
+        
+        # When set, reranked chunks carry aura_rerank_score / aura_base_vector_score in their metadata for inspection
+        self.debug_scores: bool = False
+        
+        # Optional cache of final results for near-duplicate queries
+        self._result_cache: Optional[SemanticResultCache] = None
+        if settings.SEMANTIC_RESULT_CACHE:
+            self._result_cache = SemanticResultCache(settings.SEMANTIC_RESULT_CACHE_SIZE, settings.SEMANTIC_RESULT_CACHE_THRESHOLD)
+        
+        # Background threads for speculative raw-query retrieval during query parsing
+        self._speculation_pool = concurrent.futures.ThreadPoolExecutor(max_workers=4, thread_name_prefix="retrieval-speculation")
 
     def retrieve(self, raw_query: str, bypass_stage_1: bool = False) -> List[Document]:
         """
@@ -46,96 +136,252 @@ class AuraRetriever:
         """
         logger.info(f"Starting retrieval pipeline for query: '{raw_query}' (Bypass Stage 1: {bypass_stage_1})")
         
+        # Speculatively search with the raw query while the parser LLM call runs
+        speculative_search = self._start_speculative_search(raw_query, bypass_stage_1)
+        
         # 1. Parse Query
         parsed_query = self.query_parser.parse(raw_query)
         
-        # Print parsed query to terminal for inspection
-        print("\n" + "-"*60)
-        print("🔍 PARSED QUERY INSPECTION:")
-        for k, v in parsed_query.model_dump().items():
-            print(f"  {k}: {v}")
-        print("-" * 60 + "\n")
+        # Parsed query inspection, serialized only when DEBUG logging is enabled
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("Parsed query: %s", parsed_query.model_dump_json())
+
+        # Keep the speculative results only if the parser left the query essentially unchanged and unfiltered
+        speculative_chunks = self._resolve_speculative_search(speculative_search, raw_query, parsed_query, bypass_stage_1)
 
         if parsed_query.clarification_required:
             logger.warning(f"Ambiguous query detected: {parsed_query.clarification_required}")
-            return [Document(
-                page_content=f"System Alert: Do not answer the user's question. Instead, ask them this clarification: {parsed_query.clarification_required}",
-                metadata={"type": "clarification"}
-            )]
+            return [self._clarification_document(parsed_query)]
             
         search_term = parsed_query.optimized_query or raw_query
         
         # --- EXPLICIT PMID OVERRIDE ---
-        extracted_pmids = re.findall(r'PMID:?\s*(\d{7,8})', raw_query, re.IGNORECASE)
+        extracted_pmids = _PMID_RE.findall(raw_query)
         
         if bypass_stage_1:
             logger.info("Bypassing Stage 1: Executing Global Fallback Search on Index B.")
-            raw_chunks = self._stage_2_global_chunk_search(search_term, parsed_query)
+            raw_chunks = speculative_chunks if speculative_chunks is not None else self._stage_2_global_chunk_search(search_term, parsed_query)
             final_chunks = [doc for doc, _ in raw_chunks][:self.target_return_size]
             logger.info(f"Fallback complete. Yielding {len(final_chunks)} chunks directly from Native Hybrid search.")
             return final_chunks
             
         elif extracted_pmids:
             logger.info(f"Explicit PMIDs detected in query: {extracted_pmids}. Bypassing Stage 1.")
-            candidate_pmids = list(set(extracted_pmids))
-            raw_chunks = self._stage_2_chunk_search(search_term, candidate_pmids)
+            candidate_pmids = list(dict.fromkeys(extracted_pmids))
+            raw_chunks = speculative_chunks if speculative_chunks is not None else self._stage_2_chunk_search(search_term, candidate_pmids)
         else:
-            # 2. Stage 1: Candidate Article Retrieval (Index A)
-            candidate_pmids = self._stage_1_abstract_search(search_term, parsed_query)
+            # Near-duplicate of a recent query with the same filters: reuse its final result
+            if self._result_cache is not None:
+                cache_scope = self._filter_scope(parsed_query)
+                query_vector = self.vector_store.embed_query(search_term)[0]
+                cached_chunks = self._result_cache.get(search_term, query_vector, cache_scope, self.vector_store.generation)
+                if cached_chunks is not None:
+                    logger.info(f"Semantic result cache hit. Yielding {len(cached_chunks)} cached chunks.")
+                    return cached_chunks
+                    
+            # 2 & 3. Stage 1 (Index A candidates) then Stage 2 (Index B chunks restricted to candidates)
+            candidate_pmids, raw_chunks = speculative_chunks or self._search_candidates(search_term, parsed_query)
             if not candidate_pmids:
                 logger.warning("No candidate abstracts found. Aborting retrieval.")
                 return []
-                
-            # 3. Stage 2: Chunk-Level Retrieval (Index B) Restricted to Candidates
-            raw_chunks = self._stage_2_chunk_search(search_term, candidate_pmids)
             
         if not raw_chunks:
             logger.warning("No body chunks found for query.")
             return []
             
-        # 4. Stage 3: Metadata-Aware Reranking
-        reranked_chunks = self._stage_3_rerank(raw_chunks, parsed_query)
+        # 4 & 5. Stage 3 (Metadata-Aware Reranking) fused with Stage 4 (Diversity Filtering)
+        final_chunks = self._rerank_and_diversify(raw_chunks, parsed_query)
         
-        # 5. Stage 4: Diversity Filtering
-        final_chunks = self._stage_4_diversity_filter(reranked_chunks)
+        if self._result_cache is not None and not extracted_pmids:
+            self._result_cache.put(search_term, query_vector, cache_scope, self.vector_store.generation, final_chunks)
         
         logger.info(f"Retrieval complete. Yielding {len(final_chunks)} perfectly curated chunks.")
         return final_chunks
 
+    def _search_candidates(self, search_term: str, parsed_query: ParsedQuery) -> Tuple[List[str], List[Tuple[Document, float]]]:
+        """Runs Stage 1 (candidate PMIDs from Index A) then Stage 2 (chunks restricted to those PMIDs), unless Stage 1 is confident."""
+        candidate_pmids, stage_1_hits = self._stage_1_abstract_search(search_term, parsed_query)
+        if not candidate_pmids:
+            return [], []
+        confident_abstracts = self._stage_1_early_stop(stage_1_hits)
+        if confident_abstracts is not None:
+            return candidate_pmids, confident_abstracts
+        return candidate_pmids, self._stage_2_chunk_search(search_term, candidate_pmids)
+
+    def retrieve_batch(self, raw_queries: List[str]) -> List[List[Document]]:
+        """
+        Batch version of retrieve for concurrent query workloads. Queries are parsed concurrently,
+        embedded in a single request, and each search stage runs for all queries in one Qdrant round-trip.
+        Results match calling retrieve per query (the speculative search and the semantic result cache are not used).
+
+        Args:
+            raw_queries (List[str]): The raw user or chat-engine queries.
+
+        Returns:
+            List[List[Document]]: The retrieved chunks of each query, in query order.
+        """
+        logger.info(f"Starting batch retrieval pipeline for {len(raw_queries)} queries.")
+        results: List[List[Document]] = [[] for _ in raw_queries]
+        if not raw_queries:
+            return results
+            
+        # 1. Parse all queries concurrently (one LLM call each, or coalesced with QUERY_PARSER_BATCHING)
+        with concurrent.futures.ThreadPoolExecutor(max_workers=min(len(raw_queries), 8), thread_name_prefix="batch-parse") as pool:
+            parsed_queries = list(pool.map(self.query_parser.parse, raw_queries))
+            
+        search_terms: Dict[int, str] = {}
+        candidates: Dict[int, List[str]] = {}
+        for i, (raw_query, parsed_query) in enumerate(zip(raw_queries, parsed_queries)):
+            if parsed_query.clarification_required:
+                logger.warning(f"Ambiguous query detected: {parsed_query.clarification_required}")
+                results[i] = [self._clarification_document(parsed_query)]
+                continue
+            search_terms[i] = parsed_query.optimized_query or raw_query
+            extracted_pmids = _PMID_RE.findall(raw_query)
+            if extracted_pmids:
+                candidates[i] = list(dict.fromkeys(extracted_pmids))
+                
+        # Embed every search term in one request; both batched stages then hit the embedding cache
+        if search_terms:
+            self.vector_store.embed_queries(list(search_terms.values()))
+            
+        # 2. Stage 1 for every query without explicit PMIDs, in one batched search on Index A
+        raw_chunks: Dict[int, List[Tuple[Document, float]]] = {}
+        stage_1 = [i for i in search_terms if i not in candidates]
+        if stage_1:
+            try:
+                stage_1_hits = self.vector_store.hybrid_search_batch(
+                    self.vector_store.collection_a,
+                    [search_terms[i] for i in stage_1],
+                    k=self.abstract_top_n * 2,
+                    filters=[self._build_qdrant_filter(parsed_queries[i]) for i in stage_1],
+                    search_params=QUANTIZED_SEARCH_PARAMS,
+                    relevance_scores=False
+                )
+            except Exception as e:
+                logger.error(f"Batched Stage 1 search failed: {e}")
+                # Failsafe: search one query at a time, each with its own unfiltered retry
+                stage_1_hits = [self._stage_1_abstract_search(search_terms[i], parsed_queries[i])[1] for i in stage_1]
+            for i, hits in zip(stage_1, stage_1_hits):
+                candidates[i] = self._candidate_pmids(hits)
+                confident_abstracts = self._stage_1_early_stop(hits) if candidates[i] else None
+                if confident_abstracts is not None:
+                    raw_chunks[i] = confident_abstracts
+                    
+        # 3. Stage 2 for every query with candidates, in one batched search on Index B
+        stage_2 = [i for i, pmids in candidates.items() if pmids and i not in raw_chunks]
+        if stage_2:
+            stage_2_hits = self.vector_store.hybrid_search_batch(
+                self.vector_store.collection_b,
+                [search_terms[i] for i in stage_2],
+                k=self.chunk_top_k,
+                filters=[self._pmid_filter(candidates[i]) for i in stage_2],
+                search_params=QUANTIZED_SEARCH_PARAMS
+            )
+            raw_chunks.update(zip(stage_2, stage_2_hits))
+            
+        # 4 & 5. Stage 3 (Metadata-Aware Reranking) fused with Stage 4 (Diversity Filtering), per query
+        for i, chunks in raw_chunks.items():
+            if chunks:
+                results[i] = self._rerank_and_diversify(chunks, parsed_queries[i])
+                
+        logger.info(f"Batch retrieval complete. Yielding {sum(map(len, results))} chunks across {len(raw_queries)} queries.")
+        return results
+
+    @staticmethod
+    def _clarification_document(parsed_query: ParsedQuery) -> Document:
+        """The pseudo-document instructing the LLM to ask the user for clarification instead of answering."""
+        return Document(
+            page_content=f"System Alert: Do not answer the user's question. Instead, ask them this clarification: {parsed_query.clarification_required}",
+            metadata={"type": "clarification"}
+        )
+
+    def _start_speculative_search(self, raw_query: str, bypass_stage_1: bool) -> Optional[concurrent.futures.Future]:
+        """
+        Submits the raw-query search for whichever path the query will take (global fallback, explicit PMIDs,
+        or Stage 1 + 2), to run while the parser LLM call is in flight. Returns None when speculation is disabled.
+        """
+        if not settings.SPECULATIVE_RAW_QUERY_RETRIEVAL:
+            return None
+        if bypass_stage_1:
+            return self._speculation_pool.submit(self._stage_2_global_chunk_search, raw_query, ParsedQuery())
+        extracted_pmids = _PMID_RE.findall(raw_query)
+        if extracted_pmids:
+            return self._speculation_pool.submit(self._stage_2_chunk_search, raw_query, list(dict.fromkeys(extracted_pmids)))
+        return self._speculation_pool.submit(self._search_candidates, raw_query, ParsedQuery())
+
+    def _resolve_speculative_search(
+        self,
+        speculative_search: Optional[concurrent.futures.Future],
+        raw_query: str,
+        parsed_query: ParsedQuery,
+        bypass_stage_1: bool
+    ) -> Any:
+        """Returns the speculative search result if it stands in for the parsed query, cancelling it otherwise."""
+        if speculative_search is None:
+            return None
+        if self._speculation_usable(raw_query, parsed_query, bypass_stage_1):
+            logger.info("Optimized query matches the raw query. Reusing speculative search results.")
+            return speculative_search.result()
+        speculative_search.cancel()
+        return None
+
+    def _speculation_usable(self, raw_query: str, parsed_query: ParsedQuery, bypass_stage_1: bool = False) -> bool:
+        """True if raw-query search results stand in for the parsed query: no clarification, no filters, near-identical terms."""
+        if parsed_query.clarification_required:
+            return False
+        # Explicit-PMID searches ignore metadata filters, so only the search terms need to match there
+        explicit_pmids = not bypass_stage_1 and _PMID_RE.search(raw_query)
+        if not explicit_pmids and self._build_qdrant_filter(parsed_query) is not None:
+            return False
+        raw_tokens = set(raw_query.lower().split())
+        optimized_tokens = set((parsed_query.optimized_query or raw_query).lower().split())
+        union = raw_tokens | optimized_tokens
+        if not union:
+            return False
+        return len(raw_tokens & optimized_tokens) / len(union) >= settings.SPECULATIVE_QUERY_JACCARD
+
     def stream_retrieve(self, raw_query: str, bypass_stage_1: bool = False):
         """Streaming generator version of retrieve that yields status updates and returns docs."""
         logger.info(f"Starting stream retrieval pipeline for query: '{raw_query}' (Bypass Stage 1: {bypass_stage_1})")
         
+        # Speculatively search with the raw query while the parser LLM call runs
+        speculative_search = self._start_speculative_search(raw_query, bypass_stage_1)
+        
         parsed_query = self.query_parser.parse(raw_query)
         
+        # Keep the speculative results only if the parser left the query essentially unchanged and unfiltered
+        speculative_chunks = self._resolve_speculative_search(speculative_search, raw_query, parsed_query, bypass_stage_1)
+        
         if parsed_query.clarification_required:
             logger.warning(f"Ambiguous query detected: {parsed_query.clarification_required}")
-            yield {"type": "result", "docs": [Document(
-                page_content=f"System Alert: Do not answer the user's question. Instead, ask them this clarification: {parsed_query.clarification_required}",
-                metadata={"type": "clarification"}
-            )]}
+            yield {"type": "result", "docs": [self._clarification_document(parsed_query)]}
             return
             
         search_term = parsed_query.optimized_query or raw_query
-        extracted_pmids = re.findall(r'PMID:?\s*(\d{7,8})', raw_query, re.IGNORECASE)
+        extracted_pmids = _PMID_RE.findall(raw_query)
         
         if bypass_stage_1:
             logger.info("Bypassing Stage 1: Executing Global Fallback Search on Index B.")
             yield {"type": "status", "message": "Performing more extensive research..."}
-            raw_chunks = self._stage_2_global_chunk_search(search_term, parsed_query)
+            raw_chunks = speculative_chunks if speculative_chunks is not None else self._stage_2_global_chunk_search(search_term, parsed_query)
             final_chunks = [doc for doc, _ in raw_chunks][:self.target_return_size]
             yield {"type": "result", "docs": final_chunks}
             return
             
         elif extracted_pmids:
             logger.info(f"Explicit PMIDs detected in query: {extracted_pmids}. Bypassing Stage 1.")
-            candidate_pmids = list(set(extracted_pmids))
+            candidate_pmids = list(dict.fromkeys(extracted_pmids))
             yield {"type": "status", "message": "Retrieving the relevant articles..."}
-            raw_chunks = self._stage_2_chunk_search(search_term, candidate_pmids)
+            raw_chunks = speculative_chunks if speculative_chunks is not None else self._stage_2_chunk_search(search_term, candidate_pmids)
         else:
             # 2. Stage 1: Candidate Article Retrieval (Index A)
             yield {"type": "status", "message": "Scanning PubMed abstracts..."}
-            candidate_pmids = self._stage_1_abstract_search(search_term, parsed_query)
+            if speculative_chunks is not None:
+                candidate_pmids, raw_chunks = speculative_chunks
+            else:
+                candidate_pmids, stage_1_hits = self._stage_1_abstract_search(search_term, parsed_query)
+                raw_chunks = self._stage_1_early_stop(stage_1_hits)
             if not candidate_pmids:
                 logger.warning("No candidate abstracts found. Yielding fallback trigger.")
                 yield {"type": "fallback_trigger"}
@@ -144,7 +390,8 @@ class AuraRetriever:
                 
             # 3. Stage 2: Chunk-Level Retrieval (Index B) Restricted to Candidates
             yield {"type": "status", "message": "Retrieving the relevant articles..."}
-            raw_chunks = self._stage_2_chunk_search(search_term, candidate_pmids)
+            if raw_chunks is None:
+                raw_chunks = self._stage_2_chunk_search(search_term, candidate_pmids)
             
         if not raw_chunks:
             logger.warning("No body chunks found for query. Yielding fallback trigger.")
@@ -152,15 +399,19 @@ class AuraRetriever:
             yield {"type": "result", "docs": []}
             return
             
-        # 4. Stage 3: Metadata-Aware Reranking
-        reranked_chunks = self._stage_3_rerank(raw_chunks, parsed_query)
-        
-        # 5. Stage 4: Diversity Filtering
-        final_chunks = self._stage_4_diversity_filter(reranked_chunks)
+        # 4 & 5. Stage 3 (Metadata-Aware Reranking) fused with Stage 4 (Diversity Filtering)
+        final_chunks = self._rerank_and_diversify(raw_chunks, parsed_query)
         
         logger.info(f"Stream Retrieval complete. Yielding {len(final_chunks)} perfectly curated chunks.")
         yield {"type": "result", "docs": final_chunks}
 
+    def _filter_scope(self, parsed_query: ParsedQuery) -> Tuple[Any, ...]:
+        """The metadata filter values that shape a result, as a hashable key (the arguments of _qdrant_filter_for)."""
+        meta = parsed_query.metadata_filters
+        if not meta:
+            return ()
+        return (meta.publication_year, meta.first_author_lastname, meta.is_human, meta.is_animal)
+
     def _build_qdrant_filter(self, parsed_query: ParsedQuery) -> Any:
         """
         Translates the Pydantic MetadataFilters into a Qdrant-compliant models.Filter object.
@@ -171,48 +422,10 @@ class AuraRetriever:
         Returns:
             Any: A Qdrant models.Filter object or None.
         """
-        from qdrant_client.http import models
-        if not parsed_query.metadata_filters:
-            return None
-            
-        must_conditions = []
-        meta = parsed_query.metadata_filters
-        
-        if meta.publication_year:
-            must_conditions.append(
-                models.FieldCondition(
-                    key="metadata.pub_year",
-                    match=models.MatchValue(value=meta.publication_year)
-                )
-            )
-        if meta.first_author_lastname:
-            must_conditions.append(
-                models.FieldCondition(
-                    key="metadata.first_author_lastname",
-                    match=models.MatchValue(value=meta.first_author_lastname)
-                )
-            )
-        if meta.is_human is not None:
-            must_conditions.append(
-                models.FieldCondition(
-                    key="metadata.is_human",
-                    match=models.MatchValue(value=meta.is_human)
-                )
-            )
-        if meta.is_animal is not None:
-            must_conditions.append(
-                models.FieldCondition(
-                    key="metadata.is_animal",
-                    match=models.MatchValue(value=meta.is_animal)
-                )
-            )
-            
-        if not must_conditions:
-            return None
-            
-        return models.Filter(must=must_conditions)
+        scope = self._filter_scope(parsed_query)
+        return _qdrant_filter_for(*scope) if scope else None
 
-    def _stage_1_abstract_search(self, search_term: str, parsed_query: ParsedQuery) -> List[str]:
+    def _stage_1_abstract_search(self, search_term: str, parsed_query: ParsedQuery) -> Tuple[List[str], List[Tuple[Document, float]]]:
         """
         Performs Dense/Hybrid Search on Index A (Abstracts) to derive candidate PMIDs.
 
@@ -221,37 +434,67 @@ class AuraRetriever:
             parsed_query (ParsedQuery): The parsed object containing filters.
 
         Returns:
-            List[str]: A list of candidate PMIDs extracted from the top retrieved abstracts.
+            Tuple[List[str], List[Tuple[Document, float]]]: The candidate PMIDs extracted from the top retrieved abstracts,
+            and the retrieved abstracts with their raw RRF-fused scores (for the cascade early-stop).
         """
         logger.info(f"Executing Stage 1 Search on Index A. Term: '{search_term}'")
         
         stage_1_filter = self._build_qdrant_filter(parsed_query)
-        kwargs = {"query": search_term, "k": self.abstract_top_n * 2}
+        # Stage 1 only ranks, so it keeps the fused scores, which the early-stop check can compare across queries
+        kwargs = {"query": search_term, "k": self.abstract_top_n * 2, "search_params": QUANTIZED_SEARCH_PARAMS, "relevance_scores": False}
         
         if stage_1_filter:
             logger.info(f"Applying strict Stage 1 Qdrant metadata filter.")
             kwargs["filter"] = stage_1_filter
             
         try:
-            results = self.vector_store.collection_a.similarity_search_with_relevance_scores(**kwargs)
+            results = self.vector_store.hybrid_search(self.vector_store.collection_a, **kwargs)
         except Exception as e:
             logger.error(f"Stage 1 search failed with filter: {e}")
             # Failsafe: drop the filter and try again
-            results = self.vector_store.collection_a.similarity_search_with_relevance_scores(
-                query=search_term, k=self.abstract_top_n * 2
+            results = self.vector_store.hybrid_search(
+                self.vector_store.collection_a, query=search_term, k=self.abstract_top_n * 2,
+                search_params=QUANTIZED_SEARCH_PARAMS, relevance_scores=False
             )
         
+        unique_pmids = self._candidate_pmids(results)
+        logger.info(f"Stage 1 complete. Isolated {len(unique_pmids)} candidate PMIDs.")
+        return unique_pmids, results
+
+    def _candidate_pmids(self, stage_1_hits: List[Tuple[Document, float]]) -> List[str]:
+        """The first abstract_top_n distinct PMIDs among the Stage 1 hits, in rank order."""
+        # Set for O(1) membership, list for rank order
         unique_pmids: List[str] = []
-        for doc, score in results:
+        seen_pmids = set()
+        for doc, score in stage_1_hits:
             pmid = doc.metadata.get("pmid")
-            if pmid and pmid not in unique_pmids:
+            if pmid and pmid not in seen_pmids:
+                seen_pmids.add(pmid)
                 unique_pmids.append(pmid)
                 if len(unique_pmids) == self.abstract_top_n:
                     break
-                    
-        logger.info(f"Stage 1 complete. Isolated {len(unique_pmids)} candidate PMIDs.")
         return unique_pmids
 
+    def _stage_1_early_stop(self, stage_1_hits: List[Tuple[Document, float]]) -> Optional[List[Tuple[Document, float]]]:
+        """
+        Cascade early-stop: when the top Stage 1 abstracts are all confident hits, returns them (with relevance scores,
+        like Stage 2 chunks) to be reranked directly in place of a Stage 2 search. Returns None when Stage 2 should run.
+
+        Args:
+            stage_1_hits (List[Tuple[Document, float]]): The Stage 1 abstracts with their raw RRF-fused scores.
+
+        Returns:
+            Optional[List[Tuple[Document, float]]]: The abstracts to rerank, or None.
+        """
+        if self.early_stop_threshold is None or len(stage_1_hits) < self.early_stop_top_n:
+            return None
+        if min(score for _, score in stage_1_hits[:self.early_stop_top_n]) < self.early_stop_threshold:
+            return None
+            
+        logger.info(f"Top {self.early_stop_top_n} Stage 1 abstracts are high-confidence. Skipping Stage 2.")
+        relevance_fn = self.vector_store.collection_a._select_relevance_score_fn()
+        return [(doc, relevance_fn(score)) for doc, score in stage_1_hits]
+
     def _stage_2_chunk_search(self, search_term: str, candidate_pmids: List[str]) -> List[Tuple[Document, float]]:
         """
         Restricts deep body search strictly to the subset of candidate PMIDs using Qdrant MatchAny.
@@ -263,10 +506,25 @@ class AuraRetriever:
         Returns:
             List[Tuple[Document, float]]: List of retrieved documents and their vector similarity scores.
         """
-        from qdrant_client.http import models
         logger.info("Executing Stage 2 Deep Search on Index B.")
         
-        pmid_filter = models.Filter(
+        pmid_filter = self._pmid_filter(candidate_pmids)
+        
+        # Reuses the Stage 1 embedding of the same search term from the vector store's cache
+        dense_results = self.vector_store.hybrid_search(
+            self.vector_store.collection_b,
+            query=search_term,
+            k=self.chunk_top_k,
+            filter=pmid_filter,
+            search_params=QUANTIZED_SEARCH_PARAMS
+        )
+        
+        return dense_results
+
+    @staticmethod
+    def _pmid_filter(candidate_pmids: List[str]) -> models.Filter:
+        """Qdrant filter restricting a search to the chunks of the given PMIDs."""
+        return models.Filter(
             must=[
                 models.FieldCondition(
                     key="metadata.pmid",
@@ -274,14 +532,6 @@ class AuraRetriever:
                 )
             ]
         )
-        
-        dense_results = self.vector_store.collection_b.similarity_search_with_relevance_scores(
-            query=search_term,
-            k=self.chunk_top_k,
-            filter=pmid_filter
-        )
-        
-        return dense_results
 
     def _stage_2_global_chunk_search(self, search_term: str, parsed_query: ParsedQuery) -> List[Tuple[Document, float]]:
         """
@@ -297,119 +547,86 @@ class AuraRetriever:
         logger.info("Executing Global Stage 2 Deep Search uniformly across Index B.")
         
         global_filter = self._build_qdrant_filter(parsed_query)
-        kwargs = {"query": search_term, "k": self.chunk_top_k * 2}
+        kwargs = {"query": search_term, "k": self.chunk_top_k * 2, "search_params": QUANTIZED_SEARCH_PARAMS}
         
         if global_filter:
             logger.info("Applying strict Global Qdrant metadata filter on Index B.")
             kwargs["filter"] = global_filter
             
         try:
-            dense_results = self.vector_store.collection_b.similarity_search_with_relevance_scores(**kwargs)
+            dense_results = self.vector_store.hybrid_search(self.vector_store.collection_b, **kwargs)
         except Exception as e:
             logger.error(f"Global Index B search failed with filter: {e}")
-            dense_results = self.vector_store.collection_b.similarity_search_with_relevance_scores(
-                query=search_term, k=self.chunk_top_k * 2
+            dense_results = self.vector_store.hybrid_search(
+                self.vector_store.collection_b, query=search_term, k=self.chunk_top_k * 2, search_params=QUANTIZED_SEARCH_PARAMS
             )
             
         return dense_results
 
-    def _stage_3_rerank(self, scored_docs: List[Tuple[Document, float]], parsed_query: ParsedQuery) -> List[Tuple[Document, float]]:
-        """
-        Applies algorithmic boosts to favor RCTs, robust methodologies, and recent papers.
-
-        Args:
-            scored_docs (List[Tuple[Document, float]]): The baseline ranked documents.
-            parsed_query (ParsedQuery): Input queries.
-
-        Returns:
-            List[Tuple[Document, float]]: The custom reranked list of documents.
-        """
-        logger.info("Executing Stage 3 Custom Reranking.")
-        reranked: List[Tuple[Document, float]] = []
-        
+    def _stage_3_scores(self, scored_docs: List[Tuple[Document, float]]) -> np.ndarray:
+        """Computes the Stage 3 final score of each document (base score + publication type, section and recency boosts)."""
         current_year = datetime.datetime.now().year
+        n = len(scored_docs)
         
-        for doc, base_score in scored_docs:
-            meta = doc.metadata
-            final_score = base_score
-            
-            # --- PUBLICATION TYPE WEIGHTING ---
-            pub_types = meta.get("publication_types", "") 
-            if "Meta-Analysis" in pub_types:
-                final_score += 1.00
-            elif "Systematic Review" in pub_types:
-                final_score += 0.95
-            elif "Guideline" in pub_types or "Practice Guideline" in pub_types:
-                final_score += 0.90
-            elif "Randomized Controlled Trial" in pub_types:
-                final_score += 0.85
-            elif "Clinical Trial" in pub_types:
-                final_score += 0.75
-            elif "Review" in pub_types:
-                final_score += 0.55
-            elif "Case Reports" in pub_types:
-                final_score += 0.50
-            else:
-                final_score += 0.60 
-                
-            # --- SECTION WEIGHTING (Index B) ---
-            h2 = meta.get("Header 2", "").lower()
-            if "result" in h2:
-                final_score += 1.5
-            elif "conclusion" in h2:
-                final_score += 1.5
-            elif "method" in h2:
-                final_score += 1.0
-            elif "discussion" in h2:
-                final_score += 0.5
-            elif "introduction" in h2 or "background" in h2:
-                final_score -= 0.5
-                
-            # --- RECENCY BOOST ---
-            pub_year = meta.get("pub_year", meta.get("publication_year"))
-            if pub_year and pub_year != "Unknown":
-                try:
-                    year_diff = current_year - int(pub_year)
-                    if year_diff >= 0:
-                        recency_weight = 0.25 * math.exp(-year_diff / 8)
-                        final_score += recency_weight
-                except ValueError:
-                    pass
-                    
-            doc.metadata["aura_rerank_score"] = final_score
-            doc.metadata["aura_base_vector_score"] = base_score
-            reranked.append((doc, final_score))
-            
-        reranked.sort(key=lambda x: x[1], reverse=True)
-        return reranked
+        # Per-document tier lookups stay in Python; the arithmetic runs as NumPy arrays
+        base_scores = np.fromiter((score for _, score in scored_docs), dtype=np.float64, count=n)
+        # Tier tags are precomputed at ingest (app.core.ranking); older chunks without tags are classified here
+        pub_boosts = PUB_TYPE_TIER_BOOSTS[np.fromiter((pub_type_rank(doc.metadata) for doc, _ in scored_docs), dtype=np.intp, count=n)]
+        section_boosts = SECTION_TIER_BOOSTS[np.fromiter((section_tag(doc.metadata) for doc, _ in scored_docs), dtype=np.intp, count=n)]
+        
+        # --- RECENCY BOOST ---
+        year_diffs = current_year - np.fromiter((_parse_pub_year(doc.metadata) for doc, _ in scored_docs), dtype=np.float64, count=n)
+        recent = year_diffs >= 0 # False for unknown years (NaN) and future-dated records
+        in_table = recent & (year_diffs < RECENCY_TABLE_YEARS)
+        beyond_table = recent & ~in_table
+        recency = np.zeros(n)
+        recency[in_table] = _RECENCY_TABLE[year_diffs[in_table].astype(np.intp)]
+        recency[beyond_table] = 0.25 * np.exp(-year_diffs[beyond_table] / 8)
+        
+        return base_scores + pub_boosts + section_boosts + recency
 
-    def _stage_4_diversity_filter(self, ranked_docs: List[Tuple[Document, float]]) -> List[Document]:
+    def _rerank_and_diversify(self, scored_docs: List[Tuple[Document, float]], parsed_query: ParsedQuery) -> List[Document]:
         """
-        Enforces max_chunks per PMID to prevent review articles from dominating the LLM context.
+        Stage 3 (metadata-aware reranking: favors RCTs, robust methodologies, and recent papers) and Stage 4
+        (diversity filtering: at most max_chunks_per_article chunks per PMID, so review articles cannot dominate
+        the LLM context) in a single pass. Walks the documents in reranked order, enforcing the per-PMID cap as it
+        goes and stopping as soon as target_return_size chunks are selected, without materializing the full reranked list.
 
         Args:
-            ranked_docs (List[Tuple[Document, float]]): Custom reranked chunks.
+            scored_docs (List[Tuple[Document, float]]): The baseline ranked documents from Stage 2.
+            parsed_query (ParsedQuery): Input queries.
 
         Returns:
-            List[Document]: Truncated, diverse list of chunks constrained per article.
+            List[Document]: Truncated, diverse list of reranked chunks.
         """
-        logger.info("Executing Stage 4 Diversity Filtering.")
-        final_list: List[Document] = []
-        pmid_counts: Dict[str, int] = {}
+        logger.info("Executing Stage 3 Custom Reranking with inline Stage 4 Diversity Filtering.")
+        final_scores = self._stage_3_scores(scored_docs)
         
-        for doc, score in ranked_docs:
+        final_list: List[Document] = []
+        pmid_counts: Counter = Counter()
+        # Only the top target_return_size are sorted unless the per-PMID cap rejects some of them
+        for i in _descending_order(final_scores, self.target_return_size):
+            doc, base_score = scored_docs[i]
             pmid = doc.metadata.get("pmid", "Unknown")
-            
-            if pmid not in pmid_counts:
-                pmid_counts[pmid] = 0
-                
             if pmid_counts[pmid] >= self.max_chunks_per_article:
-                continue 
+                continue
                 
+            if self.debug_scores:
+                doc.metadata["aura_rerank_score"] = float(final_scores[i])
+                doc.metadata["aura_base_vector_score"] = base_score
             final_list.append(doc)
             pmid_counts[pmid] += 1
             
             if len(final_list) >= self.target_return_size:
                 break
                 
+        self._log_diversity_shortfall(len(final_list), len(scored_docs))
         return final_list
+
+    def _log_diversity_shortfall(self, returned: int, candidates: int) -> None:
+        """Warns when the per-PMID cap, rather than a lack of candidates, left the context under target_return_size."""
+        if returned < self.target_return_size and candidates > returned:
+            logger.warning(
+                f"Diversity filter returned {returned}/{self.target_return_size} chunks after rejecting "
+                f"{candidates - returned} over-cap chunks; consider raising chunk_top_k."
+            )
@@ -1,13 +1,163 @@
+import asyncio
+import gzip
+import hashlib
 import logging
-import http.client
-import urllib.error
-from typing import List, Dict, Optional, Any
-from Bio import Entrez
+import threading
+import time
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Tuple, TypeVar
+
+import httpx
+import orjson
+from cachetools import TTLCache
+from lxml import etree
 from app.utils.config import settings
+from app.utils.helpers import PMC_PARSER_OPTIONS, clean_pmc_article
+
+T = TypeVar("T")
 
 # Setup logging for production-grade visibility
 logger = logging.getLogger(__name__)
 
+EUTILS_BASE_URL = "https://eutils.ncbi.nlm.nih.gov/entrez/eutils"
+
+# PMIDs per PubMed EFetch request (NCBI's recommended maximum for a GET)
+PUBMED_EFETCH_BATCH_SIZE = 200
+# PMCIDs per PMC EFetch request: full-text articles are large, so batches stay well below the 200-ID URL limit
+PMC_EFETCH_BATCH_SIZE = 20
+_PMC_ARTICLE_ID = etree.XPath("string(front/article-meta/article-id[@pub-id-type='pmcid' or @pub-id-type='pmc'][1])")
+
+# Requests retry rate limiting and transient server errors with exponential backoff (0.3 s, 0.6 s, 1.2 s)
+_RETRY_STATUS = frozenset({429, 500, 502, 503, 504})
+MAX_RETRIES = 3
+RETRY_BACKOFF = 0.3
+
+# ESearch results memoized in memory per (term, retmax, retstart)
+ESEARCH_MEMO_SIZE = 1024
+
+# Disk cache TTLs (seconds): search hits drift as PubMed grows, fetched records are effectively immutable
+ESEARCH_CACHE_TTL = 24 * 60 * 60
+EFETCH_CACHE_TTL = 30 * 24 * 60 * 60
+# PMC links appear when embargoed full texts are released, so "no full text" answers expire daily
+ELINK_CACHE_TTL = 24 * 60 * 60
+# Part of the cleaned-body cache key: bump it after changing clean_pmc_article to invalidate cached bodies
+PMC_BODY_CACHE_FORMAT = 2
+
+
+class _RequestPacer:
+    """
+    Token bucket holding a single token, refilled at NCBI's per-second limit (10 requests/s with an API key,
+    3 without): every E-utilities request, blocking or async, reserves the next free slot and waits for it.
+    Slots are handed out under a thread lock and never awaited while held, so one pacer serves all threads and event loops.
+    """
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._next_slot = 0.0
+
+    def _reserve(self) -> float:
+        """Claims the next request slot and returns how long to wait for it."""
+        interval = 1.0 / (10 if settings.NCBI_API_KEY else 3)
+        with self._lock:
+            now = time.monotonic()
+            slot = max(now, self._next_slot)
+            self._next_slot = slot + interval
+        return slot - now
+
+    def wait(self) -> None:
+        """Blocks until this request may be sent."""
+        delay = self._reserve()
+        if delay > 0:
+            time.sleep(delay)
+
+    async def await_turn(self) -> None:
+        """Waits (without blocking the event loop) until this request may be sent."""
+        delay = self._reserve()
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+
+def _cache_path(endpoint: str, params: Dict[str, Any]) -> Path:
+    """Content-addressed location of a cached response: sha256 of the endpoint and its (credential-free) params."""
+    key = hashlib.sha256(orjson.dumps([endpoint, sorted(params.items())])).hexdigest()
+    return settings.NCBI_CACHE_DIR / key[:2] / f"{key}.gz"
+
+
+def _cache_get(endpoint: str, params: Dict[str, Any], ttl: int) -> Optional[bytes]:
+    """Returns the cached response for this request, or None when disabled, missing, expired, or unreadable."""
+    if not settings.NCBI_DISK_CACHE:
+        return None
+    path = _cache_path(endpoint, params)
+    try:
+        if time.time() - path.stat().st_mtime > ttl:
+            return None
+        return gzip.decompress(path.read_bytes())
+    except (OSError, EOFError):
+        return None
+
+
+def _cache_put(endpoint: str, params: Dict[str, Any], payload: bytes) -> None:
+    """Stores a successful response. Write failures are logged and otherwise ignored."""
+    if not settings.NCBI_DISK_CACHE or not payload:
+        return
+    path = _cache_path(endpoint, params)
+    try:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = path.with_suffix(".tmp")
+        tmp_path.write_bytes(gzip.compress(payload, compresslevel=1))
+        tmp_path.replace(path) # Atomic, so a crashed run never leaves a truncated entry
+    except OSError as e:
+        logger.warning(f"Could not write NCBI cache entry for {endpoint}: {e}")
+
+
+def _efetch_records_params(pmids: List[str]) -> Dict[str, Any]:
+    """Cache key params of one EFetch batch of PubMed records (also the request params, minus identification)."""
+    return {"db": "pubmed", "id": ",".join(pmids), "retmode": "xml", "rettype": "abstract"}
+
+
+def _cached_links(pmids: List[str]) -> Tuple[Dict[str, Optional[str]], List[str]]:
+    """Splits PMIDs into cached ELink results (PMID -> PMCID, or None without a PMC full text) and those still to fetch."""
+    found: Dict[str, Optional[str]] = {}
+    missing: List[str] = []
+    for pmid in pmids:
+        cached = _cache_get("elink", {"id": pmid}, ELINK_CACHE_TTL)
+        if cached is None:
+            missing.append(pmid)
+        else:
+            found[pmid] = orjson.loads(cached)
+    return found, missing
+
+
+def _store_links(pmids: List[str], pmid_to_pmcid: Dict[str, str]) -> None:
+    """Caches the ELink result of every fetched PMID, including the ones PMC has no full text for."""
+    for pmid in pmids:
+        _cache_put("elink", {"id": pmid}, orjson.dumps(pmid_to_pmcid.get(pmid)))
+
+
+def _pmc_body_cache_params(pmcid: str) -> Dict[str, Any]:
+    """Cache key params of one cleaned PMC body."""
+    return {"id": _normalize_pmcid(pmcid), "format": PMC_BODY_CACHE_FORMAT}
+
+
+def _normalize_pmcid(pmcid: str) -> str:
+    """Strips the optional 'PMC' prefix, since ELink returns bare numeric IDs and newer JATS uses 'PMC1234567'."""
+    pmcid = pmcid.strip()
+    return pmcid[3:] if pmcid.upper().startswith("PMC") else pmcid
+
+
+def _parse_elink_json(payload: bytes) -> Dict[str, str]:
+    """Reads a JSON ELink response (one linkset per PMID) into PMID -> first linked PMCID."""
+    pmid_to_pmcid: Dict[str, str] = {}
+    for result in orjson.loads(payload).get("linksets", []):
+        pmid_list = result.get("ids", [])
+        link_sets = result.get("linksetdbs", [])
+        if not pmid_list or not link_sets:
+            continue
+        links = link_sets[0].get("links", [])
+        if links:
+            pmid_to_pmcid[str(pmid_list[0])] = str(links[0])
+    return pmid_to_pmcid
+
 
 class NCBIClient:
     """
@@ -16,10 +166,121 @@ class NCBIClient:
     """
 
     def __init__(self) -> None:
-        """Initializes the Entrez client with API keys and email from system settings."""
-        Entrez.email = settings.NCBI_EMAIL
-        Entrez.api_key = settings.NCBI_API_KEY
+        """Initializes the E-utilities client with API keys and email from system settings."""
         self.tool = "AuraQuery"
+        
+        # One pooled keep-alive client for every blocking call, so batch loops pay the TCP + TLS handshake once
+        self._http = httpx.Client(
+            transport=httpx.HTTPTransport(
+                retries=MAX_RETRIES, # Connection failures only; status codes are retried in _request
+                limits=httpx.Limits(max_connections=20, max_keepalive_connections=20)
+            ),
+            timeout=120.0
+        )
+        
+        # In-process memo of ESearch results in front of the disk cache, so repeated searches in one run
+        # (retries, count-then-page loops) skip the network and the gzip round-trip alike
+        self._esearch_memo: TTLCache = TTLCache(maxsize=ESEARCH_MEMO_SIZE, ttl=ESEARCH_CACHE_TTL)
+        self._esearch_memo_lock = threading.Lock()
+        
+        # Spaces every request at NCBI's rate limit; the callers' semaphores only cap how many are in flight
+        self._pacer = _RequestPacer()
+
+    def _eutils_params(self, **params: Any) -> Dict[str, Any]:
+        """Adds the tool/email/api_key identification NCBI expects on every E-utilities request."""
+        params["tool"] = self.tool
+        params["email"] = settings.NCBI_EMAIL
+        if settings.NCBI_API_KEY:
+            params["api_key"] = settings.NCBI_API_KEY
+        return params
+
+    def _request(self, endpoint: str, params: Dict[str, Any]) -> httpx.Response:
+        """
+        Issues a blocking E-utilities GET on the pooled client, retrying rate-limit and transient server errors.
+
+        Args:
+            endpoint (str): The E-utility name, e.g. "esearch".
+            params (Dict[str, Any]): The request parameters (see _eutils_params).
+
+        Returns:
+            httpx.Response: The successful response.
+
+        Raises:
+            httpx.HTTPStatusError: If NCBI still answers with an error status after the retries.
+        """
+        url = f"{EUTILS_BASE_URL}/{endpoint}.fcgi"
+        for attempt in range(MAX_RETRIES + 1):
+            self._pacer.wait()
+            response = self._http.get(url, params=params)
+            if response.status_code not in _RETRY_STATUS or attempt == MAX_RETRIES:
+                break
+            time.sleep(RETRY_BACKOFF * 2 ** attempt)
+        response.raise_for_status()
+        return response
+
+    async def _arequest(self, client: httpx.AsyncClient, endpoint: str, params: Dict[str, Any], post: bool = False) -> httpx.Response:
+        """
+        Async counterpart of _request on a caller-owned client. Also retries connection failures, since the
+        shared async clients are created without transport-level retries.
+
+        Args:
+            client (httpx.AsyncClient): The caller-owned client whose connection pool is reused across fetches.
+            endpoint (str): The E-utility name, e.g. "efetch".
+            params (Dict[str, Any]): The request parameters (see _eutils_params).
+            post (bool, optional): Send the parameters as a form body, for ID lists too long for a URL. Defaults to False.
+
+        Returns:
+            httpx.Response: The successful response.
+
+        Raises:
+            httpx.HTTPStatusError: If NCBI still answers with an error status after the retries.
+            httpx.TransportError: If the connection still fails after the retries.
+        """
+        url = f"{EUTILS_BASE_URL}/{endpoint}.fcgi"
+        for attempt in range(MAX_RETRIES + 1):
+            await self._pacer.await_turn()
+            try:
+                response = await (client.post(url, data=params) if post else client.get(url, params=params))
+                if response.status_code not in _RETRY_STATUS or attempt == MAX_RETRIES:
+                    break
+                reason = f"HTTP {response.status_code}"
+            except httpx.TransportError as e:
+                if attempt == MAX_RETRIES:
+                    raise
+                reason = repr(e)
+            logger.warning(f"Retrying {endpoint} after {reason} (attempt {attempt + 1}/{MAX_RETRIES})")
+            await asyncio.sleep(RETRY_BACKOFF * 2 ** attempt)
+        response.raise_for_status()
+        return response
+
+    def _esearch_cached(self, term: str, retmax: int, retstart: int = 0) -> Dict[str, Any]:
+        """
+        Runs a PubMed ESearch through the in-process memo and the disk cache. Errors propagate to the caller and are never cached.
+
+        Returns:
+            Dict[str, Any]: {"Count": total hits, "IdList": PMIDs of the requested page}.
+        """
+        memo_key = (term, retmax, retstart)
+        with self._esearch_memo_lock:
+            memoized = self._esearch_memo.get(memo_key)
+        if memoized is not None:
+            return {"Count": memoized["Count"], "IdList": list(memoized["IdList"])}
+
+        params = {"db": "pubmed", "term": term, "retmax": retmax, "retstart": retstart}
+        cached = _cache_get("esearch", params, ESEARCH_CACHE_TTL)
+        if cached is not None:
+            logger.debug(f"ESearch cache hit for: {term}")
+            result = orjson.loads(cached)
+        else:
+            response = self._request("esearch", self._eutils_params(**params, retmode="json"))
+            record = orjson.loads(response.content).get("esearchresult", {})
+
+            result = {"Count": int(record.get("count", 0)), "IdList": [str(pmid) for pmid in record.get("idlist", [])]}
+            _cache_put("esearch", params, orjson.dumps(result))
+
+        with self._esearch_memo_lock:
+            self._esearch_memo[memo_key] = {"Count": result["Count"], "IdList": tuple(result["IdList"])}
+        return result
 
     def search_pmids(self, query: str, max_results: int = 10, retstart: int = 0) -> List[str]:
         """
@@ -36,140 +297,177 @@ class NCBIClient:
         logger.info(
             f"Searching PubMed with query: {query} (start={retstart}, max={max_results})")
         try:
-            handle = Entrez.esearch(
-                db="pubmed",
-                term=query,
-                retmax=max_results,
-                retstart=retstart
-            )
-            record = Entrez.read(handle)
-            handle.close()
-
-            pmids: List[str] = record.get("IdList", [])
+            pmids: List[str] = self._esearch_cached(query, max_results, retstart)["IdList"]
             logger.info(f"Found {len(pmids)} PMIDs in this batch.")
             return pmids
-        except urllib.error.HTTPError as e:
-            logger.error(f"HTTPError during NCBI search (Code {e.code}): {e.reason}")
-            return []
-        except urllib.error.URLError as e:
-            logger.error(f"URLError during NCBI search: {e.reason}")
+        except httpx.HTTPStatusError as e:
+            logger.error(f"HTTPError during NCBI search (Code {e.response.status_code}): {e.response.reason_phrase}")
             return []
-        except http.client.IncompleteRead as e:
-            logger.error(f"IncompleteRead during NCBI search: {e}")
+        except httpx.RequestError as e:
+            logger.error(f"Network error during NCBI search: {e}")
             return []
         except Exception as e:
             logger.error(f"Unexpected error during NCBI search: {e}")
             return []
 
-    def fetch_full_records(self, pmids: List[str]) -> List[Dict[str, Any]]:
+    async def afetch_full_records(self, pmids: List[str], client: httpx.AsyncClient) -> bytes:
         """
-        Fetches full XML Medline records for a given list of PMIDs via EFetch.
+        Fetches full XML Medline records for one batch (up to PUBMED_EFETCH_BATCH_SIZE PMIDs) via EFetch, over a shared httpx client.
 
         Args:
             pmids (List[str]): List of PubMed IDs.
+            client (httpx.AsyncClient): The caller-owned client whose connection pool is reused across fetches.
 
         Returns:
-            List[Dict[str, Any]]: A list of raw parsed XML dictionaries representing the articles.
+            bytes: The raw PubmedArticleSet XML, left unparsed for the streaming parser. Empty bytes if failed.
         """
         if not pmids:
-            return []
+            return b""
 
-        pmid_string = ",".join(pmids)
-        logger.info(f"Fetching full records for PMIDs: {pmid_string}")
+        cache_params = _efetch_records_params(pmids)
+        cached = await asyncio.to_thread(_cache_get, "efetch", cache_params, EFETCH_CACHE_TTL)
+        if cached is not None:
+            logger.info(f"Loaded full records for {len(pmids)} PMIDs from the disk cache")
+            return cached
 
         try:
-            # We use efetch to get the full XML data
-            handle = Entrez.efetch(
-                db="pubmed",
-                id=pmid_string,
-                retmode="xml",
-                rettype="abstract"
-            )
-            records = Entrez.read(handle)
-            handle.close()
-
-            # Entrez.read returns a MedlineCitation or PubmedArticle list
-            return records.get("PubmedArticle", [])
-        except urllib.error.HTTPError as e:
-            logger.error(f"HTTPError fetching records (Code {e.code}): {e.reason}")
-            return []
+            logger.info(f"Fetching full records for {len(pmids)} PMIDs")
+            response = await self._arequest(client, "efetch", self._eutils_params(**cache_params))
+            await asyncio.to_thread(_cache_put, "efetch", cache_params, response.content)
+            return response.content
+        except httpx.HTTPStatusError as e:
+            logger.error(f"HTTPError fetching records (Code {e.response.status_code}): {e.response.reason_phrase}")
+            return b""
         except Exception as e:
             logger.error(f"Unexpected error fetching full records: {e}")
-            return []
+            return b""
 
-    def fetch_pmc_links(self, pmids: List[str]) -> Dict[str, str]:
+    async def afetch_pmc_links(self, pmids: List[str], client: httpx.AsyncClient) -> Dict[str, str]:
         """
-        Takes a list of PMIDs, performs a batched ELink query, and maps them to PMCIDs.
+        Maps one batch of PMIDs (up to PUBMED_EFETCH_BATCH_SIZE) to PMCIDs with a batched ELink query, over a shared httpx client.
 
         Args:
             pmids (List[str]): Extracted PMIDs.
+            client (httpx.AsyncClient): The caller-owned client whose connection pool is reused across fetches.
 
         Returns:
-            Dict[str, str]: A dictionary mapping PMIDs -> PMCIDs where full-text is available.
+            Dict[str, str]: A dictionary mapping PMIDs -> PMCIDs where full-text is available. Only the cached links
+            if the request still failed after the retries (failures are never cached, so the next run asks again).
         """
         if not pmids:
             return {}
-            
-        logger.info(f"Fetching PMC links for {len(pmids)} PMIDs in batch...")
-        pmid_to_pmcid: Dict[str, str] = {}
-        
-        try:
-            link_handle = Entrez.elink(dbfrom="pubmed", db="pmc", id=pmids)
-            link_results = Entrez.read(link_handle)
-            link_handle.close()
-            
-            for result in link_results:
-                pmid_list = result.get("IdList", [])
-                if not pmid_list:
-                    continue
-                pmid = pmid_list[0]
-                
-                link_sets = result.get("LinkSetDb", [])
-                if not link_sets:
-                    continue
-                    
-                links = link_sets[0].get("Link", [])
-                if not links:
-                    continue
-                    
-                pmc_id = links[0].get("Id")
-                if pmc_id:
-                    pmid_to_pmcid[pmid] = pmc_id
-                    
-            logger.info(f"Successfully mapped {len(pmid_to_pmcid)} PMIDs to PMCIDs.")
-            return pmid_to_pmcid
-            
-        except urllib.error.HTTPError as e:
-            logger.error(f"HTTPError in eLink batch (Code {e.code}): {e.reason}")
-            return {}
-        except Exception as e:
-            logger.error(f"Error fetching PMC links: {e}")
-            return {}
 
-    def fetch_full_text(self, pmcid: str) -> str:
+        # Served per PMID from the disk cache where possible
+        found, missing = await asyncio.to_thread(_cached_links, pmids)
+        if missing:
+            # One repeated `id` per PMID gives one linkset per PMID (a comma-joined list would merge them);
+            # POST keeps large batches under the URL length limit
+            data = self._eutils_params(dbfrom="pubmed", db="pmc", linkname="pubmed_pmc", id=missing, retmode="json")
+            try:
+                logger.info(f"Fetching PMC links for {len(missing)} PMIDs in batch ({len(found)} cached)...")
+                response = await self._arequest(client, "elink", data, post=True)
+                fetched = _parse_elink_json(response.content)
+                await asyncio.to_thread(_store_links, missing, fetched)
+                found.update(fetched)
+            except httpx.HTTPStatusError as e:
+                logger.error(f"HTTPError in eLink batch (Code {e.response.status_code}): {e.response.reason_phrase}. "
+                             f"{len(missing)} PMIDs get no full-text lookup and are left out of this run.")
+            except Exception as e:
+                logger.error(f"Error fetching PMC links: {e}. {len(missing)} PMIDs get no full-text lookup and are left out of this run.")
+
+        pmid_to_pmcid = {pmid: pmcid for pmid, pmcid in found.items() if pmcid}
+        logger.info(f"Successfully mapped {len(pmid_to_pmcid)} PMIDs to PMCIDs.")
+        return pmid_to_pmcid
+
+    async def astream_full_texts(self, pmcids: List[str], client: httpx.AsyncClient, handle: Callable[[etree._Element], T]) -> Dict[str, T]:
         """
-        Fetches full-text XML directly from PubMed Central using its PMCID.
+        Fetches one batch of PMC full texts (up to PMC_EFETCH_BATCH_SIZE PMCIDs) with a single EFetch request.
+        The response is fed into an lxml pull parser as it downloads, and `handle` is called on each <article>
+        element as soon as it closes, which is then freed. Peak memory is one article's tree, not the whole response.
 
         Args:
-            pmcid (str): The PMC ID.
+            pmcids (List[str]): The PMC IDs of one batch.
+            client (httpx.AsyncClient): The caller-owned client whose connection pool is reused across fetches.
+            handle (Callable[[etree._Element], T]): Turns one parsed <article> into a result (e.g. cleaned text).
+                It must not keep a reference to the element, which is cleared afterwards.
 
         Returns:
-            str: The raw, unparsed XML text of the article's body. Returns empty string if failed.
+            Dict[str, T]: PMCID (as passed in) -> handle's result. Holds the articles completed before any failure.
         """
-        try:
-            logger.debug(f"Fetching XML for PMCID: {pmcid}")
-            fetch_handle = Entrez.efetch(
-                db="pmc", id=pmcid, rettype="xml", retmode="text")
-            raw_xml: str = fetch_handle.read()
-            fetch_handle.close()
-
-            return raw_xml
-        except urllib.error.HTTPError as e:
-            logger.error(f"HTTPError fetching full text for {pmcid} (Code {e.code}): {e.reason}")
-            return ""
-        except Exception as e:
-            logger.error(f"Full text fetch failed for {pmcid}: {str(e)}")
-            return ""
+        requested = {_normalize_pmcid(pmcid): pmcid for pmcid in pmcids}
+        results: Dict[str, T] = {}
+
+        def drain(parser: etree.XMLPullParser) -> None:
+            for _, elem in parser.read_events():
+                pmcid = requested.get(_normalize_pmcid(_PMC_ARTICLE_ID(elem)))
+                if pmcid is not None:
+                    results[pmcid] = handle(elem)
+                # Free the processed article and any already-handled siblings
+                elem.clear()
+                while elem.getprevious() is not None:
+                    del elem.getparent()[0]
+
+        # Retries (rate limiting, server errors, dropped connections) re-request only the articles not yet handled
+        for attempt in range(MAX_RETRIES + 1):
+            remaining = [pmcid for pmcid in pmcids if pmcid not in results]
+            params = self._eutils_params(db="pmc", id=",".join(remaining), rettype="xml", retmode="xml")
+            parser = etree.XMLPullParser(events=("end",), tag="article", **PMC_PARSER_OPTIONS)
+            await self._pacer.await_turn()
+            try:
+                logger.debug(f"Streaming XML for {len(remaining)} PMCIDs in one request")
+                async with client.stream("GET", f"{EUTILS_BASE_URL}/efetch.fcgi", params=params) as response:
+                    if response.status_code in _RETRY_STATUS and attempt < MAX_RETRIES:
+                        reason = f"HTTP {response.status_code}"
+                    else:
+                        response.raise_for_status()
+                        async for chunk in response.aiter_bytes(): # Already gzip-decoded
+                            parser.feed(chunk)
+                            drain(parser)
+                        parser.close()
+                        drain(parser)
+                        return results
+            except httpx.TransportError as e:
+                if attempt == MAX_RETRIES:
+                    logger.error(f"Full text batch fetch failed for batch starting {pmcids[0]}: {str(e)}")
+                    return results
+                reason = repr(e)
+            except httpx.HTTPStatusError as e:
+                logger.error(f"HTTPError fetching full texts for batch starting {pmcids[0]} (Code {e.response.status_code}): {e.response.reason_phrase}")
+                return results
+            except Exception as e:
+                logger.error(f"Full text batch fetch failed for batch starting {pmcids[0]}: {str(e)}")
+                return results
+            logger.warning(f"Retrying full text batch starting {pmcids[0]} after {reason} (attempt {attempt + 1}/{MAX_RETRIES})")
+            await asyncio.sleep(RETRY_BACKOFF * 2 ** attempt)
+        return results
+
+    async def afetch_clean_full_texts(self, pmcids: List[str], client: httpx.AsyncClient) -> Dict[str, str]:
+        """
+        Cleaned full-text bodies for one batch of PMCIDs: served per PMCID from the disk cache, with the
+        rest streamed from a single EFetch request (astream_full_texts + clean_pmc_article) and cached.
+
+        Args:
+            pmcids (List[str]): The PMC IDs of one batch.
+            client (httpx.AsyncClient): The caller-owned client whose connection pool is reused across fetches.
+
+        Returns:
+            Dict[str, str]: PMCID (as passed in) -> cleaned markdown body. Articles PMC did not return are omitted.
+        """
+        def load_cached() -> Dict[str, str]:
+            cached = {pmcid: _cache_get("pmc_body", _pmc_body_cache_params(pmcid), EFETCH_CACHE_TTL) for pmcid in pmcids}
+            return {pmcid: body.decode("utf-8") for pmcid, body in cached.items() if body is not None}
+
+        def store(fetched: Dict[str, str]) -> None:
+            for pmcid, body in fetched.items():
+                _cache_put("pmc_body", _pmc_body_cache_params(pmcid), body.encode("utf-8"))
+
+        bodies = await asyncio.to_thread(load_cached)
+        missing = [pmcid for pmcid in pmcids if pmcid not in bodies]
+        if missing:
+            fetched = await self.astream_full_texts(missing, client, clean_pmc_article)
+            await asyncio.to_thread(store, fetched)
+            bodies.update(fetched)
+        return bodies
 
     def get_total_hits(self, query: str) -> int:
         """
@@ -182,14 +480,7 @@ class NCBIClient:
             int: Total integer hits.
         """
         try:
-            handle = Entrez.esearch(
-                db="pubmed",
-                term=query,
-                retmax=0  # Only need the count
-            )
-            record = Entrez.read(handle)
-            handle.close()
-            return int(record.get("Count", 0))
+            return self._esearch_cached(query, retmax=0)["Count"]  # Only need the count
         except Exception as e:
             logger.error(f"Error fetching total hits: {e}")
             return 0
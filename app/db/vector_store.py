@@ -1,7 +1,11 @@
 import logging
-from typing import List, Optional
+import os
+import threading
+from typing import List, Optional, Iterable, Iterator, Set, Tuple
+from cachetools import LRUCache
 from langchain_qdrant import QdrantVectorStore, FastEmbedSparse, RetrievalMode
 from qdrant_client import QdrantClient
+from qdrant_client.http import models
 from langchain_openai import OpenAIEmbeddings
 from langchain_core.documents import Document
 
@@ -9,6 +13,38 @@ from app.utils.config import settings
 
 logger = logging.getLogger(__name__)
 
+# Number of query embeddings (dense + sparse) kept in memory for repeated search terms
+QUERY_EMBEDDING_CACHE_SIZE = 1024
+
+# Documents per embedding request and Qdrant upsert when indexing. OpenAI accepts up to 2048 inputs but also caps
+# a request at 300k tokens (~1200 of our 1000-char chunks); 512 stays under both and keeps upserts to a few MB.
+INGEST_BATCH_SIZE = 512
+
+# Payload fields with a Qdrant index in both collections: the PMID dedup scrolls and Stage 2 filter on
+# metadata.pmid, and the retriever's MetadataFilters match on the rest. Unindexed filters force full scans.
+PAYLOAD_INDEXES = {
+    "metadata.pmid": models.PayloadSchemaType.KEYWORD,
+    "metadata.pub_year": models.PayloadSchemaType.INTEGER,
+    "metadata.first_author_lastname": models.PayloadSchemaType.KEYWORD,
+    "metadata.is_human": models.PayloadSchemaType.BOOL,
+    "metadata.is_animal": models.PayloadSchemaType.BOOL,
+}
+
+# Int8 scalar quantization for both collections: HNSW traverses int8 vectors (4x less memory bandwidth) and the
+# retriever's search params oversample and rescore with the original vectors. Applied at creation by the migration
+# and to existing collections by scripts/fix_qdrant_index.py.
+INT8_QUANTIZATION = models.ScalarQuantization(
+    scalar=models.ScalarQuantizationConfig(type=models.ScalarType.INT8, quantile=0.99, always_ram=True)
+)
+
+# Qdrant Cloud serves gRPC on this port alongside REST on 6333
+QDRANT_GRPC_PORT = 6334
+
+# Qdrant's default Reciprocal Rank Fusion constant, which the hybrid requests rely on.
+# A hit's fused score is the sum of 1 / (RRF_K + rank) over the dense and sparse searches, rank counted from 0.
+# Kept small on purpose: relevance scores are 1 - fused, and a large k would squeeze them into a near-constant band.
+RRF_K = 2
+
 class AuraVectorStore:
     """
     Decoupled database wrapper for Qdrant Cloud.
@@ -19,24 +55,44 @@ class AuraVectorStore:
     def __init__(self, embedding_model: str = "text-embedding-3-small"):
         self.embeddings = OpenAIEmbeddings(
             model=embedding_model,
-            api_key=settings.OPENAI_API_KEY
+            api_key=settings.OPENAI_API_KEY,
+            dimensions=settings.EMBEDDING_DIMENSIONS, # None keeps the model's native size; vectors arrive base64-encoded by default
+            max_retries=6, # Large ingest batches hit the embeddings rate limit; back off instead of failing the batch
+            request_timeout=60
         )
-        self.sparse_embeddings = FastEmbedSparse(model_name="Qdrant/bm25")
+        # One FastEmbed batch per ingest batch, with all cores available to the encoder
+        self.sparse_embeddings = FastEmbedSparse(model_name="Qdrant/bm25", batch_size=INGEST_BATCH_SIZE, threads=os.cpu_count())
         
-        # Connect to the remote Qdrant Cloud cluster
+        # Connect to the remote Qdrant Cloud cluster. gRPC (HTTP/2, protobuf) carries vectors far more compactly
+        # than the JSON REST API; calls the gRPC API doesn't cover still fall back to REST.
         self.client = QdrantClient(
             url=settings.QDRANT_URL,
-            api_key=settings.QDRANT_API_KEY
+            api_key=settings.QDRANT_API_KEY,
+            prefer_grpc=settings.QDRANT_PREFER_GRPC,
+            grpc_port=QDRANT_GRPC_PORT,
+            timeout=60
         )
         
         # Initialize LangChain wrappers for both index collections
         self.collection_a = self._init_collection("aura_index_a_abstracts")
         self.collection_b = self._init_collection("aura_index_b_bodies")
         
+        # LRU of query embeddings keyed on the whitespace-normalized search term
+        self._embedding_cache: LRUCache = LRUCache(maxsize=QUERY_EMBEDDING_CACHE_SIZE)
+        self._embedding_lock = threading.Lock()
+        
+        # Bumped on every write so result caches built on these indexes can detect staleness
+        self.generation: int = 0
+        
+        # Local snapshot of the PMIDs in Index A, loaded on the first existence check (see _indexed_pmids)
+        self._known_pmids: Optional[Set[str]] = None
+        self._known_pmids_lock = threading.Lock()
+        
         logger.info(f"AuraVectorStore initialized pointing to Qdrant Cloud at {settings.QDRANT_URL}")
 
     def _init_collection(self, collection_name: str) -> QdrantVectorStore:
-        """Connects to a specific remote Qdrant collection."""
+        """Connects to a specific remote Qdrant collection, creating any missing payload indexes first."""
+        self._ensure_payload_indexes(collection_name)
         return QdrantVectorStore(
             client=self.client,
             collection_name=collection_name,
@@ -46,25 +102,243 @@ class AuraVectorStore:
             content_payload_key="page_content"
         )
 
-    def add_abstracts(self, documents: List[Document]) -> List[str]:
-        """Adds a batch of abstract documents to Index A."""
+    def _ensure_payload_indexes(self, collection_name: str) -> None:
+        """
+        Creates the PAYLOAD_INDEXES missing from a collection. Creation is asynchronous on the server (wait=False),
+        so startup isn't blocked while an existing collection is indexed. Failures (e.g. a read-only API key) are logged.
+        """
+        try:
+            existing = self.client.get_collection(collection_name).payload_schema or {}
+            for field_name, field_schema in PAYLOAD_INDEXES.items():
+                if field_name not in existing:
+                    logger.info(f"Creating {field_schema.value} payload index on '{field_name}' for {collection_name}")
+                    self.client.create_payload_index(
+                        collection_name=collection_name,
+                        field_name=field_name,
+                        field_schema=field_schema,
+                        wait=False
+                    )
+        except Exception as e:
+            logger.warning(f"Could not verify payload indexes for {collection_name}: {e}")
+
+    def embed_query(self, query: str) -> Tuple[List[float], models.SparseVector]:
+        """
+        Returns the dense and sparse (BM25) embeddings of a search term, reusing cached vectors
+        so a term searched against both indexes, or repeated across requests, is embedded once.
+
+        Args:
+            query (str): The search term.
+
+        Returns:
+            Tuple[List[float], models.SparseVector]: The dense vector and the sparse vector.
+        """
+        key = " ".join(query.split())
+        with self._embedding_lock:
+            cached = self._embedding_cache.get(key)
+        if cached is not None:
+            return cached
+            
+        sparse = self.sparse_embeddings.embed_query(key)
+        vectors = (
+            self.embeddings.embed_query(key),
+            models.SparseVector(indices=sparse.indices, values=sparse.values)
+        )
+        with self._embedding_lock:
+            self._embedding_cache[key] = vectors
+        return vectors
+
+    def embed_queries(self, queries: List[str]) -> List[Tuple[List[float], models.SparseVector]]:
+        """
+        Batch version of embed_query: every uncached dense embedding is computed in a single OpenAI request.
+
+        Args:
+            queries (List[str]): The search terms.
+
+        Returns:
+            List[Tuple[List[float], models.SparseVector]]: The dense and sparse vectors, in query order.
+        """
+        keys = [" ".join(query.split()) for query in queries]
+        with self._embedding_lock:
+            found = {key: self._embedding_cache.get(key) for key in keys}
+        missing = [key for key, vectors in found.items() if vectors is None]
+        
+        if missing:
+            dense_vectors = self.embeddings.embed_documents(missing)
+            for key, dense in zip(missing, dense_vectors):
+                # BM25 weights query terms differently from documents, so sparse vectors stay per-query (local CPU)
+                sparse = self.sparse_embeddings.embed_query(key)
+                found[key] = (dense, models.SparseVector(indices=sparse.indices, values=sparse.values))
+            with self._embedding_lock:
+                for key in missing:
+                    self._embedding_cache[key] = found[key]
+        return [found[key] for key in keys]
+
+    def hybrid_search(
+        self,
+        collection: QdrantVectorStore,
+        query: str,
+        k: int,
+        filter: Optional[models.Filter] = None,
+        search_params: Optional[models.SearchParams] = None,
+        relevance_scores: bool = True
+    ) -> List[Tuple[Document, float]]:
+        """
+        Native hybrid (dense + sparse, RRF-fused) search on one collection using cached query embeddings.
+        Mirrors QdrantVectorStore.similarity_search_with_relevance_scores in HYBRID mode.
+
+        Args:
+            collection (QdrantVectorStore): The index to search (collection_a or collection_b).
+            query (str): The search term.
+            k (int): Number of results to return.
+            filter (Optional[models.Filter], optional): Qdrant payload filter. Defaults to None.
+            search_params (Optional[models.SearchParams], optional): Dense-leg search parameters (e.g. quantization). Defaults to None.
+            relevance_scores (bool, optional): Map scores through the collection's relevance function, as LangChain does.
+                When False, returns Qdrant's raw RRF-fused scores (higher is better). Defaults to True.
+
+        Returns:
+            List[Tuple[Document, float]]: Retrieved documents and their relevance (or fused) scores.
+        """
+        dense, sparse = self.embed_query(query)
+        request = self._hybrid_request(collection, dense, sparse, k, filter, search_params)
+        points = self.client.query_points(
+            collection_name=collection.collection_name,
+            prefetch=request.prefetch,
+            query=request.query,
+            query_filter=request.filter,
+            limit=request.limit,
+            with_payload=True,
+            with_vectors=False
+        ).points
+        return self._scored_documents(collection, points, relevance_scores)
+
+    def hybrid_search_batch(
+        self,
+        collection: QdrantVectorStore,
+        queries: List[str],
+        k: int,
+        filters: Optional[List[Optional[models.Filter]]] = None,
+        search_params: Optional[models.SearchParams] = None,
+        relevance_scores: bool = True
+    ) -> List[List[Tuple[Document, float]]]:
+        """
+        Runs hybrid_search for many queries on one collection in a single Qdrant round-trip (query_batch_points),
+        after embedding all uncached queries in a single request.
+
+        Args:
+            collection (QdrantVectorStore): The index to search (collection_a or collection_b).
+            queries (List[str]): The search terms.
+            k (int): Number of results to return per query.
+            filters (Optional[List[Optional[models.Filter]]], optional): One payload filter (or None) per query. Defaults to None.
+            search_params (Optional[models.SearchParams], optional): Dense-leg search parameters (e.g. quantization). Defaults to None.
+            relevance_scores (bool, optional): As in hybrid_search. Defaults to True.
+
+        Returns:
+            List[List[Tuple[Document, float]]]: The results of each query, in query order.
+        """
+        if not queries:
+            return []
+        filters = filters or [None] * len(queries)
+        requests = [
+            self._hybrid_request(collection, dense, sparse, k, query_filter, search_params)
+            for (dense, sparse), query_filter in zip(self.embed_queries(queries), filters)
+        ]
+        responses = self.client.query_batch_points(collection_name=collection.collection_name, requests=requests)
+        return [self._scored_documents(collection, response.points, relevance_scores) for response in responses]
+
+    @staticmethod
+    def _hybrid_request(
+        collection: QdrantVectorStore,
+        dense: List[float],
+        sparse: models.SparseVector,
+        k: int,
+        filter: Optional[models.Filter],
+        search_params: Optional[models.SearchParams]
+    ) -> models.QueryRequest:
+        """Dense + sparse prefetch fused with RRF (Qdrant's default k=RRF_K), as LangChain's HYBRID mode issues it."""
+        return models.QueryRequest(
+            prefetch=[
+                models.Prefetch(using=collection.vector_name, query=dense, filter=filter, limit=k, params=search_params),
+                models.Prefetch(using=collection.sparse_vector_name, query=sparse, filter=filter, limit=k),
+            ],
+            query=models.FusionQuery(fusion=models.Fusion.RRF),
+            filter=filter,
+            limit=k,
+            with_payload=True,
+            with_vector=False
+        )
+
+    @staticmethod
+    def _scored_documents(collection: QdrantVectorStore, points: List[models.ScoredPoint], relevance_scores: bool) -> List[Tuple[Document, float]]:
+        """Converts Qdrant points into LangChain documents paired with relevance (or raw fused) scores."""
+        relevance_fn = collection._select_relevance_score_fn() if relevance_scores else float
+        return [
+            (
+                QdrantVectorStore._document_from_point(
+                    point, collection.collection_name, collection.content_payload_key, collection.metadata_payload_key
+                ),
+                relevance_fn(point.score)
+            )
+            for point in points
+        ]
+
+    def _upload_documents(self, collection: QdrantVectorStore, documents: List[Document], batch_size: int) -> List[str]:
+        """
+        Embeds documents in `batch_size` batches and streams the points through upload_points,
+        which retries failed batches instead of aborting the whole ingest like a plain upsert.
+
+        Args:
+            collection (QdrantVectorStore): The target index wrapper (builds the dense + sparse vectors and payloads).
+            documents (List[Document]): The documents to index.
+            batch_size (int): Documents per embedding request and per upload batch.
+
+        Returns:
+            List[str]: The generated point IDs, in document order.
+        """
+        ids: List[str] = []
+
+        def points() -> Iterator[models.PointStruct]:
+            # Embedding happens lazily here, so only one batch of vectors is held in memory at a time
+            for batch_ids, batch_points in collection._generate_batches(
+                [doc.page_content for doc in documents], [doc.metadata for doc in documents], batch_size=batch_size
+            ):
+                ids.extend(batch_ids)
+                yield from batch_points
+
+        self.client.upload_points(
+            collection_name=collection.collection_name,
+            points=points(),
+            batch_size=batch_size,
+            wait=True
+        )
+        return ids
+
+    def add_abstracts(self, documents: List[Document], batch_size: int = INGEST_BATCH_SIZE) -> List[str]:
+        """Adds a batch of abstract documents to Index A (one embedding request per `batch_size` docs)."""
         if not documents:
             return []
-        ids = self.collection_a.add_documents(documents)
+        ids = self._upload_documents(self.collection_a, documents, batch_size)
+        self.generation += 1
+        with self._known_pmids_lock:
+            if self._known_pmids is not None:
+                self._known_pmids.update(doc.metadata["pmid"] for doc in documents if doc.metadata.get("pmid"))
         logger.info(f"Added {len(ids)} documents to Index A.")
         return ids
 
-    def add_body_chunks(self, documents: List[Document]) -> List[str]:
-        """Adds a batch of body chunks to Index B."""
+    def add_body_chunks(self, documents: List[Document], batch_size: int = INGEST_BATCH_SIZE) -> List[str]:
+        """Adds a batch of body chunks to Index B (one embedding request per `batch_size` docs)."""
         if not documents:
             return []
-        ids = self.collection_b.add_documents(documents)
+        ids = self._upload_documents(self.collection_b, documents, batch_size)
+        self.generation += 1
         logger.info(f"Added {len(ids)} documents to Index B.")
         return ids
     
     def fetch_abstracts_by_pmid(self, pmid: str) -> List[Document]:
         """Check if a PMID already exists in Index A using Qdrant's Scroll API."""
-        from qdrant_client.http import models
+        # Most PMIDs checked during an ingest are new: answer those locally without a round-trip
+        if pmid not in self._indexed_pmids():
+            return []
+            
         results, _ = self.client.scroll(
             collection_name="aura_index_a_abstracts",
             scroll_filter=models.Filter(
@@ -90,3 +364,61 @@ class AuraVectorStore:
             docs.append(Document(page_content=content, metadata=meta))
             
         return docs
+
+    def fetch_existing_pmids(self, pmids: Iterable[str]) -> Set[str]:
+        """Returns the subset of PMIDs already present in Index A, using one filtered scroll instead of a lookup per PMID."""
+        # Only PMIDs in the local snapshot can exist; the filtered scroll confirms them
+        pmids = list(set(pmids) & self._indexed_pmids())
+        if not pmids:
+            return set()
+            
+        existing = set()
+        offset = None
+        while True:
+            results, offset = self.client.scroll(
+                collection_name="aura_index_a_abstracts",
+                scroll_filter=models.Filter(
+                    must=[
+                        models.FieldCondition(
+                            key="metadata.pmid",
+                            match=models.MatchAny(any=pmids)
+                        )
+                    ]
+                ),
+                limit=1000,
+                offset=offset,
+                with_payload=["metadata.pmid"],
+                with_vectors=False
+            )
+            for point in results:
+                existing.add(point.payload.get("metadata", {}).get("pmid"))
+            if offset is None:
+                break
+                
+        return existing
+
+    def _indexed_pmids(self) -> Set[str]:
+        """
+        The PMIDs in Index A, scrolled once (PMID payload only, 1000 points per page) on first use and kept in step
+        with add_abstracts. A PMID missing from this set is new, so existence checks skip the remote lookup;
+        writes by other processes after the snapshot are not seen until the store is re-created.
+        """
+        with self._known_pmids_lock:
+            if self._known_pmids is None:
+                known: Set[str] = set()
+                offset = None
+                while True:
+                    results, offset = self.client.scroll(
+                        collection_name="aura_index_a_abstracts",
+                        limit=1000,
+                        offset=offset,
+                        with_payload=["metadata.pmid"],
+                        with_vectors=False
+                    )
+                    known.update(point.payload.get("metadata", {}).get("pmid") for point in results)
+                    if offset is None:
+                        break
+                known.discard(None)
+                self._known_pmids = known
+                logger.info(f"Loaded {len(known)} indexed PMIDs from Index A.")
+            return self._known_pmids
@@ -1,10 +1,14 @@
 import logging
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.middleware.gzip import GZipMiddleware
 from app.api.endpoints import router as chat_router
+from app.utils.logging import SessionIdFilter
 
-# Configure root logger for the API
-logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(name)s - %(levelname)s - %(message)s")
+# Configure root logger for the API (every line is tagged with the request's session id)
+logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(name)s - %(levelname)s - [%(session_id)s] %(message)s")
+for handler in logging.getLogger().handlers:
+    handler.addFilter(SessionIdFilter())
 
 app = FastAPI(
     title="AuraQuery API",
@@ -21,6 +25,9 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Compress citation-heavy JSON answers (SSE streams are excluded by the middleware so tokens still flush live)
+app.add_middleware(GZipMiddleware, minimum_size=1000)
+
 # Mount the endpoint definitions
 app.include_router(chat_router, prefix="/api")
 
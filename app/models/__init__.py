@@ -1,4 +1,4 @@
 # Expose schemas at package level
-from .schemas import ArticleMetadata, MetadataFilters, ParsedQuery
+from .schemas import ArticleMetadata, MetadataFilters, ParsedQuery, ParsedQueryBatch, QAResult
 
-__all__ = ["ArticleMetadata", "MetadataFilters", "ParsedQuery"]
+__all__ = ["ArticleMetadata", "MetadataFilters", "ParsedQuery", "ParsedQueryBatch", "QAResult"]
@@ -1,10 +1,16 @@
 from typing import List, Optional
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, ConfigDict, Field
+
+# Parsed articles and queries are read-only value objects once built; freezing them lets the retriever
+# share one instance across threads and stages without defensive copies.
+VALUE_MODEL_CONFIG = ConfigDict(frozen=True, extra="ignore")
 
 class ArticleMetadata(BaseModel):
     """
     Structured metadata extracted from a PubMed article's Medline XML.
     """
+    model_config = VALUE_MODEL_CONFIG
+
     pmid: str = Field(description="PubMed ID of the article.")
     doi: Optional[str] = Field(default=None, description="DOI of the article.")
     section: str = Field(description="The section this content belongs to, e.g., 'abstract' or 'body'.")
@@ -22,6 +28,8 @@ class ArticleMetadata(BaseModel):
 
 class MetadataFilters(BaseModel):
     """Explicitly defined extractable metadata filters for querying."""
+    model_config = VALUE_MODEL_CONFIG
+
     publication_year: Optional[int] = Field(
         default=None, 
         description="The specific 4-digit year. Do NOT guess or infer the year if the user says 'recent' or 'latest'."
@@ -37,6 +45,8 @@ class MetadataFilters(BaseModel):
 
 class ParsedQuery(BaseModel):
     """The structured output format enforced by the LLM for optimized queries."""
+    model_config = VALUE_MODEL_CONFIG
+
     clarification_required: Optional[str] = Field(
         default=None,
         description="Populate only if the query is critically ambiguous. Explicitly name the ambiguous term and offer interpretations. If NO critical ambiguity exists, this field MUST be null."
@@ -49,3 +59,18 @@ class ParsedQuery(BaseModel):
         default=None,
         description="Extracted metadata filters. Do not hallucinate fields."
     )
+
+class ParsedQueryBatch(BaseModel):
+    """The structured output format for parsing several numbered queries in one LLM call."""
+    results: List[ParsedQuery] = Field(
+        description="One parsed query object per numbered input query, in exactly the same order as the inputs."
+    )
+
+class QAResult(BaseModel):
+    """The structured output format for a generated, cited answer."""
+    sufficient_evidence: bool = Field(
+        description="True if the provided context contains enough evidence to answer the question. False if it does not, in which case the answer only states that sufficient evidence could not be found."
+    )
+    answer_markdown: str = Field(
+        description="The complete Markdown answer with in-line citations in the format (First Author Last Name, Year) [PMID: XXXXXX]."
+    )
@@ -1,6 +1,7 @@
 # app/utils/config.py
 import os
 from pathlib import Path
+from typing import Optional
 from pydantic_settings import BaseSettings, SettingsConfigDict
 
 
@@ -26,6 +27,40 @@ class Settings(BaseSettings):
     LANGCHAIN_API_KEY: str
     LANGCHAIN_PROJECT: str = "AuraQuery-Dev"
 
+    # -------------------------
+    # RAG Pipeline Tuning
+    # -------------------------
+    # Run the global Index B fallback retrieval alongside the first LLM answer, instead of after it.
+    # Off by default: the retrieval runs in a worker thread that cannot be cancelled, so every answer pays
+    # an extra QueryParser call + global Index B search even when the evidence was sufficient.
+    SPECULATIVE_FALLBACK_RETRIEVAL: bool = False
+    # Run the raw-query search (Stage 1 + 2, explicit-PMID or global fallback) while the QueryParser LLM call
+    # is in flight, and keep the results when the optimized query barely differs (token Jaccard >= threshold)
+    # and adds no filters.
+    # Off by default: the parser usually expands queries with synonyms, so most speculations are discarded.
+    SPECULATIVE_RAW_QUERY_RETRIEVAL: bool = False
+    SPECULATIVE_QUERY_JACCARD: float = 0.8
+    # Coalesce concurrent QueryParser calls (50 ms window, max 16) into one LLM request under load.
+    # Off by default: it adds up to one window of latency to every parse.
+    QUERY_PARSER_BATCHING: bool = False
+    # Serve near-duplicate queries (same filters, embedding cosine >= threshold) from an in-process
+    # LRU of final retrieval results. Off by default: a too-low threshold returns another question's evidence.
+    SEMANTIC_RESULT_CACHE: bool = False
+    SEMANTIC_RESULT_CACHE_SIZE: int = 512
+    SEMANTIC_RESULT_CACHE_THRESHOLD: float = 0.95
+    # Cascade early-stop: when the top Stage 1 abstracts rank near the top of both the dense and the sparse search,
+    # rerank those abstracts directly and skip the Stage 2 body-chunk search. Off by default: the answer context
+    # then holds abstracts only, without methods/results passages.
+    STAGE_1_EARLY_STOP: bool = False
+    # Persist NCBI ESearch/EFetch responses on disk (content-addressed, see NCBI_CACHE_DIR), so re-runs
+    # of the same ingestion skip the network. ESearch entries expire after a day, EFetch records after 30 days.
+    NCBI_DISK_CACHE: bool = True
+    # Talk to Qdrant over gRPC (port 6334) instead of the JSON REST API. Disable behind proxies that only pass HTTPS/443.
+    QDRANT_PREFER_GRPC: bool = True
+    # Server-side truncation of text-embedding-3 vectors (e.g. 512 instead of the native 1536) for ~3x smaller
+    # collections and embedding responses. Both Qdrant collections must be recreated at the same size and re-indexed.
+    EMBEDDING_DIMENSIONS: Optional[int] = None
+
     # -------------------------
     # Project Paths
     # -------------------------
@@ -34,6 +69,7 @@ class Settings(BaseSettings):
     RAW_DATA_DIR: Path = DATA_DIR / "raw"
     PROCESSED_DATA_DIR: Path = DATA_DIR / "processed"
     CHROMA_DB_DIR: Path = DATA_DIR / "vectorstore"
+    NCBI_CACHE_DIR: Path = DATA_DIR / "ncbi_cache"
 
     class Config:
         env_file = ".env"
@@ -1,7 +1,41 @@
 # app/utils/helpers.py
+import functools
 import re
+import threading
+from typing import List
+
 from lxml import etree
 
+# Non-prose JATS elements dropped before text extraction
+UNWANTED_TAGS = (
+    "fig", "table-wrap", "table", "ref-list", "xref", "sup", "sub",
+    "disp-formula", "inline-formula", "media", "supplementary-material",
+)
+EXCESS_BLANK_LINES_RE = re.compile(r"\n{3,}")
+
+# Text content of an element and its descendants (same as "".join(el.itertext())), serialized by libxml2 in one call
+_element_text = functools.partial(etree.tostring, method="text", encoding="unicode", with_tail=False)
+
+# lxml parser settings for PMC JATS XML, shared by the buffered and the streaming parse
+PMC_PARSER_OPTIONS = dict(
+    recover=True,
+    remove_blank_text=True,
+    resolve_entities=False,
+    huge_tree=True, # MB-scale PMC bodies can exceed libxml2's default depth/size limits
+    collect_ids=False # Nothing looks elements up by id, so skip hashing every id attribute
+)
+
+# One reusable parser per thread: lxml serializes concurrent use of a shared parser with a lock
+_pmc_parsers = threading.local()
+
+
+def _pmc_parser() -> etree.XMLParser:
+    """Returns this thread's PMC XML parser, creating it on first use."""
+    parser = getattr(_pmc_parsers, "parser", None)
+    if parser is None:
+        parser = _pmc_parsers.parser = etree.XMLParser(**PMC_PARSER_OPTIONS)
+    return parser
+
 
 def clean_pmc_xml(raw_body_bytes: bytes) -> str:
     """
@@ -17,68 +51,68 @@ def clean_pmc_xml(raw_body_bytes: bytes) -> str:
         return ""
 
     try:
-        parser = etree.XMLParser(
-            recover=True,
-            remove_blank_text=True,
-            resolve_entities=False
-        )
-        root = etree.fromstring(raw_body_bytes, parser=parser)
+        root = etree.fromstring(raw_body_bytes, parser=_pmc_parser())
     except Exception:
         return ""
 
-    body = root.find(".//body")
+    return clean_pmc_article(root)
+
+
+def clean_pmc_article(article: etree._Element) -> str:
+    """
+    Same as clean_pmc_xml, for an already-parsed JATS <article> element (e.g. one streamed out of a
+    batched EFetch response). Strips the non-prose elements in place.
+    """
+    body = article.find(".//body")
     if body is None:
         return ""
 
-    # Remove unwanted elements
-    for tag in body.xpath(
-        ".//fig | .//table-wrap | .//table | .//ref-list | "
-        ".//xref | .//sup | .//sub | .//disp-formula | "
-        ".//inline-formula | .//media | .//supplementary-material"
-    ):
-        parent = tag.getparent()
-        if parent is not None:
-            parent.remove(tag)
-
-    sections_text = [_extract_section(sec) for sec in body.findall("./sec")]
+    # Remove unwanted elements in a single C-level tree pass. Their tails are kept: the tail of an
+    # inline <xref>/<sup>/<sub> is the rest of the sentence, e.g. "as shown previously<xref/> in mice".
+    etree.strip_elements(body, *UNWANTED_TAGS, with_tail=False)
 
-    cleaned_text = "\n\n".join(sections_text)
+    cleaned_text = "\n\n".join(_extract_sections(body))
     return _normalize_blank_lines(cleaned_text)
 
 
-def _extract_section(sec: etree.Element, level: int = 2) -> str:
+def _extract_sections(body: etree._Element) -> List[str]:
     """
-    Recursively extract section text from a <sec> element.
-    Uses Markdown-style headers for hierarchy (#, ##, ###, etc.).
+    Extract the headers and paragraphs of every <sec> under <body>, in document order.
+    Walks the section tree with an explicit stack instead of recursing per nested <sec>.
+    Uses Markdown-style headers for hierarchy (## for top-level sections, ### below, etc.).
     Maintains paragraph boundaries for chunking.
     """
-    section_parts = []
+    parts: List[str] = []
+    stack = [(sec, 2) for sec in reversed(body.findall("./sec"))]
+    while stack:
+        sec, level = stack.pop()
 
-    title_el = sec.find("./title")
-    if title_el is not None:
-        title_text = _normalize_paragraph("".join(title_el.itertext()))
-        if title_text:
-            header = f"{'#' * min(level, 6)} {title_text}"
-            section_parts.append(header)
+        title_el = sec.find("./title")
+        if title_el is not None:
+            title_text = _normalize_paragraph(_element_text(title_el))
+            if title_text:
+                parts.append(f"{'#' * min(level, 6)} {title_text}")
 
-    for p in sec.findall("./p"):
-        paragraph_text = _normalize_paragraph("".join(p.itertext()))
-        if paragraph_text:
-            section_parts.append(paragraph_text)
+        for p in sec.findall("./p"):
+            paragraph_text = _normalize_paragraph(_element_text(p))
+            if paragraph_text:
+                parts.append(paragraph_text)
 
-    for child_sec in sec.findall("./sec"):
-        section_parts.append(_extract_section(child_sec, level + 1))
+        # Reversed, so the first subsection is popped (and emitted) next
+        stack.extend((child_sec, level + 1) for child_sec in reversed(sec.findall("./sec")))
 
-    return "\n\n".join(section_parts)
+    return parts
 
 
 def _normalize_paragraph(text: str) -> str:
-    """Normalize whitespace inside a paragraph but preserve paragraph boundaries."""
-    text = re.sub(r"[ \t]+", " ", text)
-    return text.strip()
+    """
+    Collapse every whitespace run inside a paragraph (including source line breaks, which are
+    insignificant in JATS <p>/<title>) to one space. Paragraph boundaries are added by the caller.
+    """
+    return " ".join(text.split())
 
 
 def _normalize_blank_lines(text: str) -> str:
     """Normalize excessive blank lines in final output."""
-    text = re.sub(r"\n{3,}", "\n\n", text)
+    text = EXCESS_BLANK_LINES_RE.sub("\n\n", text)
     return text.strip()
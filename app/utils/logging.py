@@ -1,6 +1,18 @@
 # app/utils/logging.py
 import logging
 import sys
+from contextvars import ContextVar
+
+# Request-scoped session id, set once per request at the API layer and read by the log filter
+SESSION_ID: ContextVar[str] = ContextVar("session_id", default="-")
+
+
+class SessionIdFilter(logging.Filter):
+    """Stamps each log record with the current request's session id (from SESSION_ID)."""
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        record.session_id = SESSION_ID.get()
+        return True
 
 
 def setup_logging(level: str = "INFO") -> None:
@@ -9,17 +21,18 @@ def setup_logging(level: str = "INFO") -> None:
     All modules should use logging.getLogger(__name__).
     """
     log_format = (
-        "[%(asctime)s] [%(levelname)s] [%(name)s] "
+        "[%(asctime)s] [%(levelname)s] [%(name)s] [%(session_id)s] "
         "- %(message)s"
     )
+    handler = logging.StreamHandler(sys.stdout)
+    handler.addFilter(SessionIdFilter())
     logging.basicConfig(
         level=level.upper(),
         format=log_format,
-        handlers=[
-            logging.StreamHandler(sys.stdout)
-        ]
+        handlers=[handler]
     )
 
     # Optionally: suppress verbose logs from 3rd-party libs
-    logging.getLogger("Bio").setLevel(logging.WARNING)
+    logging.getLogger("httpx").setLevel(logging.WARNING) # One INFO line per NCBI request otherwise
+    logging.getLogger("httpcore").setLevel(logging.WARNING)
     logging.getLogger("urllib3").setLevel(logging.WARNING)
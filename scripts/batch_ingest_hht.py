@@ -13,6 +13,9 @@ BATCH_SIZE = 50
 DELAY_BETWEEN_BATCHES = 0.3  # seconds
 # ----------------------------------
 
+# Built once: every count and page request below reuses the exact same term string
+QUERY = " OR ".join(f'"{k}"[tw]' for k in KEYWORDS) + ' AND "free full text"[Filter]'
+
 
 def run_ingestion_for_pmids(pmids):
     """
@@ -22,16 +25,13 @@ def run_ingestion_for_pmids(pmids):
 
 
 def main():
-    query = " OR ".join(f'"{k}"[tw]' for k in KEYWORDS)
-    query += ' AND "free full text"[Filter]'
-
-    total_hits = ncbi_client.get_total_hits(query)
+    total_hits = ncbi_client.get_total_hits(QUERY)
     logger.info(f"Total Open Access HHT papers found: {total_hits}")
 
     retstart = 0
     while retstart < total_hits:
         pmids = ncbi_client.search_pmids(
-            query, max_results=BATCH_SIZE, retstart=retstart)
+            QUERY, max_results=BATCH_SIZE, retstart=retstart)
         if not pmids:
             logger.warning("No more PMIDs returned, stopping.")
             break
@@ -6,7 +6,7 @@ main_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 sys.path.insert(0, main_dir)
 
 from qdrant_client import QdrantClient
-from qdrant_client.http.models import PayloadSchemaType
+from app.db.vector_store import PAYLOAD_INDEXES, INT8_QUANTIZATION
 from app.utils.config import settings
 
 logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(name)s - %(levelname)s - %(message)s")
@@ -27,17 +27,34 @@ def apply_index():
     info_b = client.get_collection("aura_index_b_bodies")
     logger.info(f"Payload schema b: {info_b.payload_schema}")
 
-    logger.info("Force applying keyword index on metadata.pmid for aura_index_b_bodies...")
-    client.create_payload_index(
-        collection_name="aura_index_b_bodies",
-        field_name="metadata.pmid",
-        field_schema=PayloadSchemaType.KEYWORD,
-        wait=True
-    )
+    # Index A needs them too: the batched PMID dedup scroll (fetch_existing_pmids) filters on metadata.pmid,
+    # and Stage 1 applies the metadata filters
+    for collection_name in ("aura_index_a_abstracts", "aura_index_b_bodies"):
+        for field_name, field_schema in PAYLOAD_INDEXES.items():
+            logger.info(f"Force applying {field_schema.value} index on {field_name} for {collection_name}...")
+            client.create_payload_index(
+                collection_name=collection_name,
+                field_name=field_name,
+                field_schema=field_schema,
+                wait=True
+            )
+    
+    # Both indexes traverse HNSW on int8 vectors (4x less memory bandwidth); the retriever's search params
+    # oversample and rescore the candidates with the original vectors, so the final ranking keeps full precision
+    for collection_name in ("aura_index_a_abstracts", "aura_index_b_bodies"):
+        logger.info(f"Enabling int8 scalar quantization on {collection_name}...")
+        client.update_collection(
+            collection_name=collection_name,
+            quantization_config=INT8_QUANTIZATION
+        )
     logger.info("Done! Verifying...")
     
+    info_a_after = client.get_collection("aura_index_a_abstracts")
+    logger.info(f"Payload schema a (after): {info_a_after.payload_schema}")
+    logger.info(f"Quantization a (after): {info_a_after.config.quantization_config}")
     info_b_after = client.get_collection("aura_index_b_bodies")
     logger.info(f"Payload schema b (after): {info_b_after.payload_schema}")
+    logger.info(f"Quantization b (after): {info_b_after.config.quantization_config}")
 
 if __name__ == "__main__":
     apply_index()
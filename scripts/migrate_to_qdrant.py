@@ -1,16 +1,19 @@
+import asyncio
+import hashlib
 import os
 import sys
 import logging
-from uuid import uuid4
 
 # Add the project root to the python path
 main_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 sys.path.insert(0, main_dir)
 
-from qdrant_client import QdrantClient
-from qdrant_client.http.models import Distance, VectorParams, PointStruct, SparseVectorParams, Modifier, SparseVector
+from qdrant_client import AsyncQdrantClient
+from qdrant_client.http.models import Distance, VectorParams, Batch, SparseVectorParams, Modifier, SparseVector, OptimizersConfigDiff
 import chromadb
+import numpy as np
 
+from app.db.vector_store import PAYLOAD_INDEXES, QDRANT_GRPC_PORT, INT8_QUANTIZATION
 from app.utils.config import settings
 from langchain_qdrant import FastEmbedSparse
 
@@ -18,8 +21,22 @@ from langchain_qdrant import FastEmbedSparse
 logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(name)s - %(levelname)s - %(message)s")
 logger = logging.getLogger("migration")
 
-def migrate_collection(chroma_name: str, qdrant_name: str, qdrant_client: QdrantClient):
-    """Migrates a single Chroma collection to Qdrant synchronously by bypassing LangChain to preserve raw embeddings."""
+# Batches uploaded concurrently: the migration is bound by round-trips to Qdrant Cloud, not by local CPU
+UPLOAD_CONCURRENCY = 8
+UPLOAD_RETRIES = 3
+# Points per Chroma page, sparse encoding call and upsert; also FastEmbed's internal batch, so each page is encoded in one pass
+MIGRATION_BATCH_SIZE = 512
+# Qdrant's default segment indexing threshold (KB of vectors), restored after the bulk upload
+INDEXING_THRESHOLD = 20000
+# Native size of text-embedding-3-small, used when EMBEDDING_DIMENSIONS is unset
+DEFAULT_EMBEDDING_DIMENSIONS = 1536
+
+def _point_id(chroma_id: str) -> int:
+    """64-bit integer Qdrant point ID hashed from a Chroma record ID; cheaper to build and send than a UUID string per point."""
+    return int.from_bytes(hashlib.blake2b(chroma_id.encode(), digest_size=8).digest(), "big")
+
+async def migrate_collection(chroma_name: str, qdrant_name: str, qdrant_client: AsyncQdrantClient, sparse_model: FastEmbedSparse):
+    """Migrates a single Chroma collection to Qdrant with concurrent batch uploads, bypassing LangChain to preserve raw embeddings."""
     logger.info(f"--- Fast-Migrating {chroma_name} to {qdrant_name} ---")
     
     # 1. Connect natively to local ChromaDB (Bypassing LangChain)
@@ -31,125 +48,170 @@ def migrate_collection(chroma_name: str, qdrant_name: str, qdrant_client: Qdrant
         logger.warning(f"Chroma collection '{chroma_name}' not found. Skipping.")
         return
         
-    logger.info("Extracting raw data and computed embeddings from local Chroma collection...")
-    all_data = collection.get(include=["documents", "metadatas", "embeddings"])
-    
-    ids = all_data.get("ids", [])
-    if not ids:
+    total_docs = collection.count()
+    if not total_docs:
         logger.warning(f"No existing data found in local Chroma collection '{chroma_name}'. Skipping.")
         return
         
-    texts = all_data["documents"]
-    metadatas = all_data["metadatas"]
-    vectors = all_data["embeddings"]
-    
-    total_docs = len(ids)
-    logger.info(f"Found {total_docs} documents with pre-computed embeddings in '{chroma_name}'.")
+    logger.info(f"Found {total_docs} documents with pre-computed embeddings in '{chroma_name}'. Streaming them in pages...")
     
-    # Initialize FastEmbedSparse to compute sparse vectors during migration
-    logger.info("Initializing FastEmbedSparse model (Qdrant/bm25)...")
-    sparse_model = FastEmbedSparse(model_name="Qdrant/bm25")
+    # The collection is sized for the configured embedding model (queries are embedded at that size),
+    # so Chroma vectors of any other size can't be migrated as-is
+    dimensions = settings.EMBEDDING_DIMENSIONS or DEFAULT_EMBEDDING_DIMENSIONS
+    sample = collection.get(limit=1, include=["embeddings"])
+    stored_dimensions = len(sample["embeddings"][0])
+    if stored_dimensions != dimensions:
+        logger.error(
+            f"Chroma collection '{chroma_name}' holds {stored_dimensions}-d embeddings, but EMBEDDING_DIMENSIONS "
+            f"expects {dimensions}. Re-embed the data or change EMBEDDING_DIMENSIONS. Skipping."
+        )
+        return
     
     # 2. Prepare or Re-create Qdrant Collection
     try:
-        if qdrant_client.collection_exists(collection_name=qdrant_name):
+        if await qdrant_client.collection_exists(collection_name=qdrant_name):
             logger.info(f"Qdrant collection {qdrant_name} already exists. Deleting it to start fresh...")
-            qdrant_client.delete_collection(collection_name=qdrant_name)
+            await qdrant_client.delete_collection(collection_name=qdrant_name)
             
         logger.info(f"Creating fresh Qdrant collection: {qdrant_name}")
-        qdrant_client.create_collection(
+        await qdrant_client.create_collection(
             collection_name=qdrant_name,
-            vectors_config={"": VectorParams(size=1536, distance=Distance.COSINE)},
-            sparse_vectors_config={"langchain-sparse": SparseVectorParams(modifier=Modifier.IDF)}
+            vectors_config={"": VectorParams(size=dimensions, distance=Distance.COSINE)},
+            sparse_vectors_config={"langchain-sparse": SparseVectorParams(modifier=Modifier.IDF)},
+            # Same int8 quantization as scripts/fix_qdrant_index.py, which the retriever's rescoring search params expect
+            quantization_config=INT8_QUANTIZATION,
+            # No HNSW graph building while the bulk upload is running; indexing is switched on once it finishes
+            optimizers_config=OptimizersConfigDiff(indexing_threshold=0)
         )
-        
-        # Extremely Important for LangChain Metadata Filtering:
-        # We must explicitly tell Qdrant to build a fast-lookup index for our specific metadata fields
-        # because our AuraRetriever uses exact MatchValue and MatchAny filters on them.
-        from qdrant_client.http.models import PayloadSchemaType
-        qdrant_client.create_payload_index(
-            collection_name=qdrant_name,
-            field_name="metadata.pmid",
-            field_schema=PayloadSchemaType.KEYWORD,
-            wait=True
-        )
-        logger.info(f"Created Keyboard Payload Index on 'metadata.pmid' for {qdrant_name}")
-        
+
     except Exception as e:
         logger.error(f"Failed to create Qdrant collection: {e}")
         return
 
-    # 3. Upload to Qdrant Fast using native PointStructs
-    logger.info(f"Pushing {total_docs} vectors natively to Qdrant Cloud...")
+    # 3. Upload to Qdrant Fast using native column-oriented batches
+    logger.info(f"Pushing {total_docs} vectors natively to Qdrant Cloud ({UPLOAD_CONCURRENCY} batches in flight)...")
+    
+    semaphore = asyncio.Semaphore(UPLOAD_CONCURRENCY)
     
-    batch_size = 200
+    async def send_batch(points: Batch, start: int, end: int) -> None:
+        try:
+            # Retried like upload_points did, with a short exponential backoff
+            for attempt in range(UPLOAD_RETRIES + 1):
+                try:
+                    await qdrant_client.upsert(collection_name=qdrant_name, points=points, wait=True)
+                    break
+                except Exception as e:
+                    if attempt == UPLOAD_RETRIES:
+                        raise
+                    logger.warning(f"  -> Upload of chunk {start} to {end} failed ({e}), retrying...")
+                    await asyncio.sleep(2 ** attempt)
+        finally:
+            semaphore.release()
+        logger.info(f"  -> Uploaded chunk {start} to {end} of {total_docs}")
+    
+    batch_size = MIGRATION_BATCH_SIZE
+    tasks = []
     for i in range(0, total_docs, batch_size):
         end_idx = min(i + batch_size, total_docs)
         
-        # Calculate sparse embeddings for the batch
-        batch_texts = texts[i:end_idx]
-        sparse_batch = sparse_model.embed_documents(batch_texts)
+        # Read one page from Chroma, so only the batches in flight are ever held in memory
+        page = await asyncio.to_thread(
+            collection.get, limit=end_idx - i, offset=i, include=["documents", "metadatas", "embeddings"]
+        )
+        texts = page["documents"]
+        metadatas = page["metadatas"]
+        vectors = np.asarray(page["embeddings"], dtype=np.float32)
         
-        points = []
-        for j in range(i, end_idx):
-            # LangChain exclusively looks for metadata inside a nested 'metadata' dictionary
-            # And expects the main text to live at 'page_content'.
-            payload = {
-                "page_content": texts[j],
-                "metadata": metadatas[j].copy() if metadatas[j] else {}
-            }
-            
-            sparse_vec = sparse_batch[j - i]
-            
-            points.append(
-                PointStruct(
-                    id=str(uuid4()), 
-                    vector={
-                        "": vectors[j],
-                        "langchain-sparse": SparseVector(indices=sparse_vec.indices, values=sparse_vec.values)
-                    }, 
-                    payload=payload
-                )
-            )
+        # Calculate sparse embeddings for the batch off the event loop, so earlier uploads keep progressing
+        sparse_batch = await asyncio.to_thread(sparse_model.embed_documents, texts)
+        
+        # Column-oriented batch: one model per page instead of a PointStruct per point,
+        # and the whole page of dense vectors converted to lists in a single call.
+        # LangChain exclusively looks for metadata inside a nested 'metadata' dictionary
+        # and expects the main text to live at 'page_content'.
+        points = Batch(
+            ids=[_point_id(chroma_id) for chroma_id in page["ids"]],
+            vectors={
+                "": vectors.tolist(),
+                "langchain-sparse": [SparseVector(indices=vec.indices, values=vec.values) for vec in sparse_batch]
+            },
+            payloads=[
+                {"page_content": text, "metadata": metadata or {}} # Serialized right away, so no defensive copy
+                for text, metadata in zip(texts, metadatas)
+            ]
+        )
             
-        # Add the batch synchronously
-        qdrant_client.upload_points(
+        # Wait for a free upload slot before queuing, so reading never runs more than UPLOAD_CONCURRENCY batches ahead
+        await semaphore.acquire()
+        tasks.append(asyncio.create_task(send_batch(points, i, end_idx)))
+
+    # Every batch is upserted with wait=True, so the collection is complete once all of them return
+    await asyncio.gather(*tasks)
+
+    # Extremely Important for LangChain Metadata Filtering:
+    # We must explicitly tell Qdrant to build a fast-lookup index for our specific metadata fields
+    # because our AuraRetriever uses exact MatchValue and MatchAny filters on them.
+    # Built once over the uploaded data (queued without waiting, the last call waits for all of them),
+    # and before HNSW indexing is enabled, so the graph is built with the filterable fields in place.
+    fields = list(PAYLOAD_INDEXES.items())
+    for n, (field_name, field_schema) in enumerate(fields, start=1):
+        await qdrant_client.create_payload_index(
             collection_name=qdrant_name,
-            points=points,
-            wait=True
+            field_name=field_name,
+            field_schema=field_schema,
+            wait=n == len(fields)
         )
-        logger.info(f"  -> Uploaded chunk {i} to {end_idx} of {total_docs}")
+    logger.info(f"Created payload indexes on {', '.join(PAYLOAD_INDEXES)} for {qdrant_name}")
+
+    # Build the HNSW index once over the complete collection
+    logger.info(f"Upload finished. Enabling HNSW indexing on {qdrant_name} (threshold {INDEXING_THRESHOLD})...")
+    await qdrant_client.update_collection(
+        collection_name=qdrant_name,
+        optimizers_config=OptimizersConfigDiff(indexing_threshold=INDEXING_THRESHOLD)
+    )
 
     logger.info(f"✅ Successfully fast-migrated '{chroma_name}' to '{qdrant_name}'!")
 
-def run_migration():
+async def run_migration():
     """Main migration coordinator."""
     logger.info("=========================================")
     logger.info("Starting ChromaDB -> Qdrant Cloud Migration")
     logger.info("=========================================")
     
-    qdrant_client = QdrantClient(
+    # gRPC (protobuf over HTTP/2) carries the vector batches far more compactly than JSON REST
+    qdrant_client = AsyncQdrantClient(
         url=settings.QDRANT_URL,
-        api_key=settings.QDRANT_API_KEY
+        api_key=settings.QDRANT_API_KEY,
+        prefer_grpc=settings.QDRANT_PREFER_GRPC,
+        grpc_port=QDRANT_GRPC_PORT,
+        timeout=60
     )
     
+    # Initialize FastEmbedSparse once to compute sparse vectors for both collections
+    logger.info("Initializing FastEmbedSparse model (Qdrant/bm25)...")
+    sparse_model = FastEmbedSparse(model_name="Qdrant/bm25", batch_size=MIGRATION_BATCH_SIZE, threads=os.cpu_count())
+    
     # Migrate Index A (Abstracts)
-    migrate_collection(
+    await migrate_collection(
         chroma_name="index_a_abstracts",
         qdrant_name="aura_index_a_abstracts",
-        qdrant_client=qdrant_client
+        qdrant_client=qdrant_client,
+        sparse_model=sparse_model
     )
     
     # Migrate Index B (Body Text)
-    migrate_collection(
+    await migrate_collection(
         chroma_name="index_b_bodies",
         qdrant_name="aura_index_b_bodies",
-        qdrant_client=qdrant_client
+        qdrant_client=qdrant_client,
+        sparse_model=sparse_model
     )
     
     logger.info("=========================================")
     logger.info("Migration Complete! The cloud database is now locked and loaded.")
     logger.info("=========================================")
+    
+    await qdrant_client.close()
 
 if __name__ == "__main__":
-    run_migration()
+    asyncio.run(run_migration())
@@ -1,13 +1,19 @@
 import argparse
-import json
 import logging
 import os
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor
+from itertools import islice
 from pathlib import Path
 import sys
+from typing import Any, Dict, List, Optional, Tuple
+
+import orjson
 
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 from app.core.chunker import AuraChunker
+from app.core.ingestion import MANIFEST_FILENAME, iter_raw_records
 from app.utils.config import settings
 
 # Configure logging
@@ -17,48 +23,33 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+# Records per worker task (amortizes pickling and IPC) and tasks kept queued per worker process
+RECORDS_PER_TASK = 16
+TASKS_PER_WORKER = 2
 
-def process_folder(folder_name: str, max_chunk_size: int = 1000, chunk_overlap: int = 200) -> None:
-    """
-    Processes all raw JSON files inside a specify input folder name, chunks them,
-    and writes the chunked versions to the processed dir.
+# Each worker process builds its own chunker once, in _init_worker
+_worker_chunker: Optional[AuraChunker] = None
+
+
+def _init_worker(max_chunk_size: int, chunk_overlap: int) -> None:
+    """Process-pool initializer: creates the worker's chunker."""
+    global _worker_chunker
+    _worker_chunker = AuraChunker(max_chunk_size=max_chunk_size, chunk_overlap=chunk_overlap)
+
+
+def _chunk_records(records: List[Dict[str, Any]], output_dir: Path) -> List[Tuple[str, Optional[str]]]:
     """
-    input_dir = settings.RAW_DATA_DIR / folder_name
-    output_dir = settings.PROCESSED_DATA_DIR / folder_name
-    
-    if not input_dir.exists():
-        logger.error(f"Input directory does not exist: {input_dir}")
-        return
+    Process-pool worker: chunks a slice of raw records and writes each chunked record to its own file.
 
-    # Ensure output directory exists
-    output_dir.mkdir(parents=True, exist_ok=True)
-    
-    chunker = AuraChunker(max_chunk_size=max_chunk_size, chunk_overlap=chunk_overlap)
-    
-    json_files = list(input_dir.glob("*.json"))
-    
-    if not json_files:
-        logger.warning(f"No JSON files found in {input_dir}")
-        return
-        
-    logger.info(f"Found {len(json_files)} files in {input_dir}. Starting chunking process...")
-    
-    success_count = 0
-    error_count = 0
-    
-    for file_path in json_files:
-        # Skip files that have "_chunked_test" in their name from previous testing
-        if "_chunked_test.json" in file_path.name:
-            continue
-            
-        output_filepath = output_dir / file_path.name
-        
+    Returns:
+        List[Tuple[str, Optional[str]]]: (pmid, error message or None) per record, in input order.
+    """
+    results = []
+    for article_data in records:
+        pmid = article_data.get("pmid", "unknown")
         try:
-            with open(file_path, "r", encoding="utf-8") as f:
-                article_data = json.load(f)
-                
             # Process the article into chunks
-            docs = chunker.process_article(article_data)
+            docs = _worker_chunker.process_article(article_data)
             
             # Serialize LangChain Documents back to JSON dicts
             output_data = {
@@ -73,21 +64,107 @@ def process_folder(folder_name: str, max_chunk_size: int = 1000, chunk_overlap:
             }
             
             # Write to output destination
-            with open(output_filepath, "w", encoding="utf-8") as f:
-                json.dump(output_data, f, indent=4, ensure_ascii=False)
-                
-            success_count += 1
-            if success_count % 10 == 0:
-                logger.info(f"Successfully processed {success_count} files so far...")
-                
+            (output_dir / f"{pmid}.json").write_bytes(orjson.dumps(output_data, option=orjson.OPT_INDENT_2))
+            results.append((pmid, None))
         except Exception as e:
-            logger.error(f"Error processing file {file_path.name}: {e}")
-            error_count += 1
+            results.append((pmid, str(e)))
+    return results
+
+
+def _source_mtimes(input_dir: Path) -> Dict[str, float]:
+    """Maps each PMID to the modification time of the raw file holding it (its shard via the manifest, or its legacy JSON file)."""
+    mtimes: Dict[str, float] = {}
+    manifest_path = input_dir / MANIFEST_FILENAME
+    if manifest_path.exists():
+        shard_mtimes: Dict[str, float] = {}
+        for pmid, (shard_name, _) in orjson.loads(manifest_path.read_bytes()).items():
+            if shard_name not in shard_mtimes:
+                shard_mtimes[shard_name] = (input_dir / shard_name).stat().st_mtime
+            mtimes[pmid] = shard_mtimes[shard_name]
+    for file_path in input_dir.glob("*.json"):
+        if file_path.name != MANIFEST_FILENAME:
+            mtimes[file_path.stem] = file_path.stat().st_mtime
+    return mtimes
+
 
+def process_folder(
+    folder_name: str,
+    max_chunk_size: int = 1000,
+    chunk_overlap: int = 200,
+    workers: Optional[int] = None,
+    force: bool = False
+) -> None:
+    """
+    Processes all raw records (NDJSON shards or legacy JSON files) inside a specify input folder name,
+    chunks them across a process pool, and writes the chunked versions to the processed dir.
+    Records whose output is newer than their raw source are skipped unless `force` is set
+    (needed after changing the chunk size or overlap).
+    """
+    input_dir = settings.RAW_DATA_DIR / folder_name
+    output_dir = settings.PROCESSED_DATA_DIR / folder_name
+    
+    if not input_dir.exists():
+        logger.error(f"Input directory does not exist: {input_dir}")
+        return
+
+    # Ensure output directory exists
+    output_dir.mkdir(parents=True, exist_ok=True)
+    
+    workers = workers or os.cpu_count() or 1
+    logger.info(f"Reading raw records from {input_dir}. Starting chunking process on {workers} workers...")
+    
+    success_count = 0
+    error_count = 0
+    skipped_count = 0
+    
+    source_mtimes = {} if force else _source_mtimes(input_dir)
+    
+    def needs_chunking(article_data: Dict[str, Any]) -> bool:
+        nonlocal skipped_count
+        source_mtime = source_mtimes.get(article_data.get("pmid", "unknown"))
+        if source_mtime is not None:
+            try:
+                if (output_dir / f"{article_data['pmid']}.json").stat().st_mtime >= source_mtime:
+                    skipped_count += 1
+                    return False
+            except FileNotFoundError:
+                pass
+        return True
+    
+    # Tasks are settled oldest-first once every worker has TASKS_PER_WORKER queued,
+    # so records are read from the shards only slightly ahead of the chunking
+    pending: "deque[Future]" = deque()
+    
+    def settle_oldest() -> None:
+        nonlocal success_count, error_count
+        for pmid, error in pending.popleft().result():
+            if error is None:
+                success_count += 1
+                if success_count % 10 == 0:
+                    logger.info(f"Successfully processed {success_count} files so far...")
+            else:
+                logger.error(f"Error processing record {pmid}: {error}")
+                error_count += 1
+    
+    records = filter(needs_chunking, iter_raw_records(input_dir))
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(max_chunk_size, chunk_overlap)) as pool:
+        while batch := list(islice(records, RECORDS_PER_TASK)):
+            pending.append(pool.submit(_chunk_records, batch, output_dir))
+            if len(pending) > workers * TASKS_PER_WORKER:
+                settle_oldest()
+        
+        while pending:
+            settle_oldest()
+
+    if success_count == 0 and error_count == 0 and skipped_count == 0:
+        logger.warning(f"No raw records found in {input_dir}")
+        return
+        
     logger.info("====================================")
     logger.info(f"Chunking process complete for '{folder_name}'")
     logger.info(f"Successfully processed: {success_count}")
     logger.info(f"Failed to process: {error_count}")
+    logger.info(f"Skipped (already up to date): {skipped_count}")
     logger.info(f"Output saved to: {output_dir}")
     logger.info("====================================")
 
@@ -112,7 +189,18 @@ if __name__ == "__main__":
         default=200, 
         help="Chunk overlap in characters."
     )
+    parser.add_argument(
+        "--force", 
+        action="store_true", 
+        help="Re-chunk every record, including those whose chunked output is already up to date."
+    )
+    parser.add_argument(
+        "--workers", 
+        type=int, 
+        default=None, 
+        help="Chunking worker processes. Defaults to the CPU count."
+    )
     
     args = parser.parse_args()
     
-    process_folder(folder_name=args.folder, max_chunk_size=args.max_size, chunk_overlap=args.overlap)
+    process_folder(folder_name=args.folder, max_chunk_size=args.max_size, chunk_overlap=args.overlap, workers=args.workers, force=args.force)
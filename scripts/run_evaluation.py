@@ -1,23 +1,29 @@
 import asyncio
-import json
 import random
 import sys
 import os
 from pathlib import Path
-from typing import List, Optional
+from typing import List, Optional, Dict, Any, Iterator, Tuple, Union
 import csv
+import gzip
+import hashlib
 import time
+from dataclasses import dataclass
 
-from pydantic import BaseModel, Field
+import httpx
+import numpy as np
+import orjson
+from pydantic import BaseModel, Field, TypeAdapter
 from langchain_openai import ChatOpenAI
 from langchain_groq import ChatGroq
-from langchain_core.prompts import ChatPromptTemplate
+from langchain_core.messages import BaseMessage, HumanMessage, SystemMessage
 
 # Ensure the root project directory is in the Python path
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 from app.utils.config import settings
 from app.core.chat_engine import AuraChatEngine
+from app.core.ingestion import MANIFEST_FILENAME
 
 # -----------------------------------------------------------------------
 # Pydantic Schemas
@@ -32,10 +38,135 @@ class ArticleQASet(BaseModel):
     publication_type: str
     questions: List[GeneratedQuestion]
 
+# Whole test bank (de)serializer, so the file is parsed and validated in one pydantic-core pass
+TEST_SET_ADAPTER = TypeAdapter(List[ArticleQASet])
+
 class EvaluationScore(BaseModel):
     score: int = Field(description="Integer score from 0 to 10 grading the Chatbot's performance.")
     reasoning: str = Field(description="A concise 1-2 sentence justification for the score.")
 
+# Column order of data/evaluation_results.csv
+RESULT_FIELDS = (
+    "pmid", "question_index", "publication_type", "question", "category", "ground_truth",
+    "chatbot_answer", "retrieval_strategy", "latency_sec", "score", "reasoning", "judge_model",
+)
+
+# One {pmid, question_index, score, latency_sec} line per scored question, so an interrupted run can --resume
+EVAL_STATE_FILE = Path("data/eval_state.jsonl")
+
+# Cosine similarity above which a generated question reuses an earlier question's answer (--semantic-cache)
+ANSWER_CACHE_THRESHOLD = 0.93
+
+# Generated Q&A sets, keyed by PMID and a hash of the generation prompt, so reruns skip the generator LLM
+QA_CACHE_DIR = Path("data/cache/qas")
+
+# Judge cascade (--judge-cascade): the small model scores first, and grey-zone or hedged verdicts are re-judged by the large one
+JUDGE_MODEL = "llama-3.3-70b-versatile"
+JUDGE_MINI_MODEL = "llama-3.1-8b-instant"
+JUDGE_ESCALATION_SCORES = range(4, 8)
+JUDGE_HEDGE_TERMS = ("unclear", "ambiguous", "uncertain")
+
+# (requests, tokens) per minute allowed per provider; account-tier dependent, so lower these for free-tier keys
+GENERATOR_RATE_LIMITS = (5000, 800_000) # OpenAI gpt-4o-mini
+JUDGE_RATE_LIMITS = (1000, 300_000) # Groq
+
+@dataclass
+class EvaluationTotals:
+    """Running sums over evaluated questions, enough for the summary without keeping every result."""
+    total_questions: int = 0
+    valid_questions: int = 0
+    score_sum: int = 0
+    latency_sum: float = 0.0
+    perfect_scores: int = 0
+    zero_scores: int = 0
+
+    def add(self, result: Dict[str, Any]) -> None:
+        self.total_questions += 1
+        self.latency_sum += result["latency_sec"]
+        score = result["score"]
+        if score == -1: # Judge LLM error
+            return
+        self.valid_questions += 1
+        self.score_sum += score
+        self.perfect_scores += score == 10
+        self.zero_scores += score == 0
+
+class RateLimiter:
+    """
+    Async token bucket over requests and tokens per minute. Both budgets refill continuously,
+    so calls proceed as fast as the limits allow instead of waiting out 429 retries.
+    Waiters are served in arrival order.
+    """
+
+    def __init__(self, rpm: int, tpm: int):
+        self.rpm = rpm
+        self.tpm = tpm
+        self._requests = float(rpm)
+        self._tokens = float(tpm)
+        self._updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def acquire(self, est_tokens: int) -> None:
+        """Waits until one request and est_tokens tokens are available, then consumes them."""
+        est_tokens = min(est_tokens, self.tpm) # A single oversized call must still be able to proceed
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                elapsed = now - self._updated
+                self._updated = now
+                self._requests = min(self.rpm, self._requests + elapsed * self.rpm / 60)
+                self._tokens = min(self.tpm, self._tokens + elapsed * self.tpm / 60)
+                
+                if self._requests >= 1 and self._tokens >= est_tokens:
+                    self._requests -= 1
+                    self._tokens -= est_tokens
+                    return
+                    
+                await asyncio.sleep(max(
+                    (1 - self._requests) * 60 / self.rpm,
+                    (est_tokens - self._tokens) * 60 / self.tpm
+                ))
+
+def estimate_tokens(messages: List[BaseMessage]) -> int:
+    """Rough prompt size for rate limiting (~4 characters per token)."""
+    return sum(len(m.content) for m in messages) // 4
+
+class SemanticAnswerCache:
+    """
+    Chatbot answers keyed by the normalized question embedding. A lookup hits when a previously answered
+    question has cosine similarity >= threshold, so near-duplicate generated questions skip the RAG pipeline.
+    """
+
+    def __init__(self, threshold: float = ANSWER_CACHE_THRESHOLD):
+        self.threshold = threshold
+        self._answers: List[str] = []
+        self._vectors: List[np.ndarray] = []
+        self._matrix: Optional[np.ndarray] = None # Stacked _vectors, rebuilt lazily after an add
+
+    def get(self, vector: List[float]) -> Optional[Tuple[str, float]]:
+        """Returns (answer, cosine similarity) of the most similar cached question, or None on a miss."""
+        if not self._answers:
+            return None
+        if self._matrix is None:
+            self._matrix = np.stack(self._vectors)
+        similarities = self._matrix @ self._normalize(vector)
+        best = int(np.argmax(similarities))
+        if similarities[best] < self.threshold:
+            return None
+        return self._answers[best], float(similarities[best])
+
+    def add(self, vector: List[float], answer: str) -> None:
+        self._vectors.append(self._normalize(vector))
+        self._answers.append(answer)
+        self._matrix = None
+
+    @staticmethod
+    def _normalize(vector: List[float]) -> np.ndarray:
+        """L2-normalized float32 copy, so cosine similarity is a dot product."""
+        v = np.asarray(vector, dtype=np.float32)
+        norm = np.linalg.norm(v)
+        return v / norm if norm else v
+
 # -----------------------------------------------------------------------
 # Prompts
 # -----------------------------------------------------------------------
@@ -100,52 +231,104 @@ Provide your integer score and a succinct 1-2 sentence reasoning.
 # -----------------------------------------------------------------------
 # Classes
 # -----------------------------------------------------------------------
+# Generation articles / evaluation questions in flight at once
+EVAL_CONCURRENCY = 8
+
 class RAGEvaluator:
-    def __init__(self, raw_data_dir: str = "data/raw/hht", sample_size: int = 10):
+    def __init__(self, raw_data_dir: str = "data/raw/hht", sample_size: int = 10, semantic_cache: bool = False, judge_cascade: bool = False):
         self.raw_data_dir = Path(raw_data_dir)
         self.sample_size = sample_size
         self.chat_engine = AuraChatEngine()
         
+        # Opt-in: near-duplicate questions then share one answer, which speeds up runs but makes them less independent
+        self.answer_cache: Optional[SemanticAnswerCache] = SemanticAnswerCache() if semantic_cache else None
+        
+        # One pooled HTTP/2 client for the generator and judge calls, so concurrent requests reuse warm connections
+        self.http_client = httpx.AsyncClient(
+            limits=httpx.Limits(max_keepalive_connections=32, max_connections=64, keepalive_expiry=30.0),
+            timeout=httpx.Timeout(60.0, connect=10.0),
+            http2=True
+        )
+        
         # Generator LLM (Needs advanced reasoning to follow strict non-generic instructions; use gpt-4o-mini for budget)
         self.generator_llm = ChatOpenAI(
             model="gpt-4o-mini", 
             temperature=0.7,
-            api_key=settings.OPENAI_API_KEY
+            api_key=settings.OPENAI_API_KEY,
+            max_retries=6, # Exponential backoff on 429s instead of pausing between calls
+            http_async_client=self.http_client
         ).with_structured_output(ArticleQASet)
-        self.generator_prompt = ChatPromptTemplate.from_messages([
-            ("system", QUESTION_GENERATION_SYSTEM),
-            ("human", "Article Text:\n\n{article_text}")
-        ])
-        self.generator_chain = self.generator_prompt | self.generator_llm
+        self.generator_limiter = RateLimiter(*GENERATOR_RATE_LIMITS)
+        # The system prompts are static, so their messages are built once and reused instead of re-rendering a template per call
+        self.generator_system = SystemMessage(content=QUESTION_GENERATION_SYSTEM)
         
         # Judge LLM (Use llama-3.3-70b-versatile via Groq to prevent self-preference bias)
-        self.judge_llm = ChatGroq(
-            model="llama-3.3-70b-versatile", 
+        self.judge_llm = self._build_judge(JUDGE_MODEL)
+        
+        # Opt-in: a cheaper Groq model judges first (still not the generator's model family), escalating uncertain verdicts
+        self.judge_llm_mini = self._build_judge(JUDGE_MINI_MODEL) if judge_cascade else None
+        self.judge_limiter = RateLimiter(*JUDGE_RATE_LIMITS)
+        self.judge_system = SystemMessage(content=JUDGE_SYSTEM_PROMPT)
+
+    def _build_judge(self, model: str):
+        """Builds a structured-output Groq judge on the shared HTTP client."""
+        return ChatGroq(
+            model=model,
             temperature=0.0,
-            api_key=settings.GROQ_API_KEY
+            api_key=settings.GROQ_API_KEY,
+            max_retries=6, # Exponential backoff on 429s instead of pausing between calls
+            http_async_client=self.http_client
         ).with_structured_output(EvaluationScore)
-        self.judge_prompt = ChatPromptTemplate.from_messages([
-            ("system", JUDGE_SYSTEM_PROMPT),
-            ("human", "Question: {question}\n\nGround Truth: {ground_truth}\n\nChatbot Answer: {chatbot_answer}")
-        ])
-        self.judge_chain = self.judge_prompt | self.judge_llm
-
-    def _get_random_articles(self) -> List[Path]:
-        all_json_files = list(self.raw_data_dir.glob("*.json"))
-        if not all_json_files:
-            raise FileNotFoundError(f"No JSON files found in {self.raw_data_dir}")
-        return random.sample(all_json_files, min(self.sample_size, len(all_json_files)))
-
-    def _truncate_text(self, text: str, max_chars: int = 15000) -> str:
-        """Truncate text to avoid token limits for the generation prompt."""
-        return text[:max_chars] if text else ""
-
-    async def generate_questions(self, file_path: Path) -> Optional[ArticleQASet]:
-        """Reads a JSON file and prompts the LLM to generate 3 Q&A pairs."""
+
+    def _iter_raw_entries(self) -> Iterator[Union[bytes, Path]]:
+        """
+        Yields one undecoded entry per raw record: an NDJSON line from the gzip shards, or the path of a
+        legacy one-file-per-PMID JSON record (listed with os.scandir, so no Path object or stat per entry).
+        Mirrors iter_raw_records, but leaves decoding to the caller.
+        """
+        for shard_path in sorted(self.raw_data_dir.glob("shard_*.jsonl.gz")):
+            with gzip.open(shard_path, "rb") as gz:
+                for line in gz:
+                    if line.strip():
+                        yield line
+
+        with os.scandir(self.raw_data_dir) as entries:
+            names = sorted(
+                e.name for e in entries
+                if e.name.endswith(".json") and e.name != MANIFEST_FILENAME and "_chunked_test.json" not in e.name
+            )
+        for name in names:
+            yield self.raw_data_dir / name
+
+    def _get_random_articles(self) -> List[Dict[str, Any]]:
+        """
+        Uniformly samples sample_size raw records in one streaming pass (reservoir sampling), never holding the whole corpus.
+        Only the sampled entries are decoded (or, for legacy files, read from disk).
+        """
+        sample: List[Union[bytes, Path]] = []
+        for n, entry in enumerate(self._iter_raw_entries()):
+            if n < self.sample_size:
+                sample.append(entry)
+            else:
+                slot = random.randint(0, n)
+                if slot < self.sample_size:
+                    sample[slot] = entry
+        if not sample:
+            raise FileNotFoundError(f"No raw records found in {self.raw_data_dir}")
+        return [orjson.loads(entry.read_bytes() if isinstance(entry, Path) else entry) for entry in sample]
+
+    def _build_article_text(self, title: str, abstract: str, body: str, max_chars: int = 15000) -> str:
+        """
+        Combines title, abstract and body into the generation prompt text, truncated to avoid token limits.
+        The body is sliced before concatenation, so a long article is never copied in full just to be cut.
+        """
+        header = f"TITLE: {title}\nABSTRACT: {abstract}\nBODY: "
+        return (header + body[:max(0, max_chars - len(header))])[:max_chars]
+
+    async def generate_questions(self, article_data: Dict[str, Any]) -> Optional[ArticleQASet]:
+        """Prompts the LLM to generate 3 Q&A pairs for a raw article record."""
+        pmid = article_data.get("pmid", "unknown")
         try:
-            with open(file_path, "r", encoding="utf-8") as f:
-                article_data = json.load(f)
-                
             abstract_layer = article_data.get("abstract_layer", {})
             body_layer = article_data.get("body_layer", {})
             
@@ -154,51 +337,74 @@ class RAGEvaluator:
             abstract = abstract_layer.get("content", "")
             body = body_layer.get("content", "")
             
-            full_text = f"TITLE: {title}\nABSTRACT: {abstract}\nBODY: {body}"
-            full_text = self._truncate_text(full_text)
-            
+            full_text = self._build_article_text(title, abstract, body)
             
-            pmid = article_data.get("pmid", file_path.stem)
             
             # Extract publication types for metrics 
             pub_types_list = abstract_layer.get("publication_types", [])
             publication_type = ", ".join(pub_types_list) if pub_types_list else "Unknown"
             
+            # The key covers the system prompt too, so editing it invalidates earlier generations
+            key = hashlib.sha256(f"{QUESTION_GENERATION_SYSTEM}\0{full_text}".encode()).hexdigest()[:16]
+            cache_file = QA_CACHE_DIR / f"{pmid}_{key}.json"
+            if cache_file.exists():
+                try:
+                    cached = ArticleQASet.model_validate_json(cache_file.read_bytes())
+                    print(f"Loaded cached questions for PMID {pmid} ({publication_type}).")
+                    return cached
+                except ValueError as e: # pydantic's ValidationError included
+                    print(f"Discarding unreadable cached questions for PMID {pmid}: {e}")
+                    cache_file.unlink(missing_ok=True)
+            
             print(f"Generating questions for PMID {pmid} ({publication_type})...")
             # We await the chain here for async
-            result = await self.generator_chain.ainvoke({"article_text": full_text})
+            messages = [
+                self.generator_system,
+                HumanMessage(content=f"Article Text:\n\n{full_text}")
+            ]
+            await self.generator_limiter.acquire(estimate_tokens(messages))
+            result = await self.generator_llm.ainvoke(messages)
             # Override PMID and Set Publication Type just in case LLM hallucinated it
             result.pmid = str(pmid)
             result.publication_type = publication_type
+            
+            QA_CACHE_DIR.mkdir(parents=True, exist_ok=True)
+            tmp_file = cache_file.with_suffix(".tmp")
+            tmp_file.write_bytes(result.model_dump_json().encode())
+            tmp_file.replace(cache_file) # Atomic, so an interrupted run never leaves a truncated entry
             return result
         except Exception as e:
-            print(f"Error generating questions for {file_path.name}: {e}")
+            print(f"Error generating questions for PMID {pmid}: {e}")
             return None
 
     def _save_test_set(self, qa_sets: List[ArticleQASet], filename: str = "data/ground_truth_test_set.json"):
         os.makedirs("data", exist_ok=True)
-        data_to_save = [qa.model_dump() for qa in qa_sets]
-        with open(filename, "w", encoding="utf-8") as f:
-            json.dump(data_to_save, f, indent=4)
+        with open(filename, "wb") as f:
+            f.write(TEST_SET_ADAPTER.dump_json(qa_sets, indent=2))
         print(f"\nSaved {len(qa_sets)} Article Q&A Sets to {filename}")
 
     def _load_test_set(self, filename: str = "data/ground_truth_test_set.json") -> List[ArticleQASet]:
         if not os.path.exists(filename):
             raise FileNotFoundError(f"Test set not found at {filename}. Run generation first.")
             
-        with open(filename, "r", encoding="utf-8") as f:
-            data = json.load(f)
-            
-        qa_sets = [ArticleQASet(**item) for item in data]
-        return qa_sets
+        with open(filename, "rb") as f:
+            return TEST_SET_ADAPTER.validate_json(f.read())
 
-    async def run_generation(self, num_articles: int = 33):
+    async def run_generation(self, num_articles: int = 33, concurrency: int = EVAL_CONCURRENCY):
         print(f"Starting Static Test Set Generation (N={num_articles} articles)")
         self.sample_size = num_articles
-        articles = self._get_random_articles()
+        # Shard decoding is blocking disk + CPU work, so it runs off the event loop
+        articles = await asyncio.to_thread(self._get_random_articles)
         print(f"Sampled {len(articles)} articles.")
         
-        tasks = [self.generate_questions(path) for path in articles]
+        # Bounded like the evaluation, so large samples don't trip the OpenAI rate limit into retry storms
+        semaphore = asyncio.Semaphore(concurrency)
+        
+        async def generate_bounded(article: Dict[str, Any]) -> Optional[ArticleQASet]:
+            async with semaphore:
+                return await self.generate_questions(article)
+        
+        tasks = [generate_bounded(article) for article in articles]
         qa_sets = await asyncio.gather(*tasks)
         qa_sets = [q for q in qa_sets if q is not None]
         
@@ -207,7 +413,7 @@ class RAGEvaluator:
         
         self._save_test_set(qa_sets)
 
-    def run_evaluation(self, num_questions: int = 60):
+    async def run_evaluation(self, num_questions: int = 60, concurrency: int = EVAL_CONCURRENCY, resume: bool = False):
         print(f"Starting LLM-as-a-Judge Evaluation (Testing {num_questions} Questions)")
         
         try:
@@ -216,102 +422,175 @@ class RAGEvaluator:
             print(e)
             return
 
-        # Flatten all questions into a single pool to sample exactly num_questions
-        all_available_questions = []
-        for qa_set in qa_sets:
-            for q in qa_set.questions:
-                all_available_questions.append({
-                    "pmid": qa_set.pmid,
-                    "publication_type": qa_set.publication_type,
-                    "question_obj": q
-                })
+        # On resume, questions scored by the interrupted run count towards num_questions and are not re-asked
+        totals = EvaluationTotals()
+        done = set()
+        if resume and EVAL_STATE_FILE.exists():
+            for state in self._load_eval_state():
+                done.add((state["pmid"], state["question_index"]))
+                totals.add(state)
+            print(f"Resuming: {len(done)} questions already scored.")
+        remaining = max(0, num_questions - len(done))
+
+        # Sample (qa_set, question) index pairs across the whole bank, then dereference only the sampled ones
+        index_pool = [
+            (i, j) for i, qa_set in enumerate(qa_sets) for j in range(len(qa_set.questions))
+            if (qa_set.pmid, j) not in done
+        ]
                 
-        if len(all_available_questions) < num_questions:
-            print(f"Warning: Requested {num_questions} questions, but only {len(all_available_questions)} exist in the cache. Using all available.")
-            sampled_questions = all_available_questions
+        if len(index_pool) < remaining:
+            print(f"Warning: Requested {remaining} questions, but only {len(index_pool)} exist in the cache. Using all available.")
+            sampled_indices = index_pool
         else:
-            sampled_questions = random.sample(all_available_questions, num_questions)
+            sampled_indices = random.sample(index_pool, remaining)
+        
+        sampled_questions = [
+            {
+                "pmid": qa_sets[i].pmid,
+                "question_index": j,
+                "publication_type": qa_sets[i].publication_type,
+                "question_obj": qa_sets[i].questions[j]
+            }
+            for i, j in sampled_indices
+        ]
 
         print(f"Sampled {len(sampled_questions)} random questions from the test bank.")
         
-        all_results = []
-        for i, item in enumerate(sampled_questions):
-            pmid = item["pmid"]
-            pub_type = item["publication_type"]
-            qa = item["question_obj"]
-            
+        # Questions run concurrently (chat + judge pipelines), bounded to stay under the API rate limits
+        semaphore = asyncio.Semaphore(concurrency)
+        tasks = [self._evaluate_one(i, item, semaphore) for i, item in enumerate(sampled_questions)]
+        
+        # Each row is written as soon as its question completes, so an interrupted run keeps its progress;
+        # the summary is computed from running totals instead of the full result list
+        filename = "data/evaluation_results.csv"
+        os.makedirs("data", exist_ok=True)
+        append_csv = bool(done) and os.path.exists(filename)
+        with open(filename, 'a' if append_csv else 'w', newline='', encoding='utf-8') as output_file, \
+             open(EVAL_STATE_FILE, 'ab' if done else 'wb') as state_file:
+            dict_writer = csv.DictWriter(output_file, fieldnames=RESULT_FIELDS)
+            if not append_csv:
+                dict_writer.writeheader()
+            for next_result in asyncio.as_completed(tasks):
+                result = await next_result
+                dict_writer.writerow(result)
+                output_file.flush()
+                state_file.write(orjson.dumps({field: result[field] for field in ("pmid", "question_index", "score", "latency_sec")}) + b"\n")
+                state_file.flush()
+                totals.add(result)
+        print(f"\nSaved detailed results to {filename}")
+        
+        self._print_summary(totals)
+
+    def _load_eval_state(self) -> List[Dict[str, Any]]:
+        """Reads the scored-question log, ignoring a line truncated by a crash mid-write."""
+        states = []
+        with open(EVAL_STATE_FILE, "rb") as f:
+            for line in f:
+                try:
+                    states.append(orjson.loads(line))
+                except orjson.JSONDecodeError:
+                    continue
+        return states
+
+    async def _answer(self, question: str, session_id: str) -> Tuple[str, str]:
+        """Returns the chatbot's answer and how it was produced, serving near-duplicate questions from the answer cache."""
+        if self.answer_cache is None:
+            return await self.chat_engine.achat(user_input=question, session_id=session_id), "Unknown"
+        
+        # The vector store's query-embedding cache keeps this from costing a second call when the pipeline runs
+        vector_store = self.chat_engine.qa_chain.retriever.vector_store
+        vector, _ = await asyncio.to_thread(vector_store.embed_query, question)
+        hit = self.answer_cache.get(vector)
+        if hit is not None:
+            answer, similarity = hit
+            return answer, f"Semantic cache (cosine {similarity:.3f})"
+        
+        answer = await self.chat_engine.achat(user_input=question, session_id=session_id)
+        self.answer_cache.add(vector, answer)
+        return answer, "Unknown"
+
+    async def _evaluate_one(self, i: int, item: Dict[str, Any], semaphore: asyncio.Semaphore) -> Dict[str, Any]:
+        """Answers one sampled question with the chatbot and scores the answer with the judge LLM."""
+        pmid = item["pmid"]
+        pub_type = item["publication_type"]
+        qa = item["question_obj"]
+        
+        async with semaphore:
             print(f"  -> Testing Q{i+1}: {qa.question[:50]}...")
             
             # 1. Get Chatbot Answer
             session_id = f"eval_static_{pmid}_{i}"
             start_time = time.time()
-            chatbot_answer = self.chat_engine.chat(user_input=qa.question, session_id=session_id)
-            strategy = "Unknown"
+            chatbot_answer, strategy = await self._answer(qa.question, session_id)
             latency = time.time() - start_time
             
             # 2. Score Answer with Judge LLM
             try:
-                evaluation = self.judge_chain.invoke({
-                    "question": qa.question,
-                    "ground_truth": qa.ground_truth,
-                    "chatbot_answer": chatbot_answer
-                })
+                evaluation, judge_model = await self._judge(qa.question, qa.ground_truth, chatbot_answer)
                 score = evaluation.score
                 reasoning = evaluation.reasoning
             except Exception as e:
                 print(f"  -> Judging failed: {e}")
                 score = -1
                 reasoning = "Judge LLM Error"
+                judge_model = ""
+
+        return {
+            "pmid": pmid,
+            "question_index": item["question_index"],
+            "publication_type": pub_type,
+            "question": qa.question,
+            "category": qa.category,
+            "ground_truth": qa.ground_truth,
+            "chatbot_answer": chatbot_answer,
+            "retrieval_strategy": strategy,
+            "latency_sec": round(latency, 2),
+            "score": score,
+            "reasoning": reasoning,
+            "judge_model": judge_model
+        }
+
+    async def _judge(self, question: str, ground_truth: str, chatbot_answer: str) -> Tuple[EvaluationScore, str]:
+        """
+        Scores a chatbot answer, returning the verdict and the model that gave it.
+        With the judge cascade on, the small model's verdict stands unless it lands in the grey zone
+        (JUDGE_ESCALATION_SCORES) or its reasoning hedges, in which case the large model re-judges.
+        """
+        messages = [
+            self.judge_system,
+            HumanMessage(content=f"Question: {question}\n\nGround Truth: {ground_truth}\n\nChatbot Answer: {chatbot_answer}")
+        ]
+        est_tokens = estimate_tokens(messages)
+        if self.judge_llm_mini is not None:
+            try:
+                await self.judge_limiter.acquire(est_tokens)
+                evaluation = await self.judge_llm_mini.ainvoke(messages)
+                reasoning = evaluation.reasoning.lower()
+                if evaluation.score not in JUDGE_ESCALATION_SCORES and not any(term in reasoning for term in JUDGE_HEDGE_TERMS):
+                    return evaluation, JUDGE_MINI_MODEL
+            except Exception as e:
+                print(f"  -> Mini judge failed, escalating: {e}")
+        await self.judge_limiter.acquire(est_tokens)
+        return await self.judge_llm.ainvoke(messages), JUDGE_MODEL
 
-            all_results.append({
-                "pmid": pmid,
-                "publication_type": pub_type,
-                "question": qa.question,
-                "category": qa.category,
-                "ground_truth": qa.ground_truth,
-                "chatbot_answer": chatbot_answer,
-                "retrieval_strategy": strategy,
-                "latency_sec": round(latency, 2),
-                "score": score,
-                "reasoning": reasoning
-            })
-            
-            # Respect rate limits
-            time.sleep(1)
-            
-        # Export and Summarize
-        self._export_to_csv(all_results)
-        self._print_summary(all_results)
-
-    def _export_to_csv(self, results: List[dict], filename: str = "data/evaluation_results.csv"):
-        os.makedirs("data", exist_ok=True)
-        keys = results[0].keys() if results else []
-        with open(filename, 'w', newline='', encoding='utf-8') as output_file:
-            dict_writer = csv.DictWriter(output_file, fieldnames=keys)
-            dict_writer.writeheader()
-            dict_writer.writerows(results)
-        print(f"\nSaved detailed results to {filename}")
-
-    def _print_summary(self, results: List[dict]):
-        if not results:
+    def _print_summary(self, totals: EvaluationTotals):
+        if not totals.total_questions:
             print("No results to summarize.")
             return
             
-        # Filter out questions where the Judge LLM failed (-1)
-        valid_results = [r for r in results if r['score'] != -1]
-        
-        total_questions = len(results)
-        valid_questions = len(valid_results)
+        # Questions where the Judge LLM failed (-1) are excluded from the score statistics
+        total_questions = totals.total_questions
+        valid_questions = totals.valid_questions
+        judge_errors = total_questions - valid_questions
         
         if valid_questions == 0:
             print("No valid scores to summarize.")
             return
             
-        average_score = sum(r['score'] for r in valid_results) / valid_questions
-        average_latency = sum(r['latency_sec'] for r in results) / total_questions
-        perfect_scores = sum(1 for r in valid_results if r['score'] == 10)
-        zero_scores = sum(1 for r in valid_results if r['score'] == 0)
-        judge_errors = sum(1 for r in results if r['score'] == -1)
+        average_score = totals.score_sum / valid_questions
+        average_latency = totals.latency_sum / total_questions
+        perfect_scores = totals.perfect_scores
+        zero_scores = totals.zero_scores
         
         print("\n" + "="*50)
         print("EVALUATION SUMMARY")
@@ -337,14 +616,20 @@ if __name__ == "__main__":
     # Evaluate Command
     evaluate_parser = subparsers.add_parser("evaluate", help="Run the RAG chatbot against the static test bank")
     evaluate_parser.add_argument("questions", type=int, nargs="?", default=20, help="Number of questions to randomly sample from the test bank")
+    evaluate_parser.add_argument("--semantic-cache", action="store_true", help=f"Reuse answers for near-duplicate questions (cosine >= {ANSWER_CACHE_THRESHOLD})")
+    evaluate_parser.add_argument("--resume", action="store_true", help="Continue an interrupted run, skipping questions already scored in data/eval_state.jsonl")
+    evaluate_parser.add_argument("--judge-cascade", action="store_true", help=f"Judge with {JUDGE_MINI_MODEL} first, escalating grey-zone verdicts to {JUDGE_MODEL}")
     
     args = parser.parse_args()
     
-    evaluator = RAGEvaluator()
+    evaluator = RAGEvaluator(
+        semantic_cache=getattr(args, "semantic_cache", False),
+        judge_cascade=getattr(args, "judge_cascade", False)
+    )
     
     if args.command == "generate":
         asyncio.run(evaluator.run_generation(num_articles=args.articles))
     elif args.command == "evaluate":
-        evaluator.run_evaluation(num_questions=args.questions)
+        asyncio.run(evaluator.run_evaluation(num_questions=args.questions, resume=args.resume))
     else:
         parser.print_help()
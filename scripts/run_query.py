@@ -5,37 +5,51 @@ import os
 # Ensure project root is in path
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-from app.core.qa_chain import AuraQAChain
+from app.core.resources import get_qa_chain
 
-def main():
-    parser = argparse.ArgumentParser(description="AuraQuery RAG Command Line Interface")
-    parser.add_argument(
-        "query", 
-        type=str, 
-        help="The medical question you want to ask AuraQuery."
-    )
-    
-    args = parser.parse_args()
-    user_query = args.query
-    
+def answer_query(user_query: str):
+    """Runs one query through the shared chain and streams the answer to stdout."""
     print("\n" + "="*80)
     print("🧠 AuraQuery AI - Processing Query...")
     print("="*80)
     print(f"QUESTION: {user_query}")
     print("-" * 80)
     
-    qa_chain = AuraQAChain()
+    qa_chain = get_qa_chain() # Built once, then reused for every query in the process
     
     try:
-        # Run the full RAG pipeline (Parse -> Retrieve -> Format -> Generate)
-        answer, strategy = qa_chain.query(user_query)
-        
+        # Run the full RAG pipeline (Parse -> Retrieve -> Format -> Generate), printing tokens as they arrive
         print("\n🤖 ANSWER:\n")
-        print(answer)
-        print("\n" + "="*80)
+        for token in qa_chain.query_stream(user_query):
+            print(token, end="", flush=True)
+        print("\n\n" + "="*80)
         
     except Exception as e:
         print(f"\n❌ ERROR: Failed to generate answer. Details: {e}")
+
+def main():
+    parser = argparse.ArgumentParser(description="AuraQuery RAG Command Line Interface")
+    parser.add_argument(
+        "query", 
+        type=str, 
+        nargs="?",
+        help="The medical question you want to ask AuraQuery."
+    )
+    parser.add_argument(
+        "--stdin",
+        action="store_true",
+        help="Read one question per line from stdin and answer them all with a single pipeline initialization."
+    )
+    
+    args = parser.parse_args()
+    if args.stdin:
+        for line in sys.stdin:
+            if line.strip():
+                answer_query(line.strip())
+    elif args.query:
+        answer_query(args.query)
+    else:
+        parser.error("provide a query or --stdin")
         
 if __name__ == "__main__":
     main()